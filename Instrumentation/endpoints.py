@@ -0,0 +1,97 @@
+"""Flask wiring: per-route request metrics, GET /metrics and the /profile toggle."""
+import os
+import resource
+import time
+
+from flask import Response, g, jsonify, request
+
+from metrics import REGISTRY
+from profiler import SamplingProfiler
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def resident_bytes():
+    """Current resident set size; the peak where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def instrument_app(app, registry=REGISTRY, profiler=None):
+    """Time every request by route and serve /metrics and /profile on app; returns the profiler.
+
+    Streaming responses are timed until their first byte, when Flask hands
+    the response back, not until the client disconnects.
+    """
+    profiler = profiler or SamplingProfiler()
+    # (method, rule) -> histogram and (method, rule, status) -> counter, so a
+    # request does one dict lookup instead of a registry key build
+    durations, statuses = {}, {}
+
+    registry.gauge('process_cpu_seconds', 'User and system CPU time of this process', time.process_time)
+    registry.gauge('process_resident_memory_bytes', 'Resident memory of this process', resident_bytes)
+    registry.gauge('profiler_enabled', 'Whether the sampling profiler is running', lambda: profiler.running)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        key = (request.method, rule)
+        histogram = durations.get(key)
+        if histogram is None:
+            histogram = durations[key] = registry.histogram(
+                'http_request_duration_seconds', 'Time to handle a request, by route',
+                method=request.method, route=rule)
+        histogram.record(elapsed)
+        key = (request.method, rule, response.status_code)
+        counter = statuses.get(key)
+        if counter is None:
+            counter = statuses[key] = registry.counter(
+                'http_requests_total', 'Requests handled, by route and status',
+                method=request.method, route=rule, status=response.status_code)
+        counter.inc()
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), content_type=PROMETHEUS_MIMETYPE)
+
+    @app.route('/profile', methods=['GET'])
+    def profile():
+        # Folded stacks for flamegraph.pl / speedscope, or ?format=json for the counters
+        if request.args.get('format') == 'json':
+            return jsonify(dict(profiler.stats, running=profiler.running, interval=profiler.interval))
+        return Response(profiler.collapsed(request.args.get('limit', type=int)), mimetype='text/plain')
+
+    @app.route('/profile', methods=['POST'])
+    def toggle_profile():
+        """{"enabled": true|false, "interval": seconds, "reset": true} starts or stops sampling."""
+        options = request.get_json(silent=True) or {}
+        if not isinstance(options, dict):
+            return jsonify({'error': 'expected a JSON object'}), 400
+        interval = options.get('interval')
+        if interval is not None:
+            # bool is an int subclass, and float() of a string would accept "nan"
+            if isinstance(interval, bool) or not isinstance(interval, (int, float)) \
+                    or not 0.001 <= interval <= 10:
+                return jsonify({'error': 'interval must be a number between 0.001 and 10 seconds'}), 400
+            interval = float(interval)
+        if options.get('reset'):
+            profiler.reset()
+        enabled = options.get('enabled', not profiler.running)
+        if enabled:
+            profiler.start(interval)
+        else:
+            profiler.stop()
+        return jsonify(dict(profiler.stats, running=profiler.running, interval=profiler.interval))
+
+    return profiler
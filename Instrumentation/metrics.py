@@ -0,0 +1,284 @@
+"""Counters, gauges and latency histograms shared by the gesture server and the chain nodes.
+
+Recording never takes a lock: every thread writes only to its own cell,
+created the first time that thread records, and readers add the cells up
+when /metrics is scraped. A thread's `cell[i] += n` cannot race another
+write to the same cell, because there is none.
+"""
+import functools
+import threading
+import time
+
+# Histogram resolution: 2**(SUB_BUCKET_BITS - 1) buckets per power of two, so
+# a recorded value is off by at most 1 / 2**(SUB_BUCKET_BITS - 1) (6.25%)
+SUB_BUCKET_BITS = 5
+HALF = 1 << (SUB_BUCKET_BITS - 1)
+# Nanoseconds up to 2**40 (about 18 minutes); longer values land in the last bucket
+MAX_SHIFT = 40 - SUB_BUCKET_BITS
+BUCKETS = ((MAX_SHIFT + 2) << (SUB_BUCKET_BITS - 1))
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+def bucket_index(value):
+    """Log-linear (HDR) bucket of a non-negative integer: exact below 2**SUB_BUCKET_BITS."""
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    if shift <= 0:
+        return value
+    if shift > MAX_SHIFT:
+        return BUCKETS - 1
+    return (shift << (SUB_BUCKET_BITS - 1)) + (value >> shift)
+
+def bucket_bounds(index):
+    """[lower, upper) of the values that fall in bucket index."""
+    if index < 2 * HALF:
+        return index, index + 1
+    shift = (index >> (SUB_BUCKET_BITS - 1)) - 1
+    mantissa = index - (shift << (SUB_BUCKET_BITS - 1))
+    return mantissa << shift, (mantissa + 1) << shift
+
+class _PerThread:
+    """One cell per thread, found through _local; only a thread's first write takes the lock.
+
+    The threaded Flask server runs each request on a new thread, so cells of
+    threads that have exited are folded into one when a new cell would
+    double the count since the last fold.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        self._owners = []  # (thread, cell) of every cell written since the last fold
+        self._retired = [0] * size
+        self._lock = threading.Lock()
+        self._fold_at = 16
+
+    def _new_cell(self):
+        cell = self._local.cell = [0] * self._size
+        with self._lock:
+            self._owners.append((threading.current_thread(), cell))
+            if len(self._owners) >= self._fold_at:
+                self._fold()
+        return cell
+
+    def _fold(self):
+        live, dead = [], []
+        for thread, cell in self._owners:
+            if thread.is_alive():
+                live.append((thread, cell))
+            else:
+                dead.append(cell)
+        if dead:
+            # A new list, so a reader holding the old cells never sees a count twice
+            self._retired = [sum(column) for column in zip(self._retired, *dead)]
+        self._owners = live
+        self._fold_at = 2 * len(live) + 16
+
+    def cells(self):
+        with self._lock:
+            return [self._retired] + [cell for _, cell in self._owners]
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text='', labels=()):
+        self.name, self.help, self.labels = name, help_text, labels
+        self._cells = _PerThread(1)
+        self._local = self._cells._local
+
+    def inc(self, amount=1):
+        try:
+            self._local.cell[0] += amount
+        except AttributeError:
+            self._cells._new_cell()[0] += amount
+
+    def value(self):
+        return sum(cell[0] for cell in self._cells.cells())
+
+    def samples(self):
+        yield self.name, self.labels, self.value()
+
+class Gauge:
+    """A value set by the owner, or read from function at scrape time."""
+    kind = 'gauge'
+
+    def __init__(self, name, help_text='', labels=(), function=None):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.function = function
+        self._value = 0
+
+    def set(self, value):
+        self._value = value
+
+    def value(self):
+        return self.function() if self.function is not None else self._value
+
+    def samples(self):
+        yield self.name, self.labels, self.value()
+
+class Histogram:
+    """HDR-style latency histogram, recorded in nanoseconds and reported in seconds.
+
+    Exported to Prometheus as a summary: quantiles computed here from the
+    buckets, plus _sum and _count.
+    """
+    kind = 'summary'
+
+    def __init__(self, name, help_text='', labels=()):
+        self.name, self.help, self.labels = name, help_text, labels
+        # BUCKETS counts, then the sum of the recorded nanoseconds
+        self._cells = _PerThread(BUCKETS + 1)
+        self._local = self._cells._local
+
+    def record(self, seconds):
+        nanoseconds = int(seconds * 1e9) if seconds > 0 else 0
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._cells._new_cell()
+        shift = nanoseconds.bit_length() - SUB_BUCKET_BITS
+        if shift <= 0:
+            cell[nanoseconds] += 1
+        else:
+            cell[(shift << (SUB_BUCKET_BITS - 1)) + (nanoseconds >> shift) if shift <= MAX_SHIFT else BUCKETS - 1] += 1
+        cell[BUCKETS] += nanoseconds
+
+    def time(self):
+        return _Timer(self)
+
+    def merged(self):
+        return [sum(column) for column in zip(*self._cells.cells())]
+
+    def snapshot(self):
+        """{'count', 'sum', quantile: seconds, ..., 'max'} from the merged buckets."""
+        totals = self.merged()
+        counts, total_ns = totals[:BUCKETS], totals[BUCKETS]
+        count = sum(counts)
+        result = {'count': count, 'sum': total_ns / 1e9}
+        if not count:
+            result.update(dict.fromkeys(QUANTILES, 0.0), max=0.0)
+            return result
+        targets = [(quantile, quantile * count) for quantile in QUANTILES]
+        seen, last = 0, 0
+        for index in filter(counts.__getitem__, range(BUCKETS)):
+            seen += counts[index]
+            lower, upper = bucket_bounds(index)
+            # The middle of the bucket: within half a bucket's width of the true value
+            middle = (lower + upper - 1) / 2e9
+            while targets and seen >= targets[0][1]:
+                result[targets.pop(0)[0]] = middle
+            last = upper - 1
+        result['max'] = last / 1e9
+        return result
+
+    def samples(self):
+        snapshot = self.snapshot()
+        for quantile in QUANTILES:
+            yield self.name, self.labels + (('quantile', str(quantile)),), snapshot[quantile]
+        yield f"{self.name}_sum", self.labels, snapshot['sum']
+        yield f"{self.name}_count", self.labels, snapshot['count']
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.record(time.perf_counter() - self.started)
+
+class Registry:
+    """Named metrics, one per (name, labels). Creating one locks; using it does not."""
+
+    def __init__(self, const_labels=None):
+        self.const_labels = tuple(sorted((const_labels or {}).items()))
+        self._metrics = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, labels, **options):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = self._metrics[key] = cls(name, help_text, self.const_labels + key[1], **options)
+                    self._help.setdefault(name, (cls.kind, help_text))
+        if not isinstance(metric, cls):
+            raise ValueError(f"{name} is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name, help_text='', **labels):
+        return self._get(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text='', function=None, **labels):
+        return self._get(Gauge, name, help_text, labels, function=function)
+
+    def histogram(self, name, help_text='', **labels):
+        return self._get(Histogram, name, help_text, labels)
+
+    def collect(self, name, help_text, function, **labels):
+        """One gauge per key of the dict function() returns, labelled key=..., read at scrape time."""
+        def read(key):
+            return lambda: function().get(key, 0)
+        for key in function():
+            self.gauge(name, help_text, read(key), key=key, **labels)
+
+    def render(self):
+        """Every metric in Prometheus text exposition format 0.0.4."""
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+            described = dict(self._help)
+        lines, current = [], None
+        for (name, _), metric in metrics:
+            if name != current:
+                kind, help_text = described[name]
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                current = name
+            try:
+                for sample_name, labels, value in metric.samples():
+                    lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+            except Exception as e:
+                # A gauge reading a component that is not ready yet must not break the scrape
+                lines.append(f"# {name}: {type(e).__name__}")
+        return '\n'.join(lines) + '\n'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+def timed(histogram):
+    """Decorator recording every call's duration, exceptions included, in histogram."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.record(time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+def instrument(target, method, histogram):
+    """Time target.method from now on, for code that calls it through target."""
+    setattr(target, method, timed(histogram)(getattr(target, method)))
+    return target
+
+REGISTRY = Registry()
@@ -0,0 +1,94 @@
+"""Opt-in sampling profiler: off until started, then a background thread reads every stack.
+
+Each sample walks sys._current_frames() and counts the collapsed stack
+("module:function;module:function ...") of every other thread, so the
+profiled code runs unmodified; the cost is one GIL hand-off per interval.
+The output is the folded format flamegraph.pl and speedscope read.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+class SamplingProfiler:
+
+    def __init__(self, interval=0.01, max_depth=64, max_stacks=20000):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.max_stacks = max_stacks
+        self._lock = threading.Lock()
+        self._stacks = Counter()
+        self._stop = None
+        self._thread = None
+        self.stats = {'samples': 0, 'dropped': 0, 'sampling_seconds': 0.0, 'started_at': None}
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, interval=None):
+        """Start sampling (again); returns False if it was already running."""
+        with self._lock:
+            if interval:
+                # Read by the sampling loop every round, so it also retunes a running profiler
+                self.interval = interval
+            if self._thread is not None:
+                return False
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,), name='sampling-profiler', daemon=True)
+            self.stats['started_at'] = time.time()
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """Stop sampling and keep what was collected; returns False if it was not running."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return False
+            self._stop.set()
+        thread.join()
+        return True
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self.stats.update(samples=0, dropped=0, sampling_seconds=0.0)
+
+    def _label(self, code):
+        return f"{os.path.splitext(os.path.basename(code.co_filename))[0]}:{code.co_name}"
+
+    def _run(self, stop):
+        me = threading.get_ident()
+        labels = {}
+        while not stop.wait(self.interval):
+            started = time.perf_counter()
+            sampled = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                names = []
+                while frame is not None and len(names) < self.max_depth:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = self._label(code)
+                    names.append(label)
+                    frame = frame.f_back
+                sampled.append(';'.join(reversed(names)))
+            del frame
+            with self._lock:
+                for stack in sampled:
+                    if stack in self._stacks or len(self._stacks) < self.max_stacks:
+                        self._stacks[stack] += 1
+                    else:
+                        self.stats['dropped'] += 1
+                self.stats['samples'] += 1
+                self.stats['sampling_seconds'] += time.perf_counter() - started
+
+    def collapsed(self, limit=None):
+        """Folded stacks, "frame;frame;frame count" per line, most frequent first."""
+        with self._lock:
+            stacks = self._stacks.most_common(limit)
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks)
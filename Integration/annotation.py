@@ -0,0 +1,39 @@
+import cv2
+import mediapipe as mp
+import numpy as np
+
+mp_hands = mp.solutions.hands
+mp_drawing = mp.solutions.drawing_utils
+
+FINGER_NAMES = ["Thumb", "Index", "Middle"]
+
+def draw_frame(image, hand_landmarks, finger_positions, result):
+    """Draw the hand, fingertips, trajectory and recognizer output onto image in place."""
+    if hand_landmarks is None:
+        return
+    mp_drawing.draw_landmarks(image, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+
+    # Draw finger tips and labels
+    for (cx, cy), finger_name in zip(finger_positions.tolist(), FINGER_NAMES):
+        cv2.circle(image, (cx, cy), 10, (0, 255, 0), cv2.FILLED)
+        cv2.putText(image, finger_name, (cx-20, cy-20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+
+    # Draw the movement path
+    if result.path is not None and len(result.path) > 1:
+        cv2.polylines(image, [result.path.astype(np.int32).reshape(-1, 1, 2)], False, (255, 0, 0), 2)
+
+    if result.swipe:
+        cv2.putText(image, f"SWIPE {result.swipe.upper()}", (50, 50),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+    if result.curve:
+        cv2.putText(image, f"CURVE: {result.curve}", (50, 100),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
+    if result.combo:
+        cv2.putText(image, f"ACCEPTED: {result.combo}", (50, 150),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+    # Visual feedback for pinching state
+    pinching_status = "PINCHING" if result.pinching else "NOT PINCHING"
+    cv2.putText(image, f"Status: {pinching_status}", (50, 200),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
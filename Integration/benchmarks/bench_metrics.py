@@ -0,0 +1,123 @@
+"""Cost of the shared instrumentation, per call and per frame.
+
+Times Counter.inc, Histogram.record and StageStats.record with and without
+a histogram, then the instrumentation one frame pays (a record for each of
+the four pipeline stages) as a share of the frame time at --fps. Checks
+that --threads threads recording at once lose no counts, times rendering
+/metrics, and measures how much the sampling profiler slows a CPU-bound
+loop at its default interval.
+
+    python benchmarks/bench_metrics.py [--calls 200000] [--fps 30] [--threads 8]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(os.path.dirname(root), "Instrumentation"))
+from pipeline import StageStats
+from metrics import Registry
+from profiler import SamplingProfiler
+
+STAGES = ("capture", "inference", "annotate", "end_to_end")
+
+def per_call(function, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - started) / calls
+
+def cpu_loop(iterations):
+    """Process CPU time of pure-Python work, which gives up the GIL to the profiler at every sample.
+
+    CPU time rather than wall time, so other load on the machine matters
+    less, while the profiler thread's own CPU time is still counted.
+    """
+    started = time.process_time()
+    total = 0
+    for _ in range(iterations):
+        total += sum(i * i for i in range(200))
+    return time.process_time() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--fps", type=float, default=30.0, help="Frame rate the per-frame share is taken against")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--metrics", type=int, default=200, help="Histograms in the registry when timing /metrics")
+    parser.add_argument("--profile-seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    registry = Registry()
+    counter = registry.counter("bench_total")
+    histogram = registry.histogram("bench_seconds")
+    plain = StageStats()
+    stage = StageStats(histogram=registry.histogram("bench_stage_seconds"))
+    now = time.perf_counter()
+
+    timings = {
+        "Counter.inc": per_call(counter.inc, args.calls),
+        "Histogram.record": per_call(lambda: histogram.record(0.0123), args.calls),
+        "StageStats.record": per_call(lambda: plain.record(now - 0.0123, now), args.calls),
+        "StageStats.record + histogram": per_call(lambda: stage.record(now - 0.0123, now), args.calls),
+    }
+    # The lambda around record is part of each figure; take it out
+    call = per_call(lambda: None, args.calls)
+    print(f"{'operation':<32} {'ns/call':>8}")
+    for name, seconds in timings.items():
+        print(f"{name:<32} {1e9 * (seconds - call):>8.0f}")
+
+    frame_cost = len(STAGES) * (timings["StageStats.record + histogram"] - timings["StageStats.record"])
+    frame_time = 1 / args.fps
+    print(f"\nper frame: {len(STAGES)} stage histograms, {1e6 * frame_cost:.2f} us "
+          f"= {100 * frame_cost / frame_time:.4f}% of a {1000 * frame_time:.1f} ms frame "
+          f"(and {100 * frame_cost / 0.002:.3f}% of a 2 ms frame)")
+
+    shared = registry.counter("bench_shared_total")
+    shared_histogram = registry.histogram("bench_shared_seconds")
+    each = args.calls // args.threads
+
+    def hammer():
+        for _ in range(each):
+            shared.inc()
+            shared_histogram.record(0.001)
+
+    workers = [threading.Thread(target=hammer) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    recorded = shared_histogram.snapshot()["count"]
+    assert shared.value() == recorded == each * args.threads, (shared.value(), recorded)
+    print(f"{args.threads} threads: {each * args.threads:,} increments and records, none lost, "
+          f"{1e9 * elapsed / (each * args.threads):.0f} ns per inc + record")
+
+    for i in range(args.metrics):
+        registry.histogram("bench_route_seconds", route=f"/route/{i}").record(0.001 * (i % 50))
+    started = time.perf_counter()
+    text = registry.render()
+    print(f"/metrics with {args.metrics} histograms: {1000 * (time.perf_counter() - started):.2f} ms, "
+          f"{len(text) / 1024:.0f} KiB")
+
+    # Enough iterations for about --profile-seconds, measured without the profiler first
+    iterations = int(args.profile_seconds / cpu_loop(200) * 200)
+    profiler = SamplingProfiler()
+    runs = {}
+    for enabled in (False, True) * 4:
+        if enabled:
+            profiler.start()
+        runs.setdefault(enabled, []).append(cpu_loop(iterations))
+        profiler.stop()
+    off, on = min(runs[False]), min(runs[True])
+    per_sample = profiler.stats["sampling_seconds"] / max(profiler.stats["samples"], 1)
+    print(f"sampling profiler every {1000 * profiler.interval:.0f} ms: loop {off:.3f}s CPU off, {on:.3f}s on "
+          f"({100 * (on / off - 1):+.2f}%); {1e6 * per_sample:.0f} us per sample "
+          f"= {100 * per_sample / profiler.interval:.2f}% of the interval")
+
+if __name__ == "__main__":
+    main()
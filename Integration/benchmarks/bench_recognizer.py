@@ -0,0 +1,165 @@
+"""Headless replay and benchmark of the gesture recognizer.
+
+Inputs are video files (decoded and run through MediaPipe) or recorded
+fingertip streams (.npz/.json, classification only). Reports frames/sec,
+p50/p99 per-frame latency, time per stage (decode, mediapipe, classify,
+annotate) and, given a labels file, accuracy on labelled clips.
+
+    python benchmarks/bench_recognizer.py clips/*.mp4 --labels clips/labels.json
+    python benchmarks/bench_recognizer.py clips/*.mp4 --record-landmarks recorded/
+    python benchmarks/bench_recognizer.py recorded/*.npz --labels clips/labels.json
+
+The labels file maps clip file names (without directory) to the list of
+spells expected in order, e.g. {"wave1.mp4": ["Clockwise + down"]}.
+Runs on CPU only; no camera or display is needed.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from spellbook import SpellBook, create_recognizer, DEFAULT_SPELLBOOK
+# Only landmarks here: sources pulls in MediaPipe and OpenCV, which replay_video imports itself
+from landmarks import load_landmarks, landmark_frames, save_landmarks
+
+STAGES = ("decode", "mediapipe", "classify", "annotate")
+
+class ClipRun:
+    def __init__(self, name):
+        self.name = name
+        self.stage_times = {stage: 0.0 for stage in STAGES}
+        self.frame_latency = []
+        self.spells = []
+
+    def add_frame(self, timings):
+        for stage, seconds in timings.items():
+            self.stage_times[stage] += seconds
+        self.frame_latency.append(sum(timings.values()))
+
+def replay_landmarks(path, recognizer):
+    tips, width, height, fps = load_landmarks(path)
+    run = ClipRun(os.path.basename(path))
+    recognizer.set_frame_size(width, height)
+    for finger_positions in landmark_frames(tips, width, height):
+        started = time.perf_counter()
+        result = recognizer.update(finger_positions)
+        run.add_frame({"classify": time.perf_counter() - started})
+        if result.combo:
+            run.spells.append(result.combo)
+    return run
+
+def replay_video(path, recognizer, annotate=False, record_dir=None, adaptive=None):
+    import cv2
+    from sources import HandTracker, AdaptiveHandTracker, open_capture
+    if annotate:
+        from annotation import draw_frame
+
+    run = ClipRun(os.path.basename(path))
+    tracker = HandTracker() if adaptive is None else AdaptiveHandTracker(**adaptive)
+    cap = open_capture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    recorded = []
+    width = height = 0
+    while True:
+        started = time.perf_counter()
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame = cv2.flip(frame, 1)
+        decoded = time.perf_counter()
+        hand_landmarks, finger_positions = tracker.track(frame)
+        height, width, _ = frame.shape
+        inferred = time.perf_counter()
+        result = recognizer.update(finger_positions, (width, height))
+        classified = time.perf_counter()
+        timings = {"decode": decoded - started, "mediapipe": inferred - decoded,
+                   "classify": classified - inferred}
+        if annotate:
+            draw_frame(frame, hand_landmarks, finger_positions, result)
+            timings["annotate"] = time.perf_counter() - classified
+        run.add_frame(timings)
+        if result.combo:
+            run.spells.append(result.combo)
+        if record_dir is not None:
+            if hand_landmarks is None:
+                recorded.append(np.full((3, 2), np.nan))
+            else:
+                recorded.append(finger_positions / (width, height))
+    cap.release()
+    tracker.close()
+
+    if record_dir is not None:
+        stem = os.path.splitext(run.name)[0]
+        save_landmarks(os.path.join(record_dir, stem + ".npz"), recorded, width, height, fps)
+    return run
+
+def summarize(runs, labels):
+    latency = np.array([t for run in runs for t in run.frame_latency])
+    frames = len(latency)
+    total = latency.sum()
+    stage_totals = {stage: sum(run.stage_times[stage] for run in runs) for stage in STAGES}
+    report = {
+        "clips": len(runs),
+        "frames": frames,
+        "fps": round(frames / total, 1) if total else 0.0,
+        "p50_ms": round(1000 * float(np.percentile(latency, 50)), 3) if frames else 0.0,
+        "p99_ms": round(1000 * float(np.percentile(latency, 99)), 3) if frames else 0.0,
+        "stage_ms_per_frame": {
+            stage: round(1000 * seconds / frames, 3) if frames else 0.0
+            for stage, seconds in stage_totals.items()
+        },
+        "spells": {run.name: run.spells for run in runs},
+    }
+    labelled = [run for run in runs if run.name in labels or os.path.splitext(run.name)[0] in labels]
+    if labelled:
+        def expected(run):
+            return labels.get(run.name, labels.get(os.path.splitext(run.name)[0]))
+        correct = sum(run.spells == expected(run) for run in labelled)
+        report["accuracy"] = round(correct / len(labelled), 3)
+        report["misclassified"] = {
+            run.name: {"expected": expected(run), "got": run.spells}
+            for run in labelled if run.spells != expected(run)
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="Video files or .npz/.json landmark streams")
+    parser.add_argument("--labels", help="JSON file mapping clip names to expected spells")
+    parser.add_argument("--annotate", action="store_true", help="Also time drawing onto frames")
+    parser.add_argument("--record-landmarks", metavar="DIR",
+                        help="Save fingertip streams of video inputs to DIR for later replay")
+    parser.add_argument("--adaptive", action="store_true", help="Use ROI/downscaled/skipped inference")
+    parser.add_argument("--downscale", type=float, default=0.5)
+    parser.add_argument("--infer-every", type=int, default=1)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    parser.add_argument("--recognizer", choices=["classic", "template"], default="classic")
+    parser.add_argument("--spellbook", default=DEFAULT_SPELLBOOK)
+    args = parser.parse_args()
+    spellbook = SpellBook.load(args.spellbook)
+    adaptive = None
+    if args.adaptive:
+        adaptive = {"downscale": args.downscale, "infer_every": args.infer_every, "budget_ms": args.budget_ms}
+
+    labels = {}
+    if args.labels:
+        with open(args.labels) as f:
+            labels = json.load(f)
+    if args.record_landmarks:
+        os.makedirs(args.record_landmarks, exist_ok=True)
+
+    runs = []
+    for path in args.inputs:
+        if path.endswith((".npz", ".json")):
+            runs.append(replay_landmarks(path, create_recognizer(args.recognizer, spellbook)))
+        else:
+            runs.append(replay_video(path, create_recognizer(args.recognizer, spellbook),
+                                     args.annotate, args.record_landmarks, adaptive))
+    print(json.dumps(summarize(runs, labels), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Spell matching cost against spellbook size.
+
+Grows the shipped spellbook with random smooth strokes up to each requested
+size and matches noisy copies of the templates against it. Reports matching
+time per query, how many templates needed full DTW after lower-bound pruning,
+and whether the pruned search agrees with exhaustive DTW.
+
+    python benchmarks/bench_spellbook.py [--sizes 4 16 64 256 1024] [--queries 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from spellbook import SpellBook
+
+def random_stroke(rng, points=40):
+    """Smooth random walk, roughly like a hand-drawn stroke."""
+    heading = np.cumsum(rng.normal(0, 0.35, size=points)) + rng.uniform(0, 2 * np.pi)
+    return np.cumsum(np.stack([np.cos(heading), np.sin(heading)], axis=1), axis=0)
+
+def grow(spellbook, size, rng):
+    for n in range(len(spellbook), size):
+        spellbook.add(f"random-{n}", random_stroke(rng), rebuild=False)
+    spellbook._rebuild()
+    return spellbook
+
+def noisy_queries(spellbook, count, rng):
+    queries = []
+    for _ in range(count):
+        index = int(rng.integers(len(spellbook)))
+        template = spellbook.templates[index] * rng.uniform(80, 300)
+        queries.append((spellbook.names[index], template + rng.normal(0, 2.0, size=template.shape)))
+    return queries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 16, 64, 256, 1024])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--exhaustive-limit", type=int, default=256,
+                        help="Skip the exhaustive comparison above this many templates")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    print(f"{'spells':>7} {'us/query':>10} {'dtw/query':>10} {'exhaustive us':>14} {'agree':>7} {'correct':>8}")
+    spellbook = SpellBook.load()
+    for size in sorted(args.sizes):
+        grow(spellbook, size, rng)
+        queries = noisy_queries(spellbook, args.queries, rng)
+
+        spellbook.dtw_evaluations = 0
+        started = time.perf_counter()
+        pruned = [spellbook.match(query)[0] for _, query in queries]
+        pruned_time = time.perf_counter() - started
+        dtw_per_query = spellbook.dtw_evaluations / len(queries)
+        correct = sum(name == expected for name, (expected, _) in zip(pruned, queries)) / len(queries)
+
+        exhaustive_us, agree = "-", "-"
+        if size <= args.exhaustive_limit:
+            started = time.perf_counter()
+            exhaustive = [spellbook.match_exhaustive(query)[0] for _, query in queries]
+            exhaustive_us = f"{1e6 * (time.perf_counter() - started) / len(queries):.1f}"
+            agree = f"{sum(a == b for a, b in zip(pruned, exhaustive)) / len(queries):.3f}"
+
+        print(f"{len(spellbook):>7} {1e6 * pruned_time / len(queries):>10.1f} {dtw_per_query:>10.2f} "
+              f"{exhaustive_us:>14} {agree:>7} {correct:>8.3f}")
+
+if __name__ == "__main__":
+    main()
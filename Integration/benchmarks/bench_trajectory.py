@@ -0,0 +1,148 @@
+"""Compare the original per-point trajectory code with the NumPy ring buffer.
+
+Trajectories are either loaded from recordings (.npy/.json arrays of (x, y)
+centroids, one file per gesture) or synthesised as noisy arcs and swipes.
+Both paths replay every frame and must classify identically.
+
+    python benchmarks/bench_trajectory.py [--recording path ...] [--repeat 20]
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from trajectory import TrajectoryBuffer, detect_curve, is_pinching, centroid
+
+CURVE_THRESHOLD = 0.3
+MIN_CURVE_POINTS = 12
+PINCH_THRESHOLD = 80
+
+def legacy_detect_curve(positions):
+    if len(positions) < MIN_CURVE_POINTS:
+        return None
+    direction_changes = []
+    cross_products = []
+    for i in range(1, len(positions)-1):
+        v1 = (positions[i][0] - positions[i-1][0], positions[i][1] - positions[i-1][1])
+        v2 = (positions[i+1][0] - positions[i][0], positions[i+1][1] - positions[i][1])
+        if v1[0] == 0 and v1[1] == 0 or v2[0] == 0 and v2[1] == 0:
+            continue
+        dot = v1[0]*v2[0] + v1[1]*v2[1]
+        det = v1[0]*v2[1] - v1[1]*v2[0]
+        direction_changes.append(math.atan2(det, dot))
+        cross_products.append(det)
+    if not direction_changes:
+        return None
+    avg_direction_change = sum(direction_changes) / len(direction_changes)
+    total_rotation = sum(cross_products)
+    if abs(avg_direction_change) < CURVE_THRESHOLD:
+        return "clockwise" if total_rotation > 0 else "counter-clockwise"
+    return None
+
+def legacy_is_pinching(finger_positions):
+    thumb, index, middle = finger_positions
+    return (math.dist(thumb, index) < PINCH_THRESHOLD and
+            math.dist(thumb, middle) < PINCH_THRESHOLD and
+            math.dist(index, middle) < PINCH_THRESHOLD)
+
+def legacy_replay(fingers):
+    history = deque(maxlen=30)
+    labels = []
+    for finger_positions in fingers:
+        finger_positions = [tuple(p) for p in finger_positions]
+        if not legacy_is_pinching(finger_positions):
+            history.clear()
+            labels.append(None)
+            continue
+        avg_x = sum(p[0] for p in finger_positions) // len(finger_positions)
+        avg_y = sum(p[1] for p in finger_positions) // len(finger_positions)
+        history.append((avg_x, avg_y))
+        dx = history[-1][0] - history[0][0]
+        dy = history[-1][1] - history[0][1]
+        labels.append((dx, dy, legacy_detect_curve(history)))
+    return labels
+
+def vectorized_replay(fingers):
+    history = TrajectoryBuffer(capacity=30)
+    labels = []
+    for finger_positions in fingers:
+        if not is_pinching(finger_positions, PINCH_THRESHOLD):
+            history.clear()
+            labels.append(None)
+            continue
+        history.append(centroid(finger_positions))
+        dx, dy = history.displacement()
+        labels.append((dx, dy, detect_curve(history.points(), CURVE_THRESHOLD, MIN_CURVE_POINTS)))
+    return labels
+
+def synthetic_trajectories(rng, count=40, frames=90):
+    """Noisy clockwise/counter-clockwise arcs and straight swipes, as fingertip triples."""
+    trajectories = []
+    for n in range(count):
+        t = np.linspace(0, 1, frames)
+        kind = n % 4
+        if kind < 2:
+            sweep = 2 * np.pi * (1 if kind == 0 else -1)
+            path = np.stack([320 + 120 * np.cos(sweep * t), 240 + 120 * np.sin(sweep * t)], axis=1)
+        else:
+            direction = rng.choice([-1, 1], size=2) * rng.uniform(0.2, 1.0, size=2)
+            path = np.array([320, 240]) + np.outer(t, direction * 250)
+        path += rng.normal(0, 2.0, size=path.shape)
+        spread = rng.uniform(10, 60, size=(frames, 3, 2))
+        fingers = (path[:, None, :] + spread - spread.mean(axis=1, keepdims=True)).astype(np.int64)
+        trajectories.append(fingers)
+    return trajectories
+
+def load_recording(path):
+    """A recording is an (frames, 3, 2) fingertip array, or (frames, 2) centroids."""
+    data = np.load(path) if path.endswith(".npy") else np.array(json.load(open(path)))
+    data = data.astype(np.int64)
+    if data.ndim == 2:
+        data = np.repeat(data[:, None, :], 3, axis=1)
+    return data
+
+def time_replay(replay, trajectories, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for fingers in trajectories:
+            replay(fingers)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recording", nargs="*", default=[], help=".npy/.json fingertip recordings")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    trajectories = [load_recording(path) for path in args.recording]
+    if not trajectories:
+        trajectories = synthetic_trajectories(np.random.default_rng(args.seed))
+    frames = sum(len(fingers) for fingers in trajectories)
+
+    mismatches = 0
+    for fingers in trajectories:
+        legacy = legacy_replay(fingers)
+        vectorized = vectorized_replay(fingers)
+        mismatches += sum(a != b for a, b in zip(legacy, vectorized))
+
+    legacy_time = time_replay(legacy_replay, trajectories, args.repeat)
+    vectorized_time = time_replay(vectorized_replay, trajectories, args.repeat)
+
+    print(f"trajectories: {len(trajectories)}  frames: {frames}")
+    print(f"legacy:      {1e6 * legacy_time / frames:8.2f} us/frame")
+    print(f"vectorized:  {1e6 * vectorized_time / frames:8.2f} us/frame")
+    print(f"speedup:     {legacy_time / vectorized_time:8.2f}x")
+    print(f"classification mismatches: {mismatches}")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
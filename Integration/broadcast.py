@@ -0,0 +1,143 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict, deque
+
+import cv2
+
+# Widths a viewer may ask for; any other ?width= snaps down to one of these,
+# so requests cannot mint an encoding (and a cache entry) per pixel
+STREAM_WIDTHS = (160, 240, 320, 480, 640, 800, 960, 1280, 1920)
+QUALITY_STEP = 5
+
+class RateCounter:
+    """Events per second over a sliding time window."""
+
+    def __init__(self, window=5.0):
+        self.window = window
+        self.total = 0
+        self._lock = threading.Lock()
+        self._events = deque()
+
+    def add(self, n=1):
+        now = time.monotonic()
+        with self._lock:
+            self.total += n
+            self._events.append((now, n))
+            while self._events and now - self._events[0][0] > self.window:
+                self._events.popleft()
+
+    def rate(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._events and now - self._events[0][0] > self.window:
+                self._events.popleft()
+            return round(sum(n for _, n in self._events) / self.window, 2)
+
+class FrameBroadcaster:
+    """Fans one stream of frames out to any number of MJPEG viewers.
+
+    Each published frame gets a sequence number and is JPEG-encoded at most once
+    per (quality, width) setting, no matter how many viewers ask for it. Settings
+    are snapped to STREAM_WIDTHS and steps of QUALITY_STEP, and only the
+    max_encodings most recently used are kept. Viewers
+    block until a newer frame exists; a slow viewer simply jumps to the latest
+    sequence number instead of queueing the ones it missed. close() ends every
+    viewer's stream.
+    """
+
+    def __init__(self, quality=80, width=None, max_encodings=8):
+        self.quality = quality
+        self.width = width
+        self.max_encodings = max_encodings
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._closed = False
+        self._encode_lock = threading.Lock()
+        self._encoded = OrderedDict()  # (quality, width) -> (seq, jpeg), least recently used first
+        self.viewers = 0
+        self.published = RateCounter()
+        self.encodes = RateCounter()
+        self.served = RateCounter()
+
+    def publish(self, frame):
+        with self._cond:
+            self._frame = frame
+            self._seq += 1
+            self._cond.notify_all()
+        self.published.add()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def wait_for_frame(self, last_seq, timeout=1.0):
+        """Newest (seq, frame) after last_seq, or (last_seq, None) on timeout or once closed."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > last_seq or self._closed, timeout) or self._closed:
+                return last_seq, None
+            return self._seq, self._frame
+
+    def encoded(self, seq, frame, quality, width):
+        key = (quality, width)
+        with self._encode_lock:
+            cached = self._encoded.get(key)
+            if cached and cached[0] == seq:
+                self._encoded.move_to_end(key)
+                return cached[1]
+            if width and frame.shape[1] > width:
+                height = max(1, int(frame.shape[0] * width / frame.shape[1]))
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            flag, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not flag:
+                return None
+            jpeg = jpeg.tobytes()
+            self._encoded[key] = (seq, jpeg)
+            self._encoded.move_to_end(key)
+            while len(self._encoded) > self.max_encodings:
+                self._encoded.popitem(last=False)
+            self.encodes.add()
+            return jpeg
+
+    @staticmethod
+    def settings(quality, width):
+        """(quality, width) clamped and snapped to what the broadcaster encodes; width None keeps full size."""
+        quality = max(10, min(95, round(quality / QUALITY_STEP) * QUALITY_STEP))
+        if width is not None:
+            width = STREAM_WIDTHS[max(0, bisect.bisect_right(STREAM_WIDTHS, width) - 1)]
+        return quality, width
+
+    def stream(self, quality=None, width=None):
+        quality, width = self.settings(self.quality if quality is None else quality,
+                                       self.width if width is None else width)
+        last_seq = 0
+        with self._cond:
+            self.viewers += 1
+        try:
+            while not self._closed:
+                seq, frame = self.wait_for_frame(last_seq)
+                if frame is None:
+                    continue
+                last_seq = seq
+                jpeg = self.encoded(seq, frame, quality, width)
+                if jpeg is None:
+                    continue
+                self.served.add()
+                yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' +
+                       jpeg + b'\r\n')
+        finally:
+            with self._cond:
+                self.viewers -= 1
+
+    def stats(self):
+        return {
+            "viewers": self.viewers,
+            "sequence": self._seq,
+            "frames_published_per_sec": self.published.rate(),
+            "encodes_per_sec": self.encodes.rate(),
+            "frames_served_per_sec": self.served.rate(),
+            "total_encodes": self.encodes.total,
+            "total_served": self.served.total,
+        }
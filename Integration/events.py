@@ -0,0 +1,69 @@
+import json
+import threading
+import time
+from collections import deque
+
+class GestureEvents:
+    """Bounded log of accepted gestures that clients can wait on and resume from.
+
+    Every event carries a monotonically increasing id and a timestamp. A client
+    that reconnects passes the last id it saw and receives everything newer that
+    is still in the log, so no spell is lost to a cooldown or a polling gap.
+
+    Ids count milliseconds since the epoch (bumped by one when two events share
+    a millisecond), so they keep growing across restarts: a client resuming
+    with an id from before a restart gets the new events rather than nothing.
+    An id ahead of ours (a clock set back, or garbage) resumes from now.
+    close() wakes every waiter and ends the streams.
+    """
+
+    def __init__(self, maxlen=256):
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=maxlen)
+        self._last_id = time.time_ns() // 1_000_000
+        self._closed = False
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, gesture):
+        with self._cond:
+            self._last_id = max(self._last_id + 1, time.time_ns() // 1_000_000)
+            event = {"id": self._last_id, "timestamp": time.time(), "gesture": gesture}
+            self._events.append(event)
+            self._cond.notify_all()
+        return event
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def since(self, last_id):
+        with self._cond:
+            last_id = min(last_id, self._last_id)
+            return [event for event in self._events if event["id"] > last_id]
+
+    def wait(self, last_id, timeout=25.0):
+        """Events newer than last_id, blocking up to timeout for the first one."""
+        with self._cond:
+            last_id = min(last_id, self._last_id)
+            self._cond.wait_for(lambda: self._last_id > last_id or self._closed, timeout)
+            return [event for event in self._events if event["id"] > last_id]
+
+    def stream(self, last_id=None, keepalive=15.0):
+        """Server-Sent Events generator. Without last_id only new events are sent."""
+        last_id = self._last_id if last_id is None else min(last_id, self._last_id)
+        yield "retry: 2000\n\n"
+        while True:
+            events = self.wait(last_id, keepalive)
+            if not events and self._closed:
+                return
+            if not events:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            for event in events:
+                last_id = event["id"]
+                yield f"id: {event['id']}\nevent: gesture\ndata: {json.dumps(event)}\n\n"
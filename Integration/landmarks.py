@@ -0,0 +1,39 @@
+"""Recorded fingertip streams: saved from a video once, replayed without MediaPipe or OpenCV."""
+import json
+
+import numpy as np
+
+def load_landmarks(path):
+    """Recorded fingertip stream as (tips, width, height, fps).
+
+    tips is a float (frames, 3, 2) array of normalized thumb/index/middle
+    coordinates, NaN on frames without a hand. Accepts .npz (tips, size, fps)
+    or .json ({"width", "height", "fps", "frames": [[[x, y] * 3] | null, ...]}).
+    """
+    if path.endswith(".npz"):
+        data = np.load(path)
+        width, height = (int(v) for v in data["size"])
+        return data["tips"].astype(np.float64), width, height, float(data["fps"])
+    with open(path) as f:
+        data = json.load(f)
+    tips = np.full((len(data["frames"]), 3, 2), np.nan)
+    for i, frame in enumerate(data["frames"]):
+        if frame is not None:
+            tips[i] = frame
+    return tips, int(data["width"]), int(data["height"]), float(data.get("fps", 30.0))
+
+def save_landmarks(path, tips, width, height, fps):
+    """Write a fingertip stream recorded from a video so it can be replayed without MediaPipe."""
+    tips = np.asarray(tips, dtype=np.float64)
+    if path.endswith(".npz"):
+        np.savez_compressed(path, tips=tips, size=np.array([width, height]), fps=np.array(fps))
+        return
+    frames = [None if np.isnan(frame).any() else frame.tolist() for frame in tips]
+    with open(path, "w") as f:
+        json.dump({"width": width, "height": height, "fps": fps, "frames": frames}, f)
+
+def landmark_frames(tips, width, height):
+    """Per-frame fingertip pixels (or None) for a recorded stream, ready for GestureRecognizer.update."""
+    pixels = (tips * (width, height))
+    for frame in pixels:
+        yield None if np.isnan(frame).any() else frame.astype(np.int64)
@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import deque
+
+class LatestFrameSlot:
+    """Single-slot hand-off between pipeline stages. A new frame replaces
+    one that has not been picked up yet, so consumers always see the newest."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            self._cond.wait_for(lambda: self._item is not None or self._closed, timeout)
+            item, self._item = self._item, None
+            return item
+
+    def pending(self):
+        with self._cond:
+            return self._item is not None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class StageStats:
+    """Rolling throughput and latency for one pipeline stage.
+
+    histogram, if given, also gets every latency, for /metrics percentiles
+    over the whole run rather than the last window frames.
+    """
+
+    def __init__(self, window=240, histogram=None):
+        self._lock = threading.Lock()
+        self._finished = deque(maxlen=window)
+        self._latency = deque(maxlen=window)
+        self.histogram = histogram
+
+    def record(self, started, finished=None):
+        finished = time.perf_counter() if finished is None else finished
+        with self._lock:
+            self._finished.append(finished)
+            self._latency.append(finished - started)
+        if self.histogram is not None:
+            self.histogram.record(finished - started)
+
+    def snapshot(self):
+        with self._lock:
+            finished = list(self._finished)
+            latency = sorted(self._latency)
+        if len(finished) < 2:
+            return {"fps": 0.0, "avg_ms": 0.0, "p95_ms": 0.0}
+        span = finished[-1] - finished[0]
+        return {
+            "fps": round((len(finished) - 1) / span, 2) if span > 0 else 0.0,
+            "avg_ms": round(1000 * sum(latency) / len(latency), 2),
+            "p95_ms": round(1000 * latency[int(0.95 * (len(latency) - 1))], 2),
+        }
@@ -0,0 +1,123 @@
+import math
+from collections import namedtuple
+
+from trajectory import TrajectoryBuffer, detect_curve, is_pinching, centroid
+
+# Curve followed by swipe -> accepted spell, used when no spellbook is given
+COMBOS = {
+    ("clockwise", "down"): "Clockwise + down",
+    ("clockwise", "left"): "Clockwise + Left",
+    ("counter-clockwise", "up"): "Counter-Clockwise + up",
+    ("counter-clockwise", "right"): "Counter-Clockwise + Right",
+}
+
+# Pixel thresholds were tuned on a 640x480 camera; they are stored as a fraction
+# of the frame diagonal so results do not depend on capture or inference resolution
+REFERENCE_DIAGONAL = math.hypot(640, 480)
+
+# What happened on one frame: swipe/curve/combo are only set on the frame they were detected
+FrameResult = namedtuple("FrameResult", ["hand", "pinching", "path", "swipe", "curve", "combo"])
+
+class GestureRecognizer:
+    """Pinch-swipe-curve state machine, fed one frame of fingertip positions at a time.
+
+    It knows nothing about cameras, MediaPipe or drawing, so the same instance can
+    be driven by the live server, a video file or a recorded landmark stream.
+    """
+
+    def __init__(self, swipe_threshold=110 / REFERENCE_DIAGONAL, curve_threshold=0.3, min_curve_points=12,
+                 cooldown_frames=60, pinch_threshold=80 / REFERENCE_DIAGONAL, history=30,
+                 frame_size=(640, 480), combos=None):
+        self.combos = COMBOS if combos is None else combos
+        # Swipe and pinch thresholds are fractions of the frame diagonal
+        self.swipe_fraction = swipe_threshold
+        self.pinch_fraction = pinch_threshold  # Max distance between fingers to consider a pinch
+        self.curve_threshold = curve_threshold
+        self.min_curve_points = min_curve_points
+        self.cooldown_frames = cooldown_frames
+        self.frame_size = None
+        self.set_frame_size(*frame_size)
+        self.position_history = TrajectoryBuffer(capacity=history)
+        self.frame_count = 0
+        self.cooldown_counter = 0
+        self.last_swipe = None
+        self.last_curve = None
+        self.combo_detected = False
+        self.gesture = None
+
+    def set_frame_size(self, width, height):
+        """Rescale the pixel thresholds to the resolution fingertips are reported in."""
+        if self.frame_size == (width, height):
+            return
+        if self.frame_size is not None:
+            # Positions already in the history were measured at the old resolution
+            self.reset_tracking()
+        self.frame_size = (width, height)
+        diagonal = math.hypot(width, height)
+        self.swipe_threshold = self.swipe_fraction * diagonal
+        self.pinch_threshold = self.pinch_fraction * diagonal
+
+    def reset_tracking(self):
+        self.position_history.clear()
+        self.frame_count = 0
+        self.last_swipe = None
+        self.last_curve = None
+
+    def classify_swipe(self, dx, dy):
+        if abs(dx) > self.swipe_threshold and abs(dx) > abs(dy):
+            return "right" if dx > 0 else "left"
+        if abs(dy) > self.swipe_threshold and abs(dy) > abs(dx):
+            return "down" if dy > 0 else "up"
+        return None
+
+    def update(self, finger_positions, frame_size=None):
+        """Advance one frame.
+
+        finger_positions is a (3, 2) int array of thumb, index and middle tip pixels,
+        or None when no hand was found. frame_size is the (width, height) those
+        pixels refer to, if it may differ from the last frame.
+        """
+        if frame_size is not None:
+            self.set_frame_size(*frame_size)
+        # Cooldown mechanism
+        if self.cooldown_counter > 0:
+            self.cooldown_counter -= 1
+        else:
+            self.combo_detected = False
+            self.gesture = None
+
+        if finger_positions is None:
+            self.reset_tracking()
+            return FrameResult(False, False, None, None, None, None)
+
+        if not is_pinching(finger_positions, self.pinch_threshold):
+            self.reset_tracking()
+            return FrameResult(True, False, None, None, None, None)
+
+        # Store average position of all fingers
+        self.position_history.append(centroid(finger_positions))
+        self.frame_count += 1
+        path = self.position_history.points()
+        swipe = curve = combo = None
+
+        # Detect gestures after collecting enough frames
+        if self.frame_count > 5 and len(self.position_history) > 5 and not self.combo_detected:
+            swipe = self.classify_swipe(*self.position_history.displacement())
+            if swipe:
+                self.last_swipe = swipe
+
+            curve = detect_curve(path, self.curve_threshold, self.min_curve_points)
+            if curve:
+                self.last_curve = curve
+
+            if self.last_swipe and self.last_curve:
+                combo = self.combos.get((self.last_curve, self.last_swipe))
+                if combo:
+                    self.combo_detected = True
+                    self.cooldown_counter = self.cooldown_frames
+                    self.gesture = combo
+                # Reset after checking
+                self.last_swipe = None
+                self.last_curve = None
+
+        return FrameResult(True, True, path, swipe, curve, combo)
@@ -0,0 +1,243 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+
+import cv2
+import numpy as np
+
+from annotation import draw_frame
+from broadcast import FrameBroadcaster, RateCounter
+from events import GestureEvents
+from pipeline import LatestFrameSlot, StageStats
+from sources import HandTracker, AdaptiveHandTracker, open_capture, is_live
+from spellbook import create_recognizer
+
+class Session:
+    """One player: a frame source plus its own tracker, recognizer, stream and events.
+
+    source is a camera index, a video file path, or "upload" for frames pushed
+    over HTTP. Frames land in a single-slot queue; the shared InferencePool
+    picks them up, so a session never holds more than one pending frame.
+    Stopping a session closes its tracker and ends its video and event streams.
+    """
+
+    def __init__(self, session_id, source, spellbook, recognizer="classic", adaptive=None,
+                 loop=False, quality=80, width=None):
+        self.id = session_id
+        self.source = source
+        self.loop = loop
+        self.created = time.time()
+        self.tracker = HandTracker() if adaptive is None else AdaptiveHandTracker(**adaptive)
+        self.recognizer = create_recognizer(recognizer, spellbook)
+        self.broadcaster = FrameBroadcaster(quality=quality, width=width)
+        self.events = GestureEvents()
+        self.slot = LatestFrameSlot()
+        self.stats = {"capture": StageStats(), "inference": StageStats(), "end_to_end": StageStats()}
+        self.processed = RateCounter()
+        self.status = "running"
+        self.error = None
+        self.pool = None
+        self._frame_id = 0
+        self._stop = threading.Event()
+        # Held while a frame is processed, so stop() never closes the tracker under a worker
+        self._process_lock = threading.Lock()
+        self._capture_thread = None
+
+    @property
+    def gesture(self):
+        return self.recognizer.gesture
+
+    def start(self, pool):
+        self.pool = pool
+        if self.source != "upload":
+            self._capture_thread = threading.Thread(target=self._capture, daemon=True)
+            self._capture_thread.start()
+
+    def stop(self, status="closed"):
+        self._stop.set()
+        self.slot.close()
+        self.status = status
+        self.broadcaster.close()
+        self.events.close()
+        with self._process_lock:
+            if self.tracker is not None:
+                self.tracker.close()
+                self.tracker = None
+
+    def fail(self, error):
+        """Stop a session whose frame processing raised, keeping the error for /sessions."""
+        self.error = f"{type(error).__name__}: {error}"
+        self.stop("failed")
+
+    def submit(self, frame, captured_at=None):
+        """Queue a BGR frame, replacing any frame the pool has not picked up yet."""
+        captured_at = time.perf_counter() if captured_at is None else captured_at
+        self._frame_id += 1
+        self.slot.put((self._frame_id, captured_at, frame))
+        self.pool.notify(self)
+
+    def _capture(self):
+        cap = open_capture(self.source)
+        live = is_live(cap)
+        interval = 0.0 if live else 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 30.0)
+        while cap.isOpened() and not self._stop.is_set():
+            started = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                if live:
+                    continue
+                if self.loop:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                break
+            captured_at = time.perf_counter()
+            self.stats["capture"].record(started, captured_at)
+            self.submit(frame, captured_at)
+            if interval:
+                # Play files back at their own frame rate rather than as fast as they decode
+                time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+        cap.release()
+        if self.status == "running":
+            self.status = "ended"
+
+    def process(self):
+        """Run one pending frame through tracking, recognition and drawing. Called by pool workers."""
+        packet = self.slot.get(timeout=0)
+        if packet is None:
+            return False
+        frame_id, captured_at, frame = packet
+        with self._process_lock:
+            if self.tracker is None:
+                return False
+            started = time.perf_counter()
+            frame = cv2.flip(frame, 1)
+            hand_landmarks, finger_positions = self.tracker.track(frame)
+        self.stats["inference"].record(started)
+        height, width, _ = frame.shape
+        result = self.recognizer.update(finger_positions, (width, height))
+        if result.combo:
+            self.events.publish(result.combo)
+        draw_frame(frame, hand_landmarks, finger_positions, result)
+        self.broadcaster.publish(frame)
+        self.stats["end_to_end"].record(captured_at)
+        self.processed.add()
+        return True
+
+    def snapshot(self):
+        return {
+            "id": self.id,
+            "source": str(self.source),
+            "status": self.status,
+            "error": self.error,
+            "gesture": self.gesture,
+            "frames_per_sec": self.processed.rate(),
+            "frames_processed": self.processed.total,
+            "frames_dropped": self.slot.dropped,
+            "stages": {name: stage.snapshot() for name, stage in self.stats.items()},
+            "stream": self.broadcaster.stats(),
+        }
+
+class InferencePool:
+    """Bounded set of worker threads shared by every session.
+
+    Sessions with a pending frame wait in a round-robin ready queue; a session is
+    in the queue at most once and is never processed by two workers at a time,
+    so its tracker keeps a consistent frame order and no player can starve the others.
+    A session whose frame raises is marked failed; the worker moves on to the next.
+    """
+
+    def __init__(self, workers=2):
+        self._cond = threading.Condition()
+        self._ready = deque()
+        self._queued = set()
+        self._busy = set()
+        self._closed = False
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def workers(self):
+        return len(self._threads)
+
+    def notify(self, session):
+        with self._cond:
+            if session.id in self._queued or session.id in self._busy:
+                return
+            self._queued.add(session.id)
+            self._ready.append(session)
+            self._cond.notify()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._ready or self._closed)
+                if self._closed:
+                    return
+                session = self._ready.popleft()
+                self._queued.discard(session.id)
+                self._busy.add(session.id)
+            try:
+                session.process()
+            except Exception as e:
+                traceback.print_exc()
+                session.fail(e)
+            finally:
+                with self._cond:
+                    self._busy.discard(session.id)
+            # A frame that arrived while this one was processed goes to the back of the line
+            if session.status not in ("closed", "failed") and session.slot.pending():
+                self.notify(session)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            return {"workers": self.workers, "ready": len(self._ready), "busy": len(self._busy)}
+
+class SessionManager:
+    """Creates, looks up and closes sessions that share one InferencePool."""
+
+    def __init__(self, spellbook, workers=2, max_sessions=32):
+        self.spellbook = spellbook
+        self.max_sessions = max_sessions
+        self.pool = InferencePool(workers)
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def create(self, source, session_id=None, **options):
+        session_id = session_id or uuid.uuid4().hex[:8]
+        with self._lock:
+            if session_id in self._sessions:
+                raise ValueError(f"Session {session_id} already exists")
+            if len(self._sessions) >= self.max_sessions:
+                raise ValueError(f"Session limit of {self.max_sessions} reached")
+            session = Session(session_id, source, self.spellbook, **options)
+            self._sessions[session_id] = session
+        session.start(self.pool)
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def close(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.stop()
+        return session
+
+    def snapshot(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {"pool": self.pool.snapshot(), "sessions": [session.snapshot() for session in sessions]}
+
+def decode_upload(data):
+    """BGR frame from an uploaded JPEG/PNG body, or None if it cannot be decoded."""
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
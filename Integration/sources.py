@@ -0,0 +1,172 @@
+import time
+from collections import deque
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from trajectory import landmarks_to_pixels
+
+FINGER_TIP_IDS = [4, 8, 12]  # thumb(4), Index (8), Middle (12)
+
+class HandTracker:
+    """MediaPipe Hands wrapper returning the tracked hand and its fingertip pixels."""
+
+    def __init__(self, min_detection_confidence=0.7, min_tracking_confidence=0.7, static_image_mode=False):
+        self.hands = mp.solutions.hands.Hands(
+            static_image_mode=static_image_mode,
+            max_num_hands=1,
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence)
+
+    def process(self, frame):
+        """MediaPipe results for an already mirrored BGR frame."""
+        return self.hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+    def fingertips(self, results, width, height):
+        """(hand_landmarks, (3, 2) fingertip pixels), or (None, None) without a hand."""
+        if not results.multi_hand_landmarks:
+            return None, None
+        hand_landmarks = results.multi_hand_landmarks[0]
+        return hand_landmarks, landmarks_to_pixels(hand_landmarks.landmark, FINGER_TIP_IDS, width, height)
+
+    def track(self, frame):
+        """(hand_landmarks, fingertip pixels) for a mirrored BGR frame."""
+        height, width = frame.shape[:2]
+        return self.fingertips(self.process(frame), width, height)
+
+    def close(self):
+        self.hands.close()
+
+class AdaptiveHandTracker(HandTracker):
+    """HandTracker that spends less inference per frame while a hand is tracked.
+
+    Once tracking has been stable for a few frames, MediaPipe only sees a crop
+    around the last landmarks, optionally downscaled. With a time budget set,
+    inference runs only every Nth frame while it is over budget, and fingertips
+    in between are extrapolated from the last two detections. Losing the hand in
+    the crop falls straight back to full-frame detection on the same frame.
+    Landmarks are always returned in full-frame coordinates.
+    """
+
+    def __init__(self, downscale=0.5, roi_margin=0.3, min_roi=0.25, stable_frames=5,
+                 infer_every=1, max_skip=4, budget_ms=None, **kwargs):
+        super().__init__(**kwargs)
+        self.downscale = downscale
+        self.roi_margin = roi_margin
+        self.min_roi = min_roi
+        self.stable_frames = stable_frames
+        self.infer_every = infer_every
+        self.max_skip = max_skip
+        self.budget_ms = budget_ms
+        self.skip = infer_every
+        self.roi = None  # Normalized (x0, y0, x1, y1) of the crop
+        self.stable = 0
+        self.frame_index = 0
+        self.since_inference = 0
+        self.inference_ms = None
+        self.last_landmarks = None
+        self.detections = deque(maxlen=2)  # (frame_index, normalized tips)
+        self.stats = {"full": 0, "roi": 0, "lost": 0, "skipped": 0}
+
+    def track(self, frame):
+        height, width = frame.shape[:2]
+        self.frame_index += 1
+
+        if self.last_landmarks is not None and self.since_inference + 1 < self.skip:
+            self.since_inference += 1
+            self.stats["skipped"] += 1
+            return self.last_landmarks, self._predict(width, height)
+        self.since_inference = 0
+
+        started = time.perf_counter()
+        hand_landmarks = None
+        if self.roi is not None and self.stable >= self.stable_frames:
+            hand_landmarks = self._infer(frame, self.roi)
+            self.stats["roi" if hand_landmarks is not None else "lost"] += 1
+        if hand_landmarks is None:
+            hand_landmarks = self._infer(frame, None)
+            self.stats["full"] += 1
+        self._adjust_skip(time.perf_counter() - started)
+
+        if hand_landmarks is None:
+            self.roi = None
+            self.stable = 0
+            self.last_landmarks = None
+            self.detections.clear()
+            return None, None
+
+        tips = np.array([(hand_landmarks.landmark[i].x, hand_landmarks.landmark[i].y) for i in FINGER_TIP_IDS])
+        self.detections.append((self.frame_index, tips))
+        self.last_landmarks = hand_landmarks
+        self.stable += 1
+        self._update_roi(hand_landmarks)
+        return hand_landmarks, (tips * (width, height)).astype(np.int64)
+
+    def _infer(self, frame, roi):
+        """Run MediaPipe on the whole frame or a downscaled crop; landmarks come back full-frame."""
+        if roi is None:
+            results = self.process(frame)
+            return results.multi_hand_landmarks[0] if results.multi_hand_landmarks else None
+
+        height, width = frame.shape[:2]
+        x0, y0, x1, y1 = roi
+        crop = frame[int(y0 * height):int(y1 * height), int(x0 * width):int(x1 * width)]
+        if crop.size == 0:
+            return None
+        if self.downscale < 1.0:
+            crop = cv2.resize(crop, None, fx=self.downscale, fy=self.downscale, interpolation=cv2.INTER_AREA)
+        results = self.process(crop)
+        if not results.multi_hand_landmarks:
+            return None
+        hand_landmarks = results.multi_hand_landmarks[0]
+        for landmark in hand_landmarks.landmark:
+            landmark.x = x0 + landmark.x * (x1 - x0)
+            landmark.y = y0 + landmark.y * (y1 - y0)
+        return hand_landmarks
+
+    def _update_roi(self, hand_landmarks):
+        xs = [landmark.x for landmark in hand_landmarks.landmark]
+        ys = [landmark.y for landmark in hand_landmarks.landmark]
+        bx0, by0, bx1, by1 = min(xs), min(ys), max(xs), max(ys)
+        if self.roi is not None:
+            # Keep the crop steady while the hand stays well inside it
+            x0, y0, x1, y1 = self.roi
+            inner_x = (x1 - x0) * self.roi_margin / 4
+            inner_y = (y1 - y0) * self.roi_margin / 4
+            if bx0 > x0 + inner_x and by0 > y0 + inner_y and bx1 < x1 - inner_x and by1 < y1 - inner_y:
+                return
+        half_w = max((bx1 - bx0) * (1 + 2 * self.roi_margin), self.min_roi) / 2
+        half_h = max((by1 - by0) * (1 + 2 * self.roi_margin), self.min_roi) / 2
+        cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+        self.roi = (max(0.0, cx - half_w), max(0.0, cy - half_h),
+                    min(1.0, cx + half_w), min(1.0, cy + half_h))
+
+    def _predict(self, width, height):
+        """Fingertips for a skipped frame, extrapolated from the last two detections."""
+        frame, tips = self.detections[-1]
+        if len(self.detections) == 2:
+            previous_frame, previous_tips = self.detections[0]
+            velocity = (tips - previous_tips) / (frame - previous_frame)
+            tips = tips + velocity * (self.frame_index - frame)
+        return (np.clip(tips, 0.0, 1.0) * (width, height)).astype(np.int64)
+
+    def _adjust_skip(self, seconds):
+        elapsed_ms = 1000 * seconds
+        self.inference_ms = elapsed_ms if self.inference_ms is None else 0.8 * self.inference_ms + 0.2 * elapsed_ms
+        if self.budget_ms is None:
+            return
+        if self.inference_ms > self.budget_ms:
+            self.skip = min(self.skip + 1, self.max_skip)
+        elif self.inference_ms < self.budget_ms / 2 and self.skip > self.infer_every:
+            self.skip -= 1
+
+def open_capture(source):
+    """cv2.VideoCapture for a camera index ("0", 0) or a video file path."""
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    return cv2.VideoCapture(source)
+
+def is_live(cap):
+    # Files report a frame count, cameras do not
+    return cap.get(cv2.CAP_PROP_FRAME_COUNT) <= 0
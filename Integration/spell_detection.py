@@ -1,283 +1,179 @@
 import cv2
-import mediapipe as mp
-import numpy as np
-from collections import deque
-import math
-from flask import Flask, Response, render_template
+from flask import Flask, Response, render_template, jsonify, request, abort
+import os
+import sys
 import threading
 import time
+from broadcast import FrameBroadcaster
+from pipeline import LatestFrameSlot, StageStats
+from events import GestureEvents
+from annotation import draw_frame
+from spellbook import SpellBook, create_recognizer, DEFAULT_SPELLBOOK, RECOGNIZERS
+from sources import HandTracker, AdaptiveHandTracker, open_capture, is_live
+from sessions import SessionManager, decode_upload
+
+# Metrics shared with the chain nodes
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Instrumentation"))
+from metrics import REGISTRY
+from endpoints import instrument_app
 
 app = Flask(__name__)
+profiler = instrument_app(app)
 
 # Global variables for the application
 frame_lock = threading.Lock()
 output_frame = None
 gesture_detected = None
+broadcaster = FrameBroadcaster(quality=80)
+gesture_events = GestureEvents()
+hand_tracker = None
+# Recognizer of the single-player camera, which picks the instructions index.html shows
+default_recognizer = "classic"
+# Multi-player sessions, created on startup when --workers is given
+session_manager = None
+# Directory whose video files sessions may play, set by --video-dir; None allows cameras and uploads only
+video_dir = None
+# AdaptiveHandTracker options a session may set, all numbers
+ADAPTIVE_OPTIONS = ("downscale", "roi_margin", "min_roi", "stable_frames", "infer_every", "max_skip", "budget_ms")
 
-def detect_gestures():
-    global output_frame, gesture_detected
-    
-    mp_hands = mp.solutions.hands
-    hands = mp_hands.Hands(
-        static_image_mode=False,
-        max_num_hands=1,
-        min_detection_confidence=0.7,
-        min_tracking_confidence=0.7)
-    mp_drawing = mp.solutions.drawing_utils
-
-    # For gesture detection
-    finger_tip_ids = [4, 8, 12]  # thumb(4), Index (8), Middle (12)
-    position_history = deque(maxlen=30)
-    swipe_threshold = 110 
-    curve_threshold = 0.3
-    min_curve_points = 12
-    cooldown_frames = 60 
-    frame_count = 0
-    swipe_detected = False
-    curve_detected = False
-    cooldown_counter = 0
-    pinch_threshold = 80  # Max distance between fingers to consider a pinch
-
-    # New state variables for combined gestures
-    last_swipe = None
-    last_curve = None
-    combo_detected = False
-
-    cap = cv2.VideoCapture(0)
-
-    def detect_curve(positions):
-        if len(positions) < min_curve_points:
-            return None
-        
-        direction_changes = []
-        cross_products = []
-        
-        for i in range(1, len(positions)-1):
-            v1 = (positions[i][0] - positions[i-1][0], 
-                positions[i][1] - positions[i-1][1])
-            v2 = (positions[i+1][0] - positions[i][0], 
-                positions[i+1][1] - positions[i][1])
-            
-            if v1[0] == 0 and v1[1] == 0 or v2[0] == 0 and v2[1] == 0:
-                continue
-                
-            dot = v1[0]*v2[0] + v1[1]*v2[1]
-            det = v1[0]*v2[1] - v1[1]*v2[0]
-            angle = math.atan2(det, dot)
-            direction_changes.append(angle)
-            cross_products.append(det)
-        
-        if not direction_changes:
-            return None
-        
-        avg_direction_change = sum(direction_changes) / len(direction_changes)
-        total_rotation = sum(cross_products)
-        
-        if abs(avg_direction_change) < curve_threshold:
-            return "clockwise" if total_rotation > 0 else "counter-clockwise"
-        return None
-
-    def is_pinching(finger_positions):
-        #pinching check
-        thumb, index, middle = finger_positions
-        # Calculate distances between fingers
-        dist_thumb_index = math.dist(thumb, index)
-        dist_thumb_middle = math.dist(thumb, middle)
-        dist_index_middle = math.dist(index, middle)
-        
-        # All distances must be below threshold
-        return (dist_thumb_index < pinch_threshold and 
-                dist_thumb_middle < pinch_threshold and 
-                dist_index_middle < pinch_threshold)
-
-    while cap.isOpened():
+pipeline_stats = {
+    name: StageStats(histogram=REGISTRY.histogram(
+        "frame_stage_duration_seconds", "Time a frame spends in each pipeline stage", stage=name))
+    for name in ("capture", "inference", "annotate", "end_to_end")
+}
+capture_slot = LatestFrameSlot()
+inference_slot = LatestFrameSlot()
+REGISTRY.gauge("frames_dropped", "Frames replaced before the next stage took them",
+               lambda: capture_slot.dropped, stage="capture")
+REGISTRY.gauge("frames_dropped", "Frames replaced before the next stage took them",
+               lambda: inference_slot.dropped, stage="inference")
+REGISTRY.collect("video_stream", "MJPEG broadcaster counters", broadcaster.stats)
+
+def count_spell(combo):
+    REGISTRY.counter("spells_accepted_total", "Spells recognised, by combo", combo=combo).inc()
+
+def capture_frames(cap, slot, stop_event):
+    """Capture stage: keep draining the camera so the driver buffer never holds stale frames."""
+    frame_id = 0
+    live = is_live(cap)
+    while cap.isOpened() and not stop_event.is_set():
+        started = time.perf_counter()
         ret, frame = cap.read()
         if not ret:
+            if live:
+                continue
+            break
+        frame_id += 1
+        captured_at = time.perf_counter()
+        pipeline_stats["capture"].record(started, captured_at)
+        slot.put((frame_id, captured_at, frame))
+    slot.close()
+
+def run_inference(tracker, in_slot, out_slot, stop_event):
+    """Inference stage: mirror the newest captured frame and run MediaPipe on it."""
+    while not stop_event.is_set():
+        packet = in_slot.get(timeout=0.5)
+        if packet is None:
             continue
-        
+        frame_id, captured_at, frame = packet
+        started = time.perf_counter()
         frame = cv2.flip(frame, 1)
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = hands.process(image)
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        
-        # Cooldown mechanism
-        if cooldown_counter > 0:
-            cooldown_counter -= 1
-        else:
-            swipe_detected = False
-            curve_detected = False
-            combo_detected = False
-            gesture_detected = None
-        
-        if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
-                mp_drawing.draw_landmarks(
-                    image, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-                
-                # Track all finger tips
-                finger_positions = []
-                for id in finger_tip_ids:
-                    landmark = hand_landmarks.landmark[id]
-                    height, width, _ = image.shape
-                    cx, cy = int(landmark.x * width), int(landmark.y * height)
-                    finger_positions.append((cx, cy))
-                    
-                    # Draw finger tips and labels
-                    cv2.circle(image, (cx, cy), 10, (0, 255, 0), cv2.FILLED)
-                    if id == 4:
-                        finger_name = "Thumb"
-                    elif id == 8:
-                        finger_name = "Index"
-                    elif id == 12:
-                        finger_name = "Middle"
-                    
-                    cv2.putText(image, finger_name, (cx-20, cy-20), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
-                
-                # Check if fingers are pinching
-                pinching = is_pinching(finger_positions)
-                
-                # Only track movement if pinching
-                if pinching:
-                    # Store average position of all fingers
-                    avg_x = sum(p[0] for p in finger_positions) // len(finger_positions)
-                    avg_y = sum(p[1] for p in finger_positions) // len(finger_positions)
-                    position_history.append((avg_x, avg_y))
-                    frame_count += 1
-                    
-                    # Draw the movement path
-                    for i in range(1, len(position_history)):
-                        cv2.line(image, position_history[i-1], position_history[i], (255, 0, 0), 2)
-                    
-                    # Detect gestures after collecting enough frames
-                    if frame_count > 5 and len(position_history) > 5:
-                        start_x, start_y = position_history[0]
-                        end_x, end_y = position_history[-1]
-                        
-                        dx = end_x - start_x
-                        dy = end_y - start_y
-                        
-                        # Detect swipe if not in cooldown
-                        if not swipe_detected and not curve_detected and not combo_detected:
-                            if abs(dx) > swipe_threshold and abs(dx) > abs(dy):
-                                if dx > 0:
-                                    last_swipe = "right"
-                                    cv2.putText(image, "SWIPE RIGHT", (50, 50), 
-                                               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                                elif dx < 0:
-                                    last_swipe = "left"
-                                    cv2.putText(image, "SWIPE LEFT", (50, 50), 
-                                               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                            
-                            elif abs(dy) > swipe_threshold and abs(dy) > abs(dx):
-                                if dy > 0:
-                                    last_swipe="down"
-                                    cv2.putText(image, "SWIPE DOWN", (50, 50), 
-                                               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                                elif dy < 0:
-                                    last_swipe="up"
-                                    cv2.putText(image, "SWIPE UP", (50, 50), 
-                                               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                        
-                        # Detect curve motion
-                        if len(position_history) >= min_curve_points:
-                            curve = detect_curve(position_history)
-                            if curve and not curve_detected and not combo_detected:
-                                last_curve = curve
-                                cv2.putText(image, f"CURVE: {curve}", (50, 100), 
-                                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
-                        
-                        # Check for combo gestures
-                        if last_swipe and last_curve and not combo_detected:
-                            #clockwise & down
-                            if last_curve == "clockwise" and last_swipe == "down":
-                                print("ACCEPTED: Clockwise + down")
-                                cv2.putText(image, "ACCEPTED: Clockwise + down", (50, 150), 
-                                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                                combo_detected = True
-                                cooldown_counter = cooldown_frames
-                                gesture_detected = "Clockwise + down"
-
-                            # Accept clockwise + left swipe
-                            if last_curve == "clockwise" and last_swipe == "left":
-                                print("ACCEPTED: Clockwise + Left")
-                                cv2.putText(image, "ACCEPTED: Clockwise + Left", (50, 150), 
-                                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                                combo_detected = True
-                                cooldown_counter = cooldown_frames
-                                gesture_detected = "Clockwise + Left"
-
-                            #counterclockwise & up
-                            elif last_curve == "counter-clockwise" and last_swipe == "up":
-                                print("ACCEPTED: Counter-Clockwise + up")
-                                cv2.putText(image, "ACCEPTED: Counter-Clockwise + up", (50, 150), 
-                                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                                combo_detected = True
-                                cooldown_counter = cooldown_frames
-                                gesture_detected = "Counter-Clockwise + up"
-
-                            # Accept counter-clockwise + right swipe
-                            elif last_curve == "counter-clockwise" and last_swipe == "right":
-                                print("ACCEPTED: Counter-Clockwise + Right")
-                                cv2.putText(image, "ACCEPTED: Counter-Clockwise + Right", (50, 150), 
-                                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                                combo_detected = True
-                                cooldown_counter = cooldown_frames
-                                gesture_detected = "Counter-Clockwise + Right"
-                            
-                            # Reset after checking
-                            last_swipe = None
-                            last_curve = None
-                else:
-                    # Clear history if not pinching
-                    position_history.clear()
-                    frame_count = 0
-                    last_swipe = None
-                    last_curve = None
-        else:
-            position_history.clear()
-            frame_count = 0
-            last_swipe = None
-            last_curve = None
-        
-        # Visual feedback for pinching state
-        if results.multi_hand_landmarks:
-            pinching_status = "PINCHING" if pinching else "NOT PINCHING"
-            cv2.putText(image, f"Status: {pinching_status}", (50, 200), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        
-        # Update the frame to be displayed on the web
-        with frame_lock:
-            output_frame = image.copy()
+        hand_landmarks, finger_positions = tracker.track(frame)
+        pipeline_stats["inference"].record(started)
+        out_slot.put((frame_id, captured_at, frame, hand_landmarks, finger_positions))
+    out_slot.close()
 
-    cap.release()
+def get_pipeline_stats():
+    stats = {name: stage.snapshot() for name, stage in pipeline_stats.items()}
+    stats["dropped"] = {
+        "capture": capture_slot.dropped,
+        "inference": inference_slot.dropped,
+    }
+    if hand_tracker is not None and hasattr(hand_tracker, "stats"):
+        stats["tracker"] = dict(hand_tracker.stats, skip=hand_tracker.skip,
+                                inference_ms=hand_tracker.inference_ms)
+    return stats
 
-def generate():
-    global output_frame, gesture_detected
-    while True:
+def detect_gestures(pipelined=True, source=0, adaptive=None, recognizer="classic",
+                    spellbook_path=DEFAULT_SPELLBOOK):
+    """Run the gesture pipeline. adaptive holds AdaptiveHandTracker options, or None for full-frame inference."""
+    global hand_tracker
+    if adaptive is None:
+        tracker = HandTracker(min_detection_confidence=0.7, min_tracking_confidence=0.7)
+    else:
+        tracker = AdaptiveHandTracker(min_detection_confidence=0.7, min_tracking_confidence=0.7, **adaptive)
+    hand_tracker = tracker
+    recognizer = create_recognizer(recognizer, SpellBook.load(spellbook_path))
+    cap = open_capture(source)
+
+    def publish(captured_at, image, hand_landmarks, finger_positions):
+        global output_frame, gesture_detected
+        started = time.perf_counter()
+        height, width, _ = image.shape
+        result = recognizer.update(finger_positions, (width, height))
+        gesture_detected = recognizer.gesture
+        if result.combo:
+            count_spell(result.combo)
+            gesture_events.publish(result.combo)
+        draw_frame(image, hand_landmarks, finger_positions, result)
+        # Each frame is a fresh array, so it can be shared without copying
         with frame_lock:
-            if output_frame is None:
-                continue
-            
-            # Encode the frame in JPEG format
-            (flag, encoded_image) = cv2.imencode(".jpg", output_frame)
-            if not flag:
+            output_frame = image
+        broadcaster.publish(image)
+        finished = time.perf_counter()
+        pipeline_stats["annotate"].record(started, finished)
+        pipeline_stats["end_to_end"].record(captured_at, finished)
+
+    if not pipelined:
+        # Original single-threaded loop, kept for comparison
+        live = is_live(cap)
+        while cap.isOpened():
+            ret, frame = cap.read()
+            if not ret:
+                if live:
+                    continue
+                break
+            captured_at = time.perf_counter()
+            frame = cv2.flip(frame, 1)
+            hand_landmarks, finger_positions = tracker.track(frame)
+            pipeline_stats["inference"].record(captured_at)
+            publish(captured_at, frame, hand_landmarks, finger_positions)
+        cap.release()
+        return
+
+    stop_event = threading.Event()
+    capture_thread = threading.Thread(target=capture_frames, args=(cap, capture_slot, stop_event), daemon=True)
+    capture_thread.start()
+    threading.Thread(target=run_inference, args=(tracker, capture_slot, inference_slot, stop_event), daemon=True).start()
+    try:
+        while True:
+            packet = inference_slot.get(timeout=0.5)
+            if packet is None:
+                if not capture_thread.is_alive():
+                    break
                 continue
-            
-        # Yield the output frame in byte format
-        yield(b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + 
-              bytearray(encoded_image) + b'\r\n')
-        time.sleep(0.033)  # ~30 FPS
+            frame_id, captured_at, image, hand_landmarks, finger_positions = packet
+            publish(captured_at, image, hand_landmarks, finger_positions)
+    finally:
+        stop_event.set()
+
+    cap.release()
 
 @app.route("/")
 def index():
-    return render_template("index.html")
+    return render_template("index.html", recognizer=default_recognizer)
 
 @app.route("/video_feed")
 def video_feed():
-    return Response(generate(),
+    quality = request.args.get("quality", type=int)
+    width = request.args.get("width", type=int)
+    return Response(broadcaster.stream(quality, width),
                     mimetype="multipart/x-mixed-replace; boundary=frame")
 
+@app.route("/video_stats")
+def video_stats():
+    return jsonify(broadcaster.stats())
+
 @app.route("/gesture")
 def get_gesture():
     global gesture_detected
@@ -286,11 +182,209 @@ def get_gesture():
         return Response(response)
     return Response("No gesture detected")
 
+@app.route("/gesture_events")
+def gesture_event_stream():
+    # EventSource resends the last id it saw when it reconnects
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    if last_id is None:
+        last_id = request.args.get("last_id", type=int)
+    return Response(gesture_events.stream(last_id), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/gesture/next")
+def next_gesture():
+    # Long-poll fallback for clients without EventSource
+    last_id = request.args.get("last_id", default=gesture_events.last_id, type=int)
+    timeout = min(request.args.get("timeout", default=25.0, type=float), 60.0)
+    return jsonify({"events": gesture_events.wait(last_id, timeout)})
+
+@app.route("/pipeline_stats")
+def pipeline_stats_route():
+    return jsonify(get_pipeline_stats())
+
+def get_session_or_404(session_id):
+    session = session_manager.get(session_id) if session_manager else None
+    if session is None:
+        abort(404, description=f"No session {session_id}")
+    return session
+
+@app.route("/sessions")
+def list_sessions():
+    if session_manager is None:
+        return jsonify({"pool": None, "sessions": []})
+    return jsonify(session_manager.snapshot())
+
+def session_source(source):
+    """A camera index, "upload", or the real path of a video file inside video_dir; ValueError otherwise."""
+    if source == "upload":
+        return source
+    if type(source) is int and source >= 0:
+        return source
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    if isinstance(source, str) and video_dir is not None:
+        path = os.path.realpath(os.path.join(video_dir, source))
+        if os.path.commonpath([path, video_dir]) == video_dir and os.path.isfile(path):
+            return path
+    raise ValueError(f"Source must be a camera index, \"upload\" or a video file in --video-dir, not {source!r}")
+
+def session_options(options):
+    """Keyword arguments for SessionManager.create from a POST /session body; ValueError if any is invalid."""
+    if not isinstance(options, dict):
+        raise ValueError("Session options must be a JSON object")
+    session_id = options.get("id")
+    if session_id is not None and not isinstance(session_id, str):
+        raise ValueError("id must be a string")
+    recognizer = options.get("recognizer", "classic")
+    if recognizer not in RECOGNIZERS:
+        raise ValueError(f"recognizer must be one of {', '.join(RECOGNIZERS)}")
+    adaptive = options.get("adaptive")
+    if adaptive is not None:
+        if not isinstance(adaptive, dict) or not set(adaptive) <= set(ADAPTIVE_OPTIONS):
+            raise ValueError(f"adaptive must be an object with keys among {', '.join(ADAPTIVE_OPTIONS)}")
+        for key, value in adaptive.items():
+            if type(value) not in (int, float) and not (key == "budget_ms" and value is None):
+                raise ValueError(f"adaptive.{key} must be a number")
+    quality, width = options.get("quality", 80), options.get("width")
+    if type(quality) is not int or width is not None and type(width) is not int:
+        raise ValueError("quality and width must be integers")
+    return {"source": session_source(options.get("source", "upload")), "session_id": session_id,
+            "recognizer": recognizer, "adaptive": adaptive, "loop": bool(options.get("loop", False)),
+            "quality": quality, "width": width}
+
+@app.route("/session", methods=["POST"])
+def create_session():
+    if session_manager is None:
+        abort(503, description="Sessions are disabled; start the server with --workers")
+    try:
+        options = session_options(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        session = session_manager.create(**options)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify(session.snapshot()), 201
+
+@app.route("/session/<session_id>", methods=["DELETE"])
+def close_session(session_id):
+    get_session_or_404(session_id)
+    session_manager.close(session_id)
+    return jsonify({"id": session_id, "status": "closed"})
+
+@app.route("/session/<session_id>/frame", methods=["POST"])
+def upload_frame(session_id):
+    session = get_session_or_404(session_id)
+    frame = decode_upload(request.get_data())
+    if frame is None:
+        return jsonify({"error": "Could not decode image"}), 400
+    session.submit(frame)
+    return jsonify({"id": session_id, "gesture": session.gesture})
+
+@app.route("/session/<session_id>/video_feed")
+def session_video_feed(session_id):
+    session = get_session_or_404(session_id)
+    quality = request.args.get("quality", type=int)
+    width = request.args.get("width", type=int)
+    return Response(session.broadcaster.stream(quality, width),
+                    mimetype="multipart/x-mixed-replace; boundary=frame")
+
+@app.route("/session/<session_id>/gesture")
+def session_gesture(session_id):
+    session = get_session_or_404(session_id)
+    return Response(session.gesture or "No gesture detected")
+
+@app.route("/session/<session_id>/gesture_events")
+def session_gesture_events(session_id):
+    session = get_session_or_404(session_id)
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    if last_id is None:
+        last_id = request.args.get("last_id", type=int)
+    return Response(session.events.stream(last_id), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/session/<session_id>/stats")
+def session_stats(session_id):
+    return jsonify(get_session_or_404(session_id).snapshot())
+
+def report_stats(interval):
+    while True:
+        time.sleep(interval)
+        stats = get_pipeline_stats()
+        dropped, tracker = stats.pop("dropped"), stats.pop("tracker", None)
+        line = " | ".join(f"{name}: {stage['fps']} fps {stage['avg_ms']} ms" for name, stage in stats.items())
+        line += f" | dropped: {dropped}"
+        if tracker is not None:
+            # Adaptive mode: frame counts by kind rather than a rate
+            inference_ms = tracker.pop("inference_ms")
+            line += " | tracker: " + " ".join(f"{key} {value}" for key, value in tracker.items())
+            if inference_ms is not None:
+                line += f" {inference_ms:.1f} ms"
+        print(line)
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Spell gesture detection server")
+    parser.add_argument("--source", default="0",
+                        help="Camera index or video file to read frames from")
+    parser.add_argument("--sequential", action="store_true",
+                        help="Run capture, inference and annotation on one thread (original loop)")
+    parser.add_argument("--stats-interval", type=float, default=0,
+                        help="Print per-stage FPS and latency every N seconds (0 disables)")
+    parser.add_argument("--jpeg-quality", type=int, default=80,
+                        help="Default JPEG quality for /video_feed (overridable with ?quality=)")
+    parser.add_argument("--stream-width", type=int, default=None,
+                        help="Default max width for /video_feed (overridable with ?width=); snapped to a standard width")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Crop inference to the tracked hand and skip frames under CPU pressure")
+    parser.add_argument("--downscale", type=float, default=0.5,
+                        help="Scale applied to the hand crop before inference in adaptive mode")
+    parser.add_argument("--infer-every", type=int, default=1,
+                        help="Run inference at most every Nth frame in adaptive mode")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Inference time budget; over it, adaptive mode skips more frames")
+    parser.add_argument("--recognizer", choices=RECOGNIZERS, default="classic",
+                        help="Use the curve + swipe state machine, or match whole strokes against the spellbook")
+    parser.add_argument("--spellbook", default=DEFAULT_SPELLBOOK,
+                        help="JSON file with spell templates")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Enable /session routes with this many shared inference workers")
+    parser.add_argument("--video-dir", default=None,
+                        help="Directory of video files that POST /session may name as its source")
+    parser.add_argument("--no-default-camera", action="store_true",
+                        help="Only serve sessions; do not open --source for the single-player routes")
+    parser.add_argument("--profile", action="store_true",
+                        help="Start the sampling profiler (toggle with POST /profile, read with GET /profile)")
+    args = parser.parse_args()
+    if args.profile:
+        profiler.start()
+    broadcaster.quality = args.jpeg_quality
+    broadcaster.width = args.stream_width
+
+    default_recognizer = args.recognizer
+    if args.video_dir:
+        video_dir = os.path.realpath(args.video_dir)
+    if args.workers > 0:
+        session_manager = SessionManager(SpellBook.load(args.spellbook), workers=args.workers)
+
     # Start a thread that will perform gesture detection
-    t = threading.Thread(target=detect_gestures)
-    t.daemon = True
-    t.start()
+    if not args.no_default_camera:
+        t = threading.Thread(target=detect_gestures, kwargs={
+            "pipelined": not args.sequential,
+            "source": args.source,
+            "recognizer": args.recognizer,
+            "spellbook_path": args.spellbook,
+            "adaptive": {
+                "downscale": args.downscale,
+                "infer_every": args.infer_every,
+                "budget_ms": args.budget_ms,
+            } if args.adaptive else None,
+        })
+        t.daemon = True
+        t.start()
+    if args.stats_interval > 0:
+        threading.Thread(target=report_stats, args=(args.stats_interval,), daemon=True).start()
     
     # Start the Flask app
     app.run(host="0.0.0.0", port=4999, debug=True, threaded=True, use_reloader=False)
\ No newline at end of file
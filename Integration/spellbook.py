@@ -0,0 +1,204 @@
+import json
+import math
+import os
+
+import numpy as np
+
+from recognizer import FrameResult, GestureRecognizer, REFERENCE_DIAGONAL
+from trajectory import TrajectoryBuffer, is_pinching, centroid
+
+DEFAULT_SPELLBOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "spells.json")
+RECOGNIZERS = ("classic", "template")
+
+def resample(points, n):
+    """n points spaced evenly along the path length of points."""
+    points = np.asarray(points, dtype=np.float64)
+    seg = np.hypot(*np.diff(points, axis=0).T)
+    dist = np.concatenate(([0.0], np.cumsum(seg)))
+    if dist[-1] == 0:
+        return np.repeat(points[:1], n, axis=0)
+    targets = np.linspace(0.0, dist[-1], n)
+    return np.stack([np.interp(targets, dist, points[:, 0]), np.interp(targets, dist, points[:, 1])], axis=1)
+
+def normalize(points, n):
+    """Resampled, centred on the centroid and scaled so the larger side spans 1. Direction is kept."""
+    points = resample(points, n)
+    points -= points.mean(axis=0)
+    extent = np.ptp(points, axis=0).max()
+    return points / extent if extent > 0 else points
+
+def envelope(templates, band):
+    """Upper/lower LB_Keogh envelopes of every template over a +/- band window."""
+    count, n, _ = templates.shape
+    upper = np.full_like(templates, -np.inf)
+    lower = np.full_like(templates, np.inf)
+    for shift in range(-band, band + 1):
+        lo, hi = max(0, shift), min(n, n + shift)
+        upper[:, lo - shift:hi - shift] = np.maximum(upper[:, lo - shift:hi - shift], templates[:, lo:hi])
+        lower[:, lo - shift:hi - shift] = np.minimum(lower[:, lo - shift:hi - shift], templates[:, lo:hi])
+    return upper, lower
+
+def banded_dtw(query, template, band, best=np.inf):
+    """Squared-distance DTW restricted to a Sakoe-Chiba band.
+
+    Abandons early and returns inf as soon as every cell of a row exceeds best.
+    """
+    n = len(query)
+    cost = ((query[:, None, :] - template[None, :, :]) ** 2).sum(axis=2)
+    previous = np.full(n + 1, np.inf)
+    previous[0] = 0.0
+    for i in range(1, n + 1):
+        current = np.full(n + 1, np.inf)
+        lo, hi = max(1, i - band), min(n, i + band)
+        for j in range(lo, hi + 1):
+            current[j] = cost[i - 1, j - 1] + min(previous[j - 1], previous[j], current[j - 1])
+        if current[lo:hi + 1].min() > best:
+            return np.inf
+        previous = current
+    return previous[n]
+
+class SpellBook:
+    """Spell templates loaded from a JSON file, matched with LB_Keogh-pruned banded DTW.
+
+    Each spell has a name, an optional classic (curve, swipe) combo and a
+    trajectory template as a list of [x, y] points in image coordinates (y down).
+    All templates are resampled and normalized once at load time. A query first
+    gets a lower bound against every template in one vectorized pass; full DTW
+    only runs on candidates whose bound beats the best distance found so far,
+    so cost stays nearly flat as the book grows.
+    """
+
+    def __init__(self, spells=(), points=32, band=4, max_distance=0.25):
+        self.points = points
+        self.band = band
+        self.max_distance = max_distance
+        self.names = []
+        self.combos = {}
+        self._raw = []
+        self.templates = np.empty((0, points, 2))
+        self.upper = self.lower = self.templates
+        self.dtw_evaluations = 0
+        for spell in spells:
+            self.add(spell["name"], spell["points"], spell.get("combo"), rebuild=False)
+        self._rebuild()
+
+    @classmethod
+    def load(cls, path=DEFAULT_SPELLBOOK, **kwargs):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["spells"], **kwargs)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, points, combo=None, rebuild=True):
+        if len(points) < 2:
+            raise ValueError(f"Spell {name!r} needs at least two points")
+        self.names.append(name)
+        self._raw.append(normalize(points, self.points))
+        if combo:
+            self.combos[tuple(combo)] = name
+        if rebuild:
+            self._rebuild()
+
+    def _rebuild(self):
+        if self._raw:
+            self.templates = np.stack(self._raw)
+            self.upper, self.lower = envelope(self.templates, self.band)
+
+    def lower_bounds(self, query):
+        above = np.clip(query - self.upper, 0.0, None)
+        below = np.clip(self.lower - query, 0.0, None)
+        return (above ** 2 + below ** 2).sum(axis=(1, 2))
+
+    def match(self, trajectory):
+        """(name, distance) of the closest spell within max_distance, else (None, distance)."""
+        if not self.names or len(trajectory) < 2:
+            return None, np.inf
+        query = normalize(trajectory, self.points)
+        bounds = self.lower_bounds(query)
+        best_cost = self.max_distance ** 2 * self.points
+        best = None
+        for index in np.argsort(bounds):
+            if bounds[index] >= best_cost:
+                break
+            self.dtw_evaluations += 1
+            cost = banded_dtw(query, self.templates[index], self.band, best_cost)
+            if cost < best_cost:
+                best_cost, best = cost, index
+        distance = math.sqrt(best_cost / self.points)
+        return (self.names[best] if best is not None else None), distance
+
+    def match_exhaustive(self, trajectory):
+        """Unpruned DTW against every template; reference for benchmarks."""
+        query = normalize(trajectory, self.points)
+        costs = [banded_dtw(query, template, self.band) for template in self.templates]
+        index = int(np.argmin(costs))
+        distance = math.sqrt(costs[index] / self.points)
+        return (self.names[index] if distance <= self.max_distance else None), distance
+
+class TemplateRecognizer:
+    """Recognizes a whole pinched stroke against a SpellBook when the pinch is released.
+
+    Shares the update()/FrameResult interface of GestureRecognizer, so the server
+    and benchmarks can use either.
+    """
+
+    def __init__(self, spellbook=None, pinch_threshold=80 / REFERENCE_DIAGONAL, min_stroke_points=12,
+                 max_stroke_points=128, cooldown_frames=60, frame_size=(640, 480)):
+        self.spellbook = spellbook if spellbook is not None else SpellBook.load()
+        self.pinch_fraction = pinch_threshold
+        self.min_stroke_points = min_stroke_points
+        self.cooldown_frames = cooldown_frames
+        self.stroke = TrajectoryBuffer(capacity=max_stroke_points)
+        self.cooldown_counter = 0
+        self.gesture = None
+        self.last_distance = None
+        self.frame_size = None
+        self.set_frame_size(*frame_size)
+
+    def set_frame_size(self, width, height):
+        if self.frame_size == (width, height):
+            return
+        self.stroke.clear()
+        self.frame_size = (width, height)
+        self.pinch_threshold = self.pinch_fraction * math.hypot(width, height)
+
+    def reset_tracking(self):
+        self.stroke.clear()
+
+    def finish_stroke(self):
+        """Match the stroke that just ended; returns the spell name or None."""
+        spell = None
+        if len(self.stroke) >= self.min_stroke_points and self.cooldown_counter == 0:
+            spell, self.last_distance = self.spellbook.match(self.stroke.points())
+            if spell:
+                self.gesture = spell
+                self.cooldown_counter = self.cooldown_frames
+        self.stroke.clear()
+        return spell
+
+    def update(self, finger_positions, frame_size=None):
+        if frame_size is not None:
+            self.set_frame_size(*frame_size)
+        if self.cooldown_counter > 0:
+            self.cooldown_counter -= 1
+        else:
+            self.gesture = None
+
+        if finger_positions is None:
+            return FrameResult(False, False, None, None, None, self.finish_stroke())
+        if not is_pinching(finger_positions, self.pinch_threshold):
+            return FrameResult(True, False, None, None, None, self.finish_stroke())
+
+        self.stroke.append(centroid(finger_positions))
+        return FrameResult(True, True, self.stroke.points(), None, None, None)
+
+def create_recognizer(kind="classic", spellbook=None):
+    """The classic curve + swipe state machine, or with kind "template" a TemplateRecognizer matching whole strokes."""
+    if kind not in RECOGNIZERS:
+        raise ValueError(f"Unknown recognizer {kind!r}; expected one of {', '.join(RECOGNIZERS)}")
+    spellbook = spellbook if spellbook is not None else SpellBook.load()
+    if kind == "classic":
+        return GestureRecognizer(combos=spellbook.combos)
+    return TemplateRecognizer(spellbook)
@@ -0,0 +1,82 @@
+import numpy as np
+
+# Pairs of fingertip rows compared by the pinch check: thumb-index, thumb-middle, index-middle
+PINCH_PAIRS = (np.array([0, 0, 1]), np.array([1, 2, 2]))
+
+class TrajectoryBuffer:
+    """Fixed-size ring buffer of (x, y) positions backed by one preallocated array."""
+
+    def __init__(self, capacity=30):
+        self.capacity = capacity
+        self._data = np.zeros((capacity, 2), dtype=np.int64)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, point):
+        end = (self._start + self._size) % self.capacity
+        self._data[end] = point
+        if self._size < self.capacity:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+
+    def points(self):
+        """Positions oldest first. Only copies when the buffer has wrapped."""
+        end = self._start + self._size
+        if end <= self.capacity:
+            return self._data[self._start:end]
+        return np.concatenate((self._data[self._start:], self._data[:end - self.capacity]))
+
+    def first(self):
+        return self._data[self._start]
+
+    def last(self):
+        return self._data[(self._start + self._size - 1) % self.capacity]
+
+    def displacement(self):
+        """(dx, dy) between the oldest and newest position."""
+        dx, dy = self.last() - self.first()
+        return int(dx), int(dy)
+
+def detect_curve(points, curve_threshold=0.3, min_curve_points=12):
+    """Classify a trajectory as a clockwise/counter-clockwise curve in one batched pass."""
+    if len(points) < min_curve_points:
+        return None
+
+    steps = np.diff(points, axis=0)
+    v1, v2 = steps[:-1], steps[1:]
+    moving = v1.any(axis=1) & v2.any(axis=1)
+    if not moving.any():
+        return None
+    v1, v2 = v1[moving], v2[moving]
+
+    dot = v1[:, 0] * v2[:, 0] + v1[:, 1] * v2[:, 1]
+    det = v1[:, 0] * v2[:, 1] - v1[:, 1] * v2[:, 0]
+    avg_direction_change = np.arctan2(det, dot).mean()
+    total_rotation = det.sum()
+
+    if abs(avg_direction_change) < curve_threshold:
+        return "clockwise" if total_rotation > 0 else "counter-clockwise"
+    return None
+
+def landmarks_to_pixels(landmarks, tip_ids, width, height):
+    """Fingertip landmarks as an int array of pixel coordinates, one row per tip."""
+    coords = np.array([(landmarks[i].x, landmarks[i].y) for i in tip_ids])
+    return (coords * (width, height)).astype(np.int64)
+
+def is_pinching(finger_positions, pinch_threshold=80):
+    """True when every pair of thumb, index and middle tips is closer than the threshold."""
+    first, second = PINCH_PAIRS
+    gaps = finger_positions[first] - finger_positions[second]
+    return bool((np.hypot(gaps[:, 0], gaps[:, 1]) < pinch_threshold).all())
+
+def centroid(finger_positions):
+    """Integer mean position of the fingertips, matching the original floor division."""
+    return finger_positions.sum(axis=0) // len(finger_positions)
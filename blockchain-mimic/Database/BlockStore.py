@@ -0,0 +1,209 @@
+from datetime import datetime
+from functools import partial
+
+from sqlalchemy import create_engine, delete, event, func, insert, select, update
+
+from Block import Base, Block, CoinTransaction, Contract, ContractEvent, NFT, NFTTransfer
+from Source import READ_PRAGMAS, WRITE_PRAGMAS, tune
+
+def tune_engine(engine, pragmas=WRITE_PRAGMAS):
+    """Apply pragmas to every connection engine opens from now on."""
+    event.listen(engine, 'connect', lambda connection, record: tune(connection, pragmas))
+    return engine
+
+def create_schema(engine):
+    """Create missing tables, and indexes added since an existing database was created."""
+    Base.metadata.create_all(engine)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+def read_engine(path, pool_size=8):
+    """Pooled read-only connections for API queries; under WAL they never block the writer."""
+    engine = create_engine(
+        f"sqlite:///file:{path}?mode=ro&uri=true",
+        pool_size=pool_size,
+        max_overflow=pool_size,
+        connect_args={'check_same_thread': False},
+    )
+    return tune_engine(engine, READ_PRAGMAS)
+
+def _rows(items, columns, **fixed):
+    rows = []
+    for item in items:
+        get = item.get if isinstance(item, dict) else partial(getattr, item)
+        row = {column: get(column, None) for column in columns}
+        row.update(fixed)
+        rows.append(row)
+    return rows
+
+class BlockStore:
+    """Appends blocks with one transaction per block and one executemany per child table.
+
+    Writing a block with hundreds of transfers, NFT transfers and contract
+    events costs a handful of statements and a single commit, instead of a
+    statement and a commit per row.
+    """
+
+    tx_columns = ('tx_hash', 'sender', 'receiver', 'amount', 'fee', 'nonce', 'signature')
+    nft_transfer_columns = ('from_address', 'to_address', 'timestamp', 'nft_id')
+    event_columns = ('trigger_tx_hash', 'action_type', 'action_data', 'contract_id')
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def _insert_block(self, connection, block, nft_transfers=(), contract_events=()):
+        result = connection.execute(insert(Block.__table__), {
+            'hash': block.hash,
+            'previous_hash': block.previous_hash,
+            # Part of the proof of work, so stored exactly as sealed
+            'timestamp': block.timestamp,
+            'nonce': block.nonce or 0,
+            'validator': block.validator,
+            'signature': block.signature,
+            'merkle_root': block.merkle_root,
+        })
+        block_id = result.inserted_primary_key[0]
+        if block.coin_transactions:
+            connection.execute(insert(CoinTransaction.__table__),
+                               _rows(block.coin_transactions, self.tx_columns, block_id=block_id))
+        if nft_transfers:
+            rows = _rows(nft_transfers, self.nft_transfer_columns, block_id=block_id)
+            for row in rows:
+                row['timestamp'] = row['timestamp'] or block.timestamp or datetime.utcnow()
+            connection.execute(insert(NFTTransfer.__table__), rows)
+        if contract_events:
+            connection.execute(insert(ContractEvent.__table__),
+                               _rows(contract_events, self.event_columns, block_id=block_id))
+        return block_id
+
+    def append_block(self, block, nft_transfers=(), contract_events=()):
+        """Store a block and its rows atomically; returns the new block id."""
+        with self.engine.begin() as connection:
+            return self._insert_block(connection, block, nft_transfers, contract_events)
+
+    def _drop_branches(self, connection, parent_hash, keep):
+        """Delete the stored blocks descending from parent_hash, except those in keep, with their rows.
+
+        Used when a reorg replaces the branch above parent_hash, so the store
+        only ever holds the main chain and a transaction that moved to the new
+        branch does not collide with its orphaned copy. Returns how many went.
+        """
+        blocks = Block.__table__
+        start_id = connection.execute(select(func.min(blocks.c.id)).where(
+            blocks.c.previous_hash == parent_hash, blocks.c.hash.not_in(keep))).scalar()
+        if start_id is None:
+            return 0
+        doomed, ids = {parent_hash}, []
+        # A block is always stored after its parent, so one pass in id order finds every descendant
+        for row in connection.execute(select(blocks.c.id, blocks.c.hash, blocks.c.previous_hash)
+                                      .where(blocks.c.id >= start_id).order_by(blocks.c.id)):
+            if row.previous_hash in doomed and row.hash not in keep:
+                doomed.add(row.hash)
+                ids.append(row.id)
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            for model in (CoinTransaction, NFTTransfer, ContractEvent):
+                connection.execute(delete(model.__table__).where(model.__table__.c.block_id.in_(chunk)))
+            for model in (NFT, Contract):
+                # Tokens and contracts outlive the block that created them; only the link goes
+                connection.execute(update(model.__table__).where(model.__table__.c.block_id.in_(chunk))
+                                   .values(block_id=None))
+            connection.execute(delete(blocks).where(blocks.c.id.in_(chunk)))
+        return len(ids)
+
+    def append_blocks(self, blocks, per_transaction=1):
+        """Store blocks not stored yet, per_transaction blocks per commit. Returns how many were new.
+
+        Blocks already present (for example the shared part of a reorged chain)
+        are skipped, so this can be handed any suffix of the chain. Stored
+        blocks on a competing branch above the first new block's parent are
+        deleted in the same commit as that block. A block may carry
+        nft_transfers and contract_events lists next to its coin_transactions.
+        """
+        blocks = list(blocks)
+        stored = set()
+        with self.engine.connect() as connection:
+            hashes = [block.hash for block in blocks]
+            for i in range(0, len(hashes), 500):
+                stored.update(connection.execute(
+                    select(Block.hash).where(Block.hash.in_(hashes[i:i + 500]))).scalars())
+        new = [block for block in blocks if block.hash not in stored]
+        keep = {block.hash for block in blocks}
+        for i in range(0, len(new), per_transaction):
+            with self.engine.begin() as connection:
+                if i == 0:
+                    self._drop_branches(connection, new[0].previous_hash, keep)
+                for block in new[i:i + per_transaction]:
+                    self._insert_block(connection, block, getattr(block, 'nft_transfers', ()),
+                                       getattr(block, 'contract_events', ()))
+        return len(new)
+
+    def load_chain_after(self, block_hash=None):
+        """Stored blocks after block_hash on its longest stored branch, oldest first, with their coin transactions.
+
+        With block_hash None the branch starts at the first stored block. A
+        block is always stored after its parent, so only rows with a higher id
+        than block_hash's can descend from it.
+        """
+        blocks_table, tx_table = Block.__table__, CoinTransaction.__table__
+        with self.engine.connect() as connection:
+            start_id = 0
+            if block_hash is not None:
+                start_id = connection.execute(select(blocks_table.c.id).where(blocks_table.c.hash == block_hash)).scalar()
+                if start_id is None:
+                    return []
+            headers = connection.execute(
+                select(blocks_table).where(blocks_table.c.id > start_id).order_by(blocks_table.c.id)).all()
+            if not headers:
+                return []
+            # Length of the longest branch below each block, children before parents
+            depth, best_child = {}, {}
+            for header in reversed(headers):
+                depth[header.hash] = depth.get(header.hash, 0) + 1
+                parent = header.previous_hash
+                if depth[header.hash] > depth.get(parent, 0):
+                    depth[parent] = depth[header.hash]
+                    best_child[parent] = header
+            branch = []
+            header = best_child.get(block_hash) if block_hash is not None else headers[0]
+            while header is not None:
+                branch.append(header)
+                header = best_child.get(header.hash)
+
+            ids = {header.id for header in branch}
+            transactions = {}
+            for row in connection.execute(select(tx_table).where(tx_table.c.block_id > start_id)
+                                          .order_by(tx_table.c.block_id, tx_table.c.id)):
+                if row.block_id in ids:
+                    transactions.setdefault(row.block_id, []).append(CoinTransaction.from_dict(row._mapping))
+
+        chain = []
+        for header in branch:
+            block = Block(hash=header.hash, previous_hash=header.previous_hash, timestamp=header.timestamp,
+                          nonce=header.nonce, validator=header.validator, signature=header.signature,
+                          merkle_root=header.merkle_root)
+            block.coin_transactions = transactions.get(header.id, [])
+            chain.append(block)
+        return chain
+
+    def stored_transactions(self, tx_hashes, engine=None):
+        """The subset of tx_hashes already in a stored block, read through engine if given.
+
+        Orphaned branches are deleted when a reorg is stored, so these are
+        all on the main chain.
+        """
+        tx_hashes, stored = list(tx_hashes), set()
+        with (engine or self.engine).connect() as connection:
+            for i in range(0, len(tx_hashes), 500):
+                stored.update(connection.execute(select(CoinTransaction.tx_hash).where(
+                    CoinTransaction.tx_hash.in_(tx_hashes[i:i + 500]))).scalars())
+        return stored
+
+    def counts(self, engine=None):
+        """Rows per table, read through engine (such as a read_engine pool) if given."""
+        with (engine or self.engine).connect() as connection:
+            return {
+                model.__tablename__: connection.execute(select(func.count()).select_from(model.__table__)).scalar()
+                for model in (Block, CoinTransaction, NFTTransfer, ContractEvent)
+            }
@@ -0,0 +1,97 @@
+import heapq
+
+from sqlalchemy import select, tuple_
+
+from Block import CoinTransaction, NFT, NFTTransfer, Contract, ContractEvent
+
+DEFAULT_PAGE = 50
+MAX_PAGE = 500
+
+class CursorError(ValueError):
+    pass
+
+def encode_cursor(*keys):
+    return '.'.join(str(key) for key in keys)
+
+def decode_cursor(cursor, size):
+    """Keys of an opaque "a.b" cursor from a previous page, or None for the first page."""
+    if not cursor:
+        return None
+    try:
+        keys = tuple(int(key) for key in cursor.split('.'))
+    except ValueError:
+        raise CursorError(f"Malformed cursor {cursor!r}")
+    if len(keys) != size:
+        raise CursorError(f"Malformed cursor {cursor!r}")
+    return keys
+
+def page_size(limit):
+    return max(1, min(limit or DEFAULT_PAGE, MAX_PAGE))
+
+def _as_dict(row):
+    return {key: value.isoformat() if hasattr(value, 'isoformat') else value
+            for key, value in row._mapping.items()}
+
+def _newest_first(table, where, cursor, limit):
+    """Rows matching where, newest (block_id, id) first, strictly after cursor.
+
+    Each filter column has a (column, block_id) index with the rowid at its
+    end, so this is one index seek plus `limit` steps, however deep the page.
+    """
+    statement = select(table).where(where)
+    if cursor is not None:
+        statement = statement.where(tuple_(table.c.block_id, table.c.id) < tuple_(*cursor))
+    return statement.order_by(table.c.block_id.desc(), table.c.id.desc()).limit(limit)
+
+def _page(rows, limit, key):
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'items': [_as_dict(row) for row in rows],
+        'next_cursor': encode_cursor(*key(rows[-1])) if more else None,
+    }
+
+def address_history(connection, address, limit=DEFAULT_PAGE, cursor=None):
+    """Coin transfers to or from address, newest first."""
+    limit, cursor = page_size(limit), decode_cursor(cursor, 2)
+    table = CoinTransaction.__table__
+    # Two index range scans merged here; an OR would make SQLite collect and sort the whole history
+    sent = connection.execute(_newest_first(table, table.c.sender == address, cursor, limit + 1)).all()
+    received = connection.execute(_newest_first(table, table.c.receiver == address, cursor, limit + 1)).all()
+    rows, seen = [], set()
+    for row in heapq.merge(sent, received, key=lambda row: (row.block_id, row.id), reverse=True):
+        if row.id not in seen:  # A transfer to oneself comes back from both scans
+            seen.add(row.id)
+            rows.append(row)
+    return _page(rows, limit, lambda row: (row.block_id, row.id))
+
+def nfts_owned(connection, owner, limit=DEFAULT_PAGE, cursor=None):
+    """NFTs currently owned by owner, most recently minted first."""
+    limit, cursor = page_size(limit), decode_cursor(cursor, 1)
+    table = NFT.__table__
+    statement = select(table).where(table.c.owner == owner)
+    if cursor is not None:
+        statement = statement.where(table.c.id < cursor[0])
+    rows = connection.execute(statement.order_by(table.c.id.desc()).limit(limit + 1)).all()
+    return _page(rows, limit, lambda row: (row.id,))
+
+def nft_history(connection, token_id, limit=DEFAULT_PAGE, cursor=None):
+    """Transfers of one NFT, newest first; None if there is no such token."""
+    limit, cursor = page_size(limit), decode_cursor(cursor, 2)
+    nft_id = connection.execute(select(NFT.__table__.c.id).where(NFT.__table__.c.token_id == token_id)).scalar()
+    if nft_id is None:
+        return None
+    table = NFTTransfer.__table__
+    rows = connection.execute(_newest_first(table, table.c.nft_id == nft_id, cursor, limit + 1)).all()
+    return _page(rows, limit, lambda row: (row.block_id, row.id))
+
+def contract_events(connection, contract_id, limit=DEFAULT_PAGE, cursor=None):
+    """Events emitted by the contract with public id contract_id, newest first; None if unknown."""
+    limit, cursor = page_size(limit), decode_cursor(cursor, 2)
+    contracts = Contract.__table__
+    row_id = connection.execute(select(contracts.c.id).where(contracts.c.contract_id == contract_id)).scalar()
+    if row_id is None:
+        return None
+    table = ContractEvent.__table__
+    rows = connection.execute(_newest_first(table, table.c.contract_id == row_id, cursor, limit + 1)).all()
+    return _page(rows, limit, lambda row: (row.block_id, row.id))
@@ -0,0 +1,262 @@
+import glob
+import mmap
+import os
+import struct
+
+from Hashes import HashManager
+
+MAGIC = b'MSNP'
+VERSION = 1
+
+# magic, version, reserved, height, raw block hash, then the record count of each section
+HEADER = struct.Struct('<4sHHq32sIII')
+HEADER_SIZE = 64
+CHECKSUM_SIZE = 32
+# Sections in file order: name, fixed-size record (key first), key width
+SECTIONS = (
+    ('balances', struct.Struct('<42sq'), 42),  # address, balance in base units
+    ('nft_owners', struct.Struct('<64s42s'), 64),  # token_id, owner
+    ('contract_statuses', struct.Struct('<64s20s'), 64),  # contract_id, status
+)
+
+class SnapshotError(Exception):
+    pass
+
+def _checksum(data):
+    return HashManager('sha256').digest(data)
+
+def _pack_section(record, key_size, items):
+    buffer = bytearray(record.size * len(items))
+    value_size = record.size - key_size
+    for offset, (key, value) in zip(range(0, len(buffer), record.size), sorted(items)):
+        key = key.encode()
+        if not isinstance(value, int):
+            value = value.encode()
+            # struct silently truncates long strings
+            if len(value) > value_size:
+                raise SnapshotError(f"{value!r} does not fit in {value_size} bytes")
+        if len(key) > key_size:
+            raise SnapshotError(f"{key!r} does not fit in {key_size} bytes")
+        record.pack_into(buffer, offset, key, value)
+    return buffer
+
+def write_snapshot(path, height, block_hash, balances, nft_owners, contract_statuses):
+    """Write state at (height, block_hash) to path atomically.
+
+    Each section holds fixed-size records sorted by key, so a reader can mmap
+    the file and binary-search it without parsing the rest. A sha256 of
+    everything before it closes the file.
+    """
+    contents = (balances, nft_owners, contract_statuses)
+    sections = [_pack_section(record, key_size, items.items())
+                for (_, record, key_size), items in zip(SECTIONS, contents)]
+    header = bytearray(HEADER_SIZE)
+    HEADER.pack_into(header, 0, MAGIC, VERSION, 0, height, bytes.fromhex(block_hash),
+                     *(len(items) for items in contents))
+    body = b''.join([header, *sections])
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as file:
+        file.write(body)
+        file.write(_checksum(body))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    return path
+
+class Snapshot:
+    """Read-only, memory-mapped view of a snapshot file."""
+
+    def __init__(self, path, verify=True):
+        self.path = path
+        with open(path, 'rb') as file:
+            try:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError(f"{path} is empty")
+        try:
+            self._parse(verify)
+        except Exception:
+            self._map.close()
+            raise
+
+    def _parse(self, verify):
+        if len(self._map) < HEADER_SIZE + CHECKSUM_SIZE:
+            raise SnapshotError(f"{self.path} is truncated")
+        magic, version, _, self.height, block_hash, *counts = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise SnapshotError(f"{self.path} is not a version {VERSION} snapshot")
+        self.block_hash = block_hash.hex()
+        self._sections = {}
+        offset = HEADER_SIZE
+        for (name, record, key_size), count in zip(SECTIONS, counts):
+            self._sections[name] = (record, key_size, offset, count)
+            offset += record.size * count
+        if offset + CHECKSUM_SIZE != len(self._map):
+            raise SnapshotError(f"{self.path} has the wrong size")
+        if verify and _checksum(memoryview(self._map)[:offset]) != self._map[offset:]:
+            raise SnapshotError(f"{self.path} fails its checksum")
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _decode(value):
+        return value if isinstance(value, int) else value.rstrip(b'\0').decode()
+
+    def _records(self, name):
+        record, _, offset, count = self._sections[name]
+        for key, value in record.iter_unpack(self._map[offset:offset + record.size * count]):
+            yield key.rstrip(b'\0').decode(), self._decode(value)
+
+    def _lookup(self, name, key):
+        """Binary search over the mapped records; only O(log n) pages are touched."""
+        record, key_size, offset, count = self._sections[name]
+        padded = key.encode().ljust(key_size, b'\0')
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            start = offset + middle * record.size
+            if self._map[start:start + key_size] < padded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < count:
+            found, value = record.unpack_from(self._map, offset + low * record.size)
+            if found == padded:
+                return self._decode(value)
+        return None
+
+    def balances(self):
+        return self._records('balances')
+
+    def nft_owners(self):
+        return self._records('nft_owners')
+
+    def contract_statuses(self):
+        return self._records('contract_statuses')
+
+    def balance(self, address):
+        return self._lookup('balances', address)
+
+    def owner(self, token_id):
+        return self._lookup('nft_owners', token_id)
+
+    def status(self, contract_id):
+        return self._lookup('contract_statuses', contract_id)
+
+def snapshot_path(directory, height, block_hash):
+    return os.path.join(directory, f"snapshot-{height:010d}-{block_hash[:16]}.snap")
+
+def latest_snapshot(directory):
+    """Newest snapshot in directory that passes its checksum, or None."""
+    for path in sorted(glob.glob(os.path.join(directory, 'snapshot-*.snap')), reverse=True):
+        try:
+            return Snapshot(path)
+        except (SnapshotError, OSError):
+            continue
+    return None
+
+def prune_snapshots(directory, keep=3):
+    for path in sorted(glob.glob(os.path.join(directory, 'snapshot-*.snap')), reverse=True)[keep:]:
+        os.remove(path)
+
+class Checkpoints:
+    """Periodic snapshots of a node's state, and startup from the newest one.
+
+    A snapshot holds the ledger's balances plus NFT owners and contract
+    status read from the database, all at the ledger's tip. On startup the
+    newest valid snapshot is restored and only the stored blocks after it are
+    replayed. Given rules, startup also loads the stored main chain into
+    rules.chain, so a restarted node serves and mines on what it stored.
+    """
+
+    def __init__(self, directory, ledger, block_store, every=1000, keep=3, rules=None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.ledger = ledger
+        self.block_store = block_store
+        self.every = every
+        self.keep = keep
+        self.rules = rules
+        self.last_height = -1
+
+    def _state_rows(self):
+        # Imported here so the snapshot format itself does not need SQLAlchemy
+        from sqlalchemy import select
+        from Block import NFT, Contract
+        with self.block_store.engine.connect() as connection:
+            owners = dict(connection.execute(select(NFT.token_id, NFT.owner)).all())
+            statuses = dict(connection.execute(select(Contract.contract_id, Contract.status)).all())
+        return owners, statuses
+
+    def take(self):
+        height, tip_hash, balances = self.ledger.checkpoint()
+        if tip_hash is None:
+            return None
+        owners, statuses = self._state_rows()
+        path = write_snapshot(snapshot_path(self.directory, height, tip_hash), height, tip_hash,
+                              balances, owners, {key: value or '' for key, value in statuses.items()})
+        prune_snapshots(self.directory, self.keep)
+        self.last_height = height
+        return path
+
+    def maybe_take(self):
+        """Snapshot if the ledger moved `every` blocks past the last one."""
+        if self.ledger.height >= self.last_height + self.every:
+            return self.take()
+        return None
+
+    def restore(self, snapshot):
+        from sqlalchemy import bindparam, update
+        from Block import NFT, Contract
+        self.ledger.restore(snapshot.height, snapshot.block_hash, snapshot.balances())
+        nfts, contracts = NFT.__table__, Contract.__table__
+        owners = [{'key': token_id, 'new_owner': owner} for token_id, owner in snapshot.nft_owners()]
+        statuses = [{'key': contract_id, 'new_status': status} for contract_id, status in snapshot.contract_statuses()]
+        # Rows this database does not have yet (a node bootstrapped from a peer) match nothing and are skipped
+        with self.block_store.engine.begin() as connection:
+            if owners:
+                connection.execute(update(nfts).where(nfts.c.token_id == bindparam('key'))
+                                   .values(owner=bindparam('new_owner')), owners)
+            if statuses:
+                connection.execute(update(contracts).where(contracts.c.contract_id == bindparam('key'))
+                                   .values(status=bindparam('new_status')), statuses)
+        self.ledger.flush(self.block_store.engine)
+        self.last_height = snapshot.height
+
+    def start(self):
+        """Restore the newest valid snapshot, then replay stored blocks after it.
+
+        Returns (snapshot height or None, blocks replayed).
+        """
+        snapshot = latest_snapshot(self.directory)
+        restored = None
+        if snapshot is not None:
+            with snapshot:
+                self.restore(snapshot)
+                restored = snapshot.height
+        if self.rules is None:
+            blocks = self.block_store.load_chain_after(self.ledger.tip_hash)
+        else:
+            chain = self.block_store.load_chain_after()
+            if chain:
+                self.rules.chain = chain
+                self.rules.remember_valid(chain)
+            heights = {block.hash: height for height, block in enumerate(chain)}
+            if self.ledger.tip_hash is None:
+                blocks = chain
+            elif self.ledger.tip_hash in heights:
+                blocks = chain[heights[self.ledger.tip_hash] + 1:]
+            else:
+                # A snapshot fetched from a peer, ahead of every stored block: sync catches up
+                blocks = []
+        for block in blocks:
+            self.ledger.apply_block(block)
+        self.ledger.flush(self.block_store.engine)
+        return restored, len(blocks)
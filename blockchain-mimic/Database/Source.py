@@ -1,10 +1,57 @@
 import sqlite3
+from contextlib import contextmanager
 
-Class Create():
-    def __init__(self, db_file):
+# WAL lets API readers run while a block is being written and, with
+# synchronous=NORMAL, needs one fsync per checkpoint instead of one per commit
+WRITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # KiB, so 64 MiB
+    'temp_store': 'MEMORY',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+}
+READ_PRAGMAS = {
+    'cache_size': -16000,
+    'temp_store': 'MEMORY',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'query_only': 'ON',
+}
+
+def tune(connection, pragmas=WRITE_PRAGMAS):
+    """Apply pragmas to a raw sqlite3 connection (also usable as a SQLAlchemy connect listener)."""
+    cursor = connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+class Create():
+    def __init__(self, db_file, pragmas=WRITE_PRAGMAS):
         self.conn = sqlite3.connect(db_file)
+        tune(self.conn, pragmas)
         self.cursor = self.conn.cursor()
-    
-    def execute(self, query):
-        self.cursor.execute(query)
-        self.conn.commit()
\ No newline at end of file
+        self._in_transaction = False
+
+    def execute(self, query, params=()):
+        self.cursor.execute(query, params)
+        if not self._in_transaction:
+            self.conn.commit()
+
+    def executemany(self, query, rows):
+        self.cursor.executemany(query, rows)
+        if not self._in_transaction:
+            self.conn.commit()
+
+    @contextmanager
+    def transaction(self):
+        """Group statements into one commit, rolled back if any of them fails."""
+        self._in_transaction = True
+        try:
+            yield self
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self._in_transaction = False
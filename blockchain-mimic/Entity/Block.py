@@ -1,4 +1,5 @@
-from Hashes import HashManager
+from Hashes import HashManager, transaction_hash
+from Merkle import MerkleTree, verify_proof
 from datetime import datetime
 from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, JSON, Boolean
 from sqlalchemy.ext.declarative import declarative_base
@@ -18,13 +19,78 @@ class Block(Base):
     nonce = Column(Integer, default=0)
     validator = Column(String(42))
     signature = Column(String(132))
+    merkle_root = Column(String(64))
 
     # Relationships
     coin_transactions = relationship("CoinTransaction", backref="block")
     nfts = relationship("NFT", backref="block")
     contracts = relationship("Contract", backref="block")
-    
-    Index('ix_blocks_hash', Block.hash)
+
+    def merkle_tree(self):
+        """Merkle tree over the canonical hashes of coin_transactions, built once and then extended by add_transaction."""
+        tree = self.__dict__.get('_merkle_tree')
+        if tree is None or len(tree) != len(self.coin_transactions):
+            tree = MerkleTree(tx.compute_hash() for tx in self.coin_transactions)
+            self.__dict__['_merkle_tree'] = tree
+        return tree
+
+    def add_transaction(self, transaction):
+        """Append a coin transaction and update the stored Merkle root in O(log n)."""
+        tree = self.merkle_tree()
+        self.coin_transactions.append(transaction)
+        tree.append(transaction.compute_hash())
+        self.merkle_root = tree.root_hex()
+
+    def compute_merkle_root(self):
+        return MerkleTree(tx.compute_hash() for tx in self.coin_transactions).root_hex()
+
+    def has_valid_merkle_root(self):
+        return self.merkle_root == self.compute_merkle_root()
+
+    def merkle_proof(self, tx_hash):
+        """Inclusion proof for a transaction of this block, or None if it is not in it."""
+        tree = self.merkle_tree()
+        index = tree.index_of(tx_hash)
+        return tree.proof(index) if index is not None else None
+
+    @staticmethod
+    def verify_inclusion(tx_hash, proof, merkle_root):
+        """Light-client check that tx_hash is committed to by merkle_root, without the block body."""
+        return verify_proof(tx_hash, proof, merkle_root)
+
+    def header(self):
+        """Compact header: everything but the transaction bodies."""
+        return {
+            'hash': self.hash,
+            'previous_hash': self.previous_hash,
+            'merkle_root': self.merkle_root,
+            'nonce': self.nonce,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'validator': self.validator,
+            'signature': self.signature,
+        }
+
+    def to_dict(self):
+        data = self.header()
+        data['coin_transactions'] = [tx.to_dict() for tx in self.coin_transactions]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """Transient Block (and its transactions) from to_dict() output received from a peer."""
+        block = cls(
+            hash=data['hash'],
+            previous_hash=data['previous_hash'],
+            merkle_root=data.get('merkle_root'),
+            nonce=data.get('nonce', 0),
+            timestamp=datetime.fromisoformat(data['timestamp']) if data.get('timestamp') else None,
+            validator=data.get('validator'),
+            signature=data.get('signature'),
+        )
+        block.coin_transactions = [CoinTransaction.from_dict(tx) for tx in data.get('coin_transactions', [])]
+        return block
+
+    __table_args__ = (Index('ix_blocks_hash', 'hash'),)
 
 class CoinTransaction(Base):
     """Fungible token (coin) transfers."""
@@ -36,9 +102,47 @@ class CoinTransaction(Base):
     receiver = Column(String(42), nullable=False)
     amount = Column(Float, nullable=False)
     fee = Column(Float, default=0.0)
+    # Per-sender sequence number; orders a sender's transactions and stops replays
+    nonce = Column(Integer, default=0)
     signature = Column(String(132), nullable=False)
     block_id = Column(Integer, ForeignKey('blocks.id'))
 
+    # Address history, newest first: equality on the address, then (block_id, id) order
+    __table_args__ = (
+        Index('ix_coin_transactions_sender_block', 'sender', 'block_id'),
+        Index('ix_coin_transactions_receiver_block', 'receiver', 'block_id'),
+    )
+
+    def to_dict(self):
+        return {
+            'tx_hash': self.tx_hash,
+            'sender': self.sender,
+            'receiver': self.receiver,
+            'amount': self.amount,
+            'fee': self.fee,
+            'nonce': self.nonce,
+            'signature': self.signature,
+        }
+
+    def compute_hash(self):
+        """What tx_hash must be: the canonical hash of the fields, which is also the Merkle leaf."""
+        return transaction_hash(self.sender, self.receiver, self.amount, self.fee, self.nonce)
+
+    def has_valid_hash(self):
+        return self.tx_hash == self.compute_hash()
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            tx_hash=data['tx_hash'],
+            sender=data['sender'],
+            receiver=data['receiver'],
+            amount=data['amount'],
+            fee=data.get('fee', 0.0),
+            nonce=data.get('nonce', 0),
+            signature=data['signature'],
+        )
+
 class CoinBalance(Base):
     """Tracks fungible token balances for addresses."""
     __tablename__ = 'coin_balances'
@@ -55,11 +159,14 @@ class NFT(Base):
     creator = Column(String(42), nullable=False)
     owner = Column(String(42), nullable=False)
     asset_uri = Column(String(256), nullable=False)
-    metadata = Column(JSON)
+    # "metadata" is reserved on declarative classes; the column keeps its name
+    metadata_ = Column('metadata', JSON)
     block_id = Column(Integer, ForeignKey('blocks.id'))
 
     transfers = relationship("NFTTransfer", backref="nft")
 
+    __table_args__ = (Index('ix_nfts_owner', 'owner', 'id'),)
+
 class NFTTransfer(Base):
     """Tracks NFT ownership transfers."""
     __tablename__ = 'nft_transfers'
@@ -71,6 +178,27 @@ class NFTTransfer(Base):
     nft_id = Column(Integer, ForeignKey('nfts.id'))
     block_id = Column(Integer, ForeignKey('blocks.id'))
 
+    __table_args__ = (Index('ix_nft_transfers_nft_block', 'nft_id', 'block_id'),)
+
+    def to_dict(self):
+        return {
+            'from_address': self.from_address,
+            'to_address': self.to_address,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'nft_id': self.nft_id,
+            'block_id': self.block_id,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            from_address=data.get('from_address'),
+            to_address=data['to_address'],
+            timestamp=datetime.fromisoformat(data['timestamp']) if data.get('timestamp') else None,
+            nft_id=data.get('nft_id'),
+            block_id=data.get('block_id'),
+        )
+
 class Contract(Base):
     """Smart contract deployment and state."""
     __tablename__ = 'contracts'
@@ -95,3 +223,24 @@ class ContractEvent(Base):
     contract_id = Column(Integer, ForeignKey('contracts.id'))
     block_id = Column(Integer, ForeignKey('blocks.id'))
 
+    __table_args__ = (Index('ix_contract_events_contract_block', 'contract_id', 'block_id'),)
+
+    def to_dict(self):
+        return {
+            'trigger_tx_hash': self.trigger_tx_hash,
+            'action_type': self.action_type,
+            'action_data': self.action_data,
+            'contract_id': self.contract_id,
+            'block_id': self.block_id,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            trigger_tx_hash=data.get('trigger_tx_hash'),
+            action_type=data['action_type'],
+            action_data=data['action_data'],
+            contract_id=data.get('contract_id'),
+            block_id=data.get('block_id'),
+        )
+
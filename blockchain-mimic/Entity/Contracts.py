@@ -0,0 +1,393 @@
+import threading
+from collections import OrderedDict, deque
+from datetime import timezone
+from operator import add, mod, mul, sub, truediv
+
+from sqlalchemy import bindparam, select, update
+
+from Block import Contract
+
+# Coin transaction fields a contract may read as "tx.<field>"
+TX_FIELDS = ('tx_hash', 'sender', 'receiver', 'amount', 'fee', 'nonce')
+BLOCK_FIELDS = ('hash', 'previous_hash', 'timestamp', 'validator')
+COMPARISONS = {'==': '==', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+ORDERINGS = {'<', '<=', '>', '>='}  # Numbers only; == and != compare any literals
+ARITHMETIC = {'+': add, '-': sub, '*': mul, '/': truediv, '%': mod}
+WORD_BITS = 64  # Integer arithmetic costs one unit of gas per word of its result
+OPERATORS = {'var', 'in', 'not', 'and', 'or', 'min', 'max', 'if', *COMPARISONS, *ARITHMETIC}
+MAX_ACTION_TYPE = 20  # ContractEvent.action_type and Contract.status are String(20)
+
+class ContractError(Exception):
+    pass
+
+class OutOfGas(Exception):
+    pass
+
+def _number(value):
+    # type() rather than isinstance(): bools are ints, strings and lists multiply
+    if type(value) is not int and type(value) is not float:
+        raise TypeError(f"expected a number, got {type(value).__name__}")
+    return value
+
+def _arithmetic(meter, symbol, *operands):
+    """Fold operands with one arithmetic operator, charging meter[0] before each integer result is built."""
+    function = ARITHMETIC[symbol]
+    result = _number(operands[0])
+    for operand in operands[1:]:
+        _number(operand)
+        if type(result) is int and type(operand) is int:
+            # An upper bound on the result's size, so a huge one is refused before it is allocated
+            if symbol == '*':
+                bits = result.bit_length() + operand.bit_length()
+            else:
+                bits = max(result.bit_length(), operand.bit_length()) + 1
+            meter[0] -= bits // WORD_BITS
+            if meter[0] < 0:
+                raise OutOfGas
+        result = function(result, operand)
+    return result
+
+def _timestamp(value):
+    """block.timestamp as Unix seconds: blocks store naive UTC datetimes, which events could not store as JSON."""
+    return value.replace(tzinfo=timezone.utc).timestamp() if value is not None else None
+
+class CompiledContract:
+    """A contract's code turned into one Python function, plus what it needs at run time.
+
+    Invalid code compiles to an instance with error set; its triggers fail.
+    """
+
+    def __init__(self, contract_id, row_id, status, function=None, constants=(), error=None):
+        self.contract_id = contract_id
+        self.row_id = row_id
+        self.status = status
+        self.function = function
+        self.constants = constants
+        self.error = error
+
+class _Compiler:
+    """Validates contract code and emits the source of its trigger function.
+
+    Code is a JSON object:
+
+        {"params": {"answer": 42},
+         "rules": [{"when": {"==": [{"var": "tx.amount"}, {"var": "params.answer"}]},
+                    "emit": "award", "data": {"player": {"var": "tx.sender"}, "points": 10},
+                    "status": "closed", "stop": true}]}
+
+    Rules run in order for every trigger. A rule whose "when" holds emits an
+    event of type "emit" with "data" evaluated, optionally sets the contract's
+    status, and with "stop" ends the trigger. Expressions are JSON literals or
+    one-key objects: var, ==, !=, <, <=, >, >=, and, or, not, +, -, *, /, %,
+    min, max, if and in. Vars are tx.<field>, block.<field> (timestamp in Unix
+    seconds), block.height, contract.<contract_id|creator|status> and
+    params.<name>. Arithmetic, ordering, min and max take numbers only.
+
+    Literals never appear in the generated source; they are passed in a
+    constants tuple and read as K[i]. Gas is kept in the one-item list G.
+    Each node costs one unit, and a rule's cost is charged before it runs, so
+    gas is checked once per rule rather than per operation; integer
+    arithmetic alone also charges a unit per word of its result as it goes.
+    """
+
+    def __init__(self, contract_id, creator, code):
+        self.contract_id = contract_id
+        self.creator = creator
+        self.code = code
+        self.constants = []
+        self.params = {}
+
+    def constant(self, value):
+        self.constants.append(value)
+        return f"K[{len(self.constants) - 1}]"
+
+    def var(self, path):
+        if not isinstance(path, str) or path.count('.') != 1:
+            raise ContractError(f"Bad variable {path!r}")
+        root, name = path.split('.')
+        if root == 'tx' and name in TX_FIELDS:
+            return f"tx.{name}"
+        if root == 'block' and name == 'height':
+            return 'height'
+        if root == 'block' and name == 'timestamp':
+            return 'timestamp(block.timestamp)'
+        if root == 'block' and name in BLOCK_FIELDS:
+            return f"block.{name}"
+        if root == 'contract' and name == 'status':
+            return 'status'
+        if root == 'contract' and name == 'contract_id':
+            return self.constant(self.contract_id)
+        if root == 'contract' and name == 'creator':
+            return self.constant(self.creator)
+        if root == 'params' and name in self.params:
+            return self.constant(self.params[name])
+        raise ContractError(f"Unknown variable {path!r}")
+
+    def expression(self, node):
+        """(Python source, gas cost) of an expression node."""
+        if node is None or isinstance(node, (bool, int, float, str)):
+            return self.constant(node), 1
+        if not isinstance(node, dict) or len(node) != 1:
+            raise ContractError(f"Bad expression {node!r}")
+        (operator, args), = node.items()
+        if operator == 'var':
+            return self.var(args), 1
+        if operator == 'in':
+            if not (isinstance(args, list) and len(args) == 2 and isinstance(args[1], list)
+                    and all(item is None or isinstance(item, (bool, int, float, str)) for item in args[1])):
+                raise ContractError("'in' takes an expression and a list of literals")
+            source, cost = self.expression(args[0])
+            return f"({source} in {self.constant(frozenset(args[1]))})", cost + 1
+        args = args if isinstance(args, list) else [args]
+        compiled = [self.expression(arg) for arg in args]
+        sources = [source for source, _ in compiled]
+        cost = 1 + sum(cost for _, cost in compiled)
+        if operator in ORDERINGS and len(args) == 2:
+            return f"(number({sources[0]}) {COMPARISONS[operator]} number({sources[1]}))", cost
+        if operator in COMPARISONS and len(args) == 2:
+            return f"({sources[0]} {COMPARISONS[operator]} {sources[1]})", cost
+        if operator in ARITHMETIC and len(args) >= 2:
+            return f"arithmetic(G, {operator!r}, {', '.join(sources)})", cost
+        if operator in ('and', 'or') and args:
+            return '(' + f" {operator} ".join(sources) + ')', cost
+        if operator == 'not' and len(args) == 1:
+            return f"(not {sources[0]})", cost
+        if operator in ('min', 'max') and args:
+            return f"{operator}({', '.join(f'number({source})' for source in sources)})", cost
+        if operator == 'if' and len(args) == 3:
+            return f"({sources[1]} if {sources[0]} else {sources[2]})", cost
+        raise ContractError(f"Bad operator {operator!r} with {len(args)} arguments")
+
+    def rule(self, rule, lines):
+        if not isinstance(rule, dict) or not set(rule) <= {'when', 'emit', 'data', 'status', 'stop'}:
+            raise ContractError(f"Bad rule {rule!r}")
+        condition, cost = self.expression(rule.get('when', True))
+        body, body_cost = [], 0
+        if 'emit' in rule:
+            action_type = rule['emit']
+            if not isinstance(action_type, str) or not 0 < len(action_type) <= MAX_ACTION_TYPE:
+                raise ContractError(f"Bad event type {action_type!r}")
+            data = rule.get('data', {})
+            if isinstance(data, dict) and not (len(data) == 1 and next(iter(data)) in OPERATORS):
+                fields = []
+                for key, value in data.items():
+                    source, field_cost = self.expression(value)
+                    fields.append(f"{self.constant(str(key))}: {source}")
+                    body_cost += field_cost
+                data_source = '{' + ', '.join(fields) + '}'
+            else:
+                data_source, body_cost = self.expression(data)
+            body.append(f"events.append(({self.constant(action_type)}, {data_source}))")
+            body_cost += 1
+        if 'status' in rule:
+            status = rule['status']
+            if not isinstance(status, str) or not 0 < len(status) <= MAX_ACTION_TYPE:
+                raise ContractError(f"Bad status {status!r}")
+            body.append(f"status = {self.constant(status)}")
+            body_cost += 1
+        if rule.get('stop'):
+            body.append("return events, status, G[0]")
+
+        lines += [f"    G[0] -= {cost}", "    if G[0] < 0: raise OutOfGas", f"    if {condition}:"]
+        if body_cost:
+            lines += [f"        G[0] -= {body_cost}", "        if G[0] < 0: raise OutOfGas"]
+        lines += [f"        {line}" for line in body] or ["        pass"]
+
+    def compile(self):
+        code = self.code
+        if not isinstance(code, dict) or not set(code) <= {'params', 'rules'}:
+            raise ContractError("Code must be an object with 'rules' and optional 'params'")
+        params = code.get('params', {})
+        if not isinstance(params, dict) or not all(
+                value is None or isinstance(value, (bool, int, float, str)) for value in params.values()):
+            raise ContractError("'params' must map names to literals")
+        self.params = params
+        rules = code.get('rules')
+        if not isinstance(rules, list) or not rules:
+            raise ContractError("'rules' must be a non-empty list")
+        lines = ["def trigger(tx, block, height, status, gas):", "    events = []", "    G = [gas]"]
+        for rule in rules:
+            self.rule(rule, lines)
+        lines.append("    return events, status, G[0]")
+        namespace = {'K': tuple(self.constants), 'OutOfGas': OutOfGas, 'min': min, 'max': max,
+                     'number': _number, 'arithmetic': _arithmetic, 'timestamp': _timestamp}
+        exec(compile('\n'.join(lines), f"<contract {self.contract_id}>", 'exec'), namespace)
+        return namespace['trigger'], namespace['K']
+
+def compile_contract(contract_id, row_id, creator, code, status='active'):
+    """CompiledContract for one row of contracts; never raises for bad code."""
+    try:
+        function, constants = _Compiler(contract_id, creator, code).compile()
+    except (ContractError, RecursionError, SyntaxError) as e:  # Nesting too deep for Python's parser
+        return CompiledContract(contract_id, row_id, status, error=str(e))
+    return CompiledContract(contract_id, row_id, status, function, constants)
+
+class ContractEngine:
+    """Runs the contracts that a block's coin transactions trigger.
+
+    A coin transaction to a contract's contract_id triggers it. Contracts are
+    loaded and compiled on first use, one query per block for all of the
+    block's uncached contracts, and kept in an LRU keyed by contract_id. The
+    set of contract ids is read once, so telling contracts from plain
+    addresses costs a set lookup; invalidate() keeps it current when a
+    contract is deployed. Only active contracts run.
+
+    Each trigger gets gas_limit gas, and a block gets block_gas_limit in all.
+    A trigger that runs out, or raises anything at all, has its events and
+    status change dropped and is recorded as a "failed" event instead. Once the block's gas
+    is gone, its remaining triggers fail without running. Status changes are
+    kept in memory and written back in one batched UPDATE by flush().
+
+    Blocks run with a height leave an undo record of the statuses they
+    changed, kept for the last max_undo heights, so rollback() can put the
+    statuses back when a reorg replaces those blocks.
+    """
+
+    def __init__(self, engine, cache_size=1024, gas_limit=1000, block_gas_limit=1_000_000, max_undo=256):
+        self.engine = engine
+        self.cache_size = cache_size
+        self.gas_limit = gas_limit
+        self.block_gas_limit = block_gas_limit
+        self._cache = OrderedDict()  # contract_id -> CompiledContract
+        self._ids = None  # Every deployed contract_id, read on first use
+        self._dirty = {}  # contract_id -> (row id, status) not written back yet
+        self._undo = deque(maxlen=max_undo)  # (height, {contract_id: (row id, status before)})
+        self._lock = threading.RLock()
+        self.stats = {'hits': 0, 'misses': 0, 'compiled': 0, 'evicted': 0, 'triggers': 0,
+                      'events': 0, 'failed': 0, 'gas_used': 0}
+
+    def _remember(self, contract_id, contract):
+        self._cache[contract_id] = contract
+        self._cache.move_to_end(contract_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+            self.stats['evicted'] += 1
+
+    def _contract_ids(self):
+        if self._ids is None:
+            table = Contract.__table__
+            with self.engine.connect() as connection:
+                self._ids = set(connection.execute(select(table.c.contract_id)).scalars())
+        return self._ids
+
+    def _load(self, receivers):
+        """Cached contracts among receivers, loading and compiling the missing ones in one query."""
+        ids = self._contract_ids()
+        found, missing = {}, []
+        for receiver in receivers:
+            if receiver not in ids:
+                continue
+            contract = self._cache.get(receiver)
+            if contract is not None:
+                self.stats['hits'] += 1
+                self._cache.move_to_end(receiver)
+                found[receiver] = contract
+            else:
+                missing.append(receiver)
+        if not missing:
+            return found
+        self.stats['misses'] += len(missing)
+        table = Contract.__table__
+        statement = select(table.c.id, table.c.contract_id, table.c.creator, table.c.code, table.c.status)
+        with self.engine.connect() as connection:
+            for i in range(0, len(missing), 500):
+                for row in connection.execute(statement.where(table.c.contract_id.in_(missing[i:i + 500]))):
+                    # A status changed here but not flushed yet is newer than the row
+                    status = self._dirty.get(row.contract_id, (None, row.status))[1]
+                    contract = compile_contract(row.contract_id, row.id, row.creator, row.code, status)
+                    self.stats['compiled'] += 1
+                    found[row.contract_id] = contract
+                    self._remember(row.contract_id, contract)
+        return found
+
+    def invalidate(self, contract_id):
+        """Forget a cached contract, or learn of one just deployed under contract_id."""
+        with self._lock:
+            self._cache.pop(contract_id, None)
+            if self._ids is not None:
+                self._ids.add(contract_id)
+
+    def run_block(self, block, height=None):
+        """ContractEvent rows (as dicts, contract_id being the contracts row id) for one block's triggers."""
+        with self._lock:
+            transactions = block.coin_transactions
+            contracts = self._load(list(dict.fromkeys(tx.receiver for tx in transactions)))
+            events, undo = [], {}
+            block_gas = self.block_gas_limit
+            for tx in transactions:
+                contract = contracts.get(tx.receiver)
+                if contract is None or contract.status != 'active':
+                    continue
+                self.stats['triggers'] += 1
+                error = contract.error
+                if error is None:
+                    if block_gas <= 0:
+                        error = 'block gas limit reached'
+                    else:
+                        gas = min(self.gas_limit, block_gas)
+                        try:
+                            emitted, status, left = contract.function(tx, block, height, contract.status, gas)
+                        except OutOfGas:
+                            error, left = 'out of gas', 0
+                        except Exception as e:  # MemoryError and RecursionError included: never fail the block
+                            error, left = f"{type(e).__name__}: {e}"[:200], 0
+                        block_gas -= gas - left
+                        self.stats['gas_used'] += gas - left
+                if error is not None:
+                    self.stats['failed'] += 1
+                    events.append({'trigger_tx_hash': tx.tx_hash, 'action_type': 'failed',
+                                   'action_data': {'error': error}, 'contract_id': contract.row_id})
+                    continue
+                for action_type, data in emitted:
+                    events.append({'trigger_tx_hash': tx.tx_hash, 'action_type': action_type,
+                                   'action_data': data, 'contract_id': contract.row_id})
+                if status != contract.status:
+                    undo.setdefault(contract.contract_id, (contract.row_id, contract.status))
+                    contract.status = status
+                    self._dirty[contract.contract_id] = (contract.row_id, status)
+            if height is not None:
+                if self._undo and self._undo[-1][0] >= height:
+                    # Running a height again without a rollback: older records no longer describe this chain
+                    self._undo.clear()
+                self._undo.append((height, undo))
+            self.stats['events'] += len(events)
+            return events
+
+    def rollback(self, height, tip):
+        """Undo the blocks at heights height + 1 to tip, newest first, restoring their contract statuses.
+
+        Raises ContractError, changing nothing, unless each of those blocks
+        still has its undo record; blocks run before a restart have none.
+        """
+        with self._lock:
+            undone = [record for record in self._undo if record[0] > height]
+            if [record[0] for record in undone] != list(range(height + 1, tip + 1)):
+                raise ContractError(f"Fork at height {height} is deeper than the contract undo history")
+            for _ in undone:
+                _, undo = self._undo.pop()
+                for contract_id, (row_id, status) in undo.items():
+                    contract = self._cache.get(contract_id)
+                    if contract is not None:
+                        contract.status = status
+                    self._dirty[contract_id] = (row_id, status)
+            return len(undone)
+
+    def run_blocks(self, blocks, start_height=None):
+        """Run every block in order and attach its events as block.contract_events, which BlockStore stores."""
+        for offset, block in enumerate(blocks):
+            height = None if start_height is None else start_height + offset
+            block.contract_events = self.run_block(block, height)
+        return blocks
+
+    def flush(self, engine=None):
+        """Write changed contract statuses back in one executemany."""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            rows = [{'key': row_id, 'new_status': status} for row_id, status in self._dirty.values()]
+            table = Contract.__table__
+            with (engine or self.engine).begin() as connection:
+                connection.execute(update(table).where(table.c.id == bindparam('key'))
+                                   .values(status=bindparam('new_status')), rows)
+            self._dirty.clear()
+            return len(rows)
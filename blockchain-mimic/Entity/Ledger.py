@@ -0,0 +1,185 @@
+import threading
+from collections import deque
+from decimal import Decimal
+
+from sqlalchemy.dialects.sqlite import insert
+
+from Block import CoinBalance
+
+# Coins are counted in integer base units in memory; the Float columns only
+# ever receive exact conversions of these, so no rounding error accumulates
+UNITS_PER_COIN = 10 ** 8
+# Longest address: the coin_balances key, and the key size of snapshot balance records
+ADDRESS_LENGTH = CoinBalance.__table__.c.address.type.length
+
+def to_units(amount):
+    return int((Decimal(str(amount)) * UNITS_PER_COIN).to_integral_value())
+
+def to_coins(units):
+    return units / UNITS_PER_COIN
+
+class LedgerError(Exception):
+    pass
+
+class Ledger:
+    """In-memory coin balances that follow the chain block by block.
+
+    apply_block() checks every transfer of a block before changing anything,
+    so a block is applied whole or not at all, and keeps an undo record for
+    the last max_undo blocks so a reorg can roll them back. Changed addresses
+    are written to coin_balances in one batched upsert per flush() instead of
+    two ORM round trips per transfer.
+
+    Addresses in issuers (a faucet or quiz treasury) may go negative; that is
+    how coins enter circulation.
+    """
+
+    def __init__(self, issuers=(), max_undo=256):
+        self.issuers = set(issuers)
+        self.balances = {}
+        self.height = -1
+        self.tip_hash = None
+        self._undo = deque(maxlen=max_undo)  # (block hash, {address: balance before or None})
+        # Tip below the oldest undo record: a restored snapshot or the block that fell off the deque
+        self._base_hash = None
+        self._dirty = set()
+        self._lock = threading.RLock()
+
+    def balance(self, address):
+        return self.balances.get(address, 0)
+
+    def checkpoint(self):
+        """Consistent (height, tip_hash, balances) for a snapshot."""
+        with self._lock:
+            return self.height, self.tip_hash, dict(self.balances)
+
+    def restore(self, height, tip_hash, balances):
+        """Start from a snapshot of the balances at (height, tip_hash) instead of from genesis."""
+        with self._lock:
+            self.balances = dict(balances)
+            self.height, self.tip_hash = height, tip_hash
+            self._undo.clear()
+            self._base_hash = tip_hash
+            self._dirty = set(self.balances)
+
+    def block_deltas(self, block):
+        deltas = {}
+        for tx in block.coin_transactions:
+            for address in (tx.sender, tx.receiver):
+                # Blocks from peers skip mempool admission, so addresses are bounded here too
+                if not isinstance(address, str) or not 0 < len(address) <= ADDRESS_LENGTH:
+                    raise LedgerError(f"Transaction {tx.tx_hash} has an address longer than {ADDRESS_LENGTH}")
+            try:
+                amount, fee = to_units(tx.amount), to_units(tx.fee or 0)
+            except (ArithmeticError, TypeError, ValueError):  # NaN, infinity or not a number at all
+                raise LedgerError(f"Transaction {tx.tx_hash} moves a non-finite amount") from None
+            if amount <= 0 or fee < 0:
+                raise LedgerError(f"Transaction {tx.tx_hash} moves a non-positive amount")
+            deltas[tx.sender] = deltas.get(tx.sender, 0) - amount - fee
+            deltas[tx.receiver] = deltas.get(tx.receiver, 0) + amount
+            if fee:
+                # Without a validator to collect it the fee is burned
+                if block.validator:
+                    if not isinstance(block.validator, str) or len(block.validator) > ADDRESS_LENGTH:
+                        raise LedgerError(f"Block {block.hash} has a validator longer than {ADDRESS_LENGTH}")
+                    deltas[block.validator] = deltas.get(block.validator, 0) + fee
+        return deltas
+
+    def apply_block(self, block):
+        """Apply one block on top of tip_hash atomically; raises LedgerError and changes nothing if it overdraws."""
+        with self._lock:
+            if self.tip_hash is not None and block.previous_hash != self.tip_hash:
+                raise LedgerError(f"Block {block.hash} does not extend ledger tip {self.tip_hash}")
+            deltas = self.block_deltas(block)
+            # Net deltas per block: an address may spend coins it receives in the same block
+            for address, delta in deltas.items():
+                if delta < 0 and address not in self.issuers and self.balance(address) + delta < 0:
+                    raise LedgerError(f"Block {block.hash} overdraws {address}")
+            undo = {address: self.balances.get(address) for address in deltas}
+            for address, delta in deltas.items():
+                self.balances[address] = self.balance(address) + delta
+            self._dirty.update(deltas)
+            if len(self._undo) == self._undo.maxlen:
+                self._base_hash = self._undo[0][0]
+            self._undo.append((block.hash, undo))
+            self.height += 1
+            self.tip_hash = block.hash
+
+    def rollback(self):
+        """Undo the last applied block."""
+        with self._lock:
+            if not self._undo:
+                raise LedgerError(f"Fork below height {self.height} is deeper than the undo history; rebuild the ledger")
+            block_hash, undo = self._undo.pop()
+            for address, balance in undo.items():
+                if balance is None:
+                    self.balances.pop(address, None)
+                else:
+                    self.balances[address] = balance
+            self._dirty.update(undo)
+            self.height -= 1
+            self.tip_hash = self._undo[-1][0] if self._undo else self._base_hash
+
+    def follow(self, chain):
+        """Roll back past the fork with chain, then apply its newer blocks.
+
+        A chain shorter than the ledger (still syncing after a snapshot restore)
+        is left alone until it catches up.
+        """
+        with self._lock:
+            if self.height >= len(chain):
+                return
+            while self.height >= 0 and chain[self.height].hash != self.tip_hash:
+                self.rollback()
+            for block in chain[self.height + 1:]:
+                self.apply_block(block)
+
+    def check_follow(self, chain, fork, suffix):
+        """Raise LedgerError if follow(chain[:fork + 1] + suffix) would; changes nothing.
+
+        The rollback and the new blocks are replayed on an overlay of the
+        balances they touch, so a synced suffix can be refused before it is
+        adopted without copying the chain or the balances.
+        """
+        def block_at(height):
+            return chain[height] if height <= fork else suffix[height - fork - 1]
+
+        with self._lock:
+            length = fork + 1 + len(suffix)
+            if self.height >= length:
+                return
+            overlay, height, index = {}, self.height, len(self._undo)
+            tip_hash = self.tip_hash
+            while height >= 0 and block_at(height).hash != tip_hash:
+                if not index:
+                    raise LedgerError(f"Fork below height {height} is deeper than the undo history")
+                index -= 1
+                overlay.update(self._undo[index][1])
+                height -= 1
+                tip_hash = self._undo[index - 1][0] if index else self._base_hash
+            for height in range(height + 1, length):
+                block = block_at(height)
+                for address, delta in self.block_deltas(block).items():
+                    balance = (overlay[address] if address in overlay else self.balances.get(address)) or 0
+                    if delta < 0 and address not in self.issuers and balance + delta < 0:
+                        raise LedgerError(f"Block {block.hash} overdraws {address}")
+                    overlay[address] = balance + delta
+
+    def flush(self, engine):
+        """Write changed balances in one transaction with a batched upsert. Returns rows written."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            rows = [{'address': address, 'balance': to_coins(self.balances.get(address, 0))} for address in dirty]
+        if not rows:
+            return 0
+        statement = insert(CoinBalance)
+        statement = statement.on_conflict_do_update(
+            index_elements=[CoinBalance.address], set_={'balance': statement.excluded.balance})
+        try:
+            with engine.begin() as connection:
+                connection.execute(statement, rows)
+        except Exception:
+            with self._lock:
+                self._dirty.update(dirty)
+            raise
+        return len(rows)
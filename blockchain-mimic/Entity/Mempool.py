@@ -0,0 +1,207 @@
+import bisect
+import heapq
+import itertools
+import json
+import math
+import threading
+
+from Hashes import transaction_hash
+
+# Longest value each string field may hold: the String sizes of the
+# coin_transactions columns, which snapshot records are sized from as well
+FIELD_LENGTHS = {'tx_hash': 66, 'sender': 42, 'receiver': 42, 'signature': 132}
+
+class MempoolError(ValueError):
+    pass
+
+class Mempool:
+    """Pending coin transactions waiting for a block, kept as CoinTransaction.to_dict() dicts.
+
+    Transactions are indexed by tx_hash. Each sender's transactions queue up in
+    nonce order and only the head of each queue is "ready"; ready heads sit in
+    a max-heap by fee, so a block template takes the k best transactions in
+    O(k log n) while never putting a sender's nonce n+1 before n. When full,
+    the lowest-fee transaction is evicted together with its sender's later
+    nonces, which could no longer be mined. Both heaps delete lazily.
+    """
+
+    def __init__(self, max_size=50000, replace_bump=1.1):
+        self.max_size = max_size
+        # A transaction replaces one with the same sender and nonce only if its fee is this much higher
+        self.replace_bump = replace_bump
+        self._lock = threading.Lock()
+        self._by_hash = {}  # tx_hash -> tx
+        self._by_sender = {}  # sender -> ([nonces, ascending], {nonce: tx_hash})
+        self._ready = []  # (-fee, seq, tx_hash) of sender queue heads
+        self._lowest = []  # (fee, seq, tx_hash) of every transaction, for eviction
+        self._sequence = itertools.count()
+        self.stats = {'accepted': 0, 'duplicates': 0, 'replaced': 0, 'evicted': 0, 'rejected': 0}
+
+    def __len__(self):
+        return len(self._by_hash)
+
+    def __contains__(self, tx_hash):
+        return tx_hash in self._by_hash
+
+    def get(self, tx_hash):
+        return self._by_hash.get(tx_hash)
+
+    def _is_head(self, tx_hash):
+        tx = self._by_hash.get(tx_hash)
+        if tx is None:
+            return False
+        nonces, _ = self._by_sender[tx['sender']]
+        return nonces[0] == tx['nonce']
+
+    def _push_head(self, sender):
+        nonces, hashes = self._by_sender[sender]
+        tx = self._by_hash[hashes[nonces[0]]]
+        heapq.heappush(self._ready, (-tx['fee'], next(self._sequence), tx['tx_hash']))
+
+    def _insert(self, tx):
+        sender, nonce = tx['sender'], tx['nonce']
+        nonces, hashes = self._by_sender.setdefault(sender, ([], {}))
+        bisect.insort(nonces, nonce)
+        hashes[nonce] = tx['tx_hash']
+        self._by_hash[tx['tx_hash']] = tx
+        heapq.heappush(self._lowest, (tx['fee'], next(self._sequence), tx['tx_hash']))
+        if nonces[0] == nonce:
+            self._push_head(sender)
+
+    def _remove(self, tx_hash, cascade=False):
+        """Drop a transaction (and with cascade, its sender's later nonces). Returns how many went."""
+        tx = self._by_hash.pop(tx_hash, None)
+        if tx is None:
+            return 0
+        sender = tx['sender']
+        nonces, hashes = self._by_sender[sender]
+        position = bisect.bisect_left(nonces, tx['nonce'])
+        removed = 1
+        if cascade:
+            for nonce in nonces[position + 1:]:
+                del self._by_hash[hashes.pop(nonce)]
+                removed += 1
+            del nonces[position:]
+        else:
+            del nonces[position]
+        del hashes[tx['nonce']]
+        if not nonces:
+            del self._by_sender[sender]
+        elif position == 0:
+            self._push_head(sender)
+        return removed
+
+    def _compact(self):
+        # Stale heap entries are skipped on pop; rebuild once they dominate
+        if len(self._lowest) > 2 * len(self._by_hash) + 1024:
+            self._lowest = [entry for entry in self._lowest if entry[2] in self._by_hash]
+            heapq.heapify(self._lowest)
+        if len(self._ready) > 2 * len(self._by_sender) + 1024:
+            self._ready = [entry for entry in self._ready if self._is_head(entry[2])]
+            heapq.heapify(self._ready)
+
+    def add(self, tx):
+        """Admit a transaction dict. Returns False if already pooled; raises MempoolError if refused."""
+        try:
+            tx = dict(tx, amount=float(tx['amount']), fee=float(tx.get('fee') or 0.0),
+                      nonce=int(tx.get('nonce') or 0))
+            for name, length in FIELD_LENGTHS.items():
+                if not isinstance(tx[name], str) or not 0 < len(tx[name]) <= length:
+                    raise MempoolError(f"{name} must be a string of 1 to {length} characters")
+            # float() accepts "nan", "inf" and "1e400", which no balance can hold
+            if not (math.isfinite(tx['amount']) and math.isfinite(tx['fee'])):
+                raise MempoolError("Amount and fee must be finite")
+            if tx['amount'] <= 0 or tx['fee'] < 0:
+                raise MempoolError("Amount must be positive and fee non-negative")
+            if tx['tx_hash'] != transaction_hash(tx['sender'], tx['receiver'], tx['amount'], tx['fee'], tx['nonce']):
+                raise MempoolError("tx_hash is not the hash of the transaction's fields")
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            self.stats['rejected'] += 1
+            raise e if isinstance(e, MempoolError) else MempoolError(f"Malformed transaction: {e}")
+
+        with self._lock:
+            if tx['tx_hash'] in self._by_hash:
+                self.stats['duplicates'] += 1
+                return False
+            queue = self._by_sender.get(tx['sender'])
+            existing = queue and queue[1].get(tx['nonce'])
+            if existing:
+                if tx['fee'] < self._by_hash[existing]['fee'] * self.replace_bump:
+                    self.stats['rejected'] += 1
+                    raise MempoolError(f"Nonce {tx['nonce']} of {tx['sender']} is already pooled with a higher fee")
+                self._remove(existing)
+                self.stats['replaced'] += 1
+
+            if len(self._by_hash) >= self.max_size:
+                while self._lowest and self._lowest[0][2] not in self._by_hash:
+                    heapq.heappop(self._lowest)
+                if self._lowest and self._lowest[0][0] >= tx['fee']:
+                    self.stats['rejected'] += 1
+                    raise MempoolError("Mempool is full and the fee is too low")
+            self._insert(tx)
+            while len(self._by_hash) > self.max_size:
+                fee, _, victim = heapq.heappop(self._lowest)
+                self.stats['evicted'] += self._remove(victim, cascade=True)
+            self._compact()
+            if tx['tx_hash'] not in self._by_hash:
+                # Went out with a cheaper earlier nonce of the same sender
+                self.stats['rejected'] += 1
+                raise MempoolError("Mempool is full and an earlier nonce of this sender was evicted")
+            self.stats['accepted'] += 1
+            return True
+
+    def remove_included(self, tx_hashes):
+        """Forget transactions that made it into a committed block."""
+        with self._lock:
+            removed = sum(self._remove(tx_hash) for tx_hash in tx_hashes)
+            self._compact()
+            return removed
+
+    def template(self, max_txs=1000, max_bytes=None):
+        """Highest-fee transactions for the next block, in a valid per-sender nonce order.
+
+        Pops at most about k entries from the ready heap and pushes them back, so
+        the cost is O(k log n) whatever the pool size.
+        """
+        with self._lock:
+            chosen, size = [], 0
+            taken = []  # ready-heap entries popped here, restored at the end
+            successors = []  # next nonces of senders already in the template
+            seen = set()
+            while len(chosen) < max_txs and (self._ready or successors):
+                if successors and (not self._ready or successors[0] < self._ready[0]):
+                    entry = heapq.heappop(successors)
+                else:
+                    entry = heapq.heappop(self._ready)
+                    if entry[2] in seen or not self._is_head(entry[2]):
+                        continue  # Stale: already removed or no longer the head
+                    taken.append(entry)
+                seen.add(entry[2])
+                tx = self._by_hash[entry[2]]
+                if max_bytes is not None:
+                    tx_size = len(json.dumps(tx))
+                    if size + tx_size > max_bytes:
+                        continue  # This sender's later nonces cannot go in either
+                    size += tx_size
+                chosen.append(tx)
+
+                nonces, hashes = self._by_sender[tx['sender']]
+                position = bisect.bisect_right(nonces, tx['nonce'])
+                if position < len(nonces) and nonces[position] == tx['nonce'] + 1:
+                    following = self._by_hash[hashes[nonces[position]]]
+                    heapq.heappush(successors, (-following['fee'], next(self._sequence), following['tx_hash']))
+            for entry in taken:
+                heapq.heappush(self._ready, entry)
+            return chosen
+
+    def snapshot(self, limit=100):
+        """Stats plus the best ready transactions, for the query endpoint."""
+        with self._lock:
+            best = dict.fromkeys(entry[2] for entry in heapq.nsmallest(limit, self._ready) if self._is_head(entry[2]))
+            return {
+                'size': len(self._by_hash),
+                'senders': len(self._by_sender),
+                'max_size': self.max_size,
+                'stats': dict(self.stats),
+                'top': [self._by_hash[tx_hash] for tx_hash in best],
+            }
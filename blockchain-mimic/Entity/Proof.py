@@ -0,0 +1,136 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+
+from Hashes import HashManager
+
+HASHES = HashManager('sha256')
+# Nonces live in a signed 64-bit column
+MAX_NONCE = (1 << 63) - 1
+
+class ProofError(Exception):
+    pass
+
+@lru_cache(maxsize=64)
+def target(difficulty_bits):
+    return HASHES.target(difficulty_bits)
+
+def work_prefix(header):
+    """Header bytes hashed ahead of the nonce: everything the proof commits to.
+
+    The block hash is sha256 of previous_hash, merkle_root, the ISO timestamp
+    and validator, each followed by "|", then the decimal nonce. Missing
+    fields hash as empty strings. The separators keep a validator's trailing
+    digits from being read as part of the nonce. The prefix is hashed once
+    and only the nonce changes between attempts.
+    """
+    fields = (header['previous_hash'], header['merkle_root'], header.get('timestamp'), header.get('validator'))
+    return ''.join(f"{field or ''}|" for field in fields).encode()
+
+def work_digest(header, nonce):
+    return HASHES.prepare(work_prefix(header)).digest(b'%d' % nonce)
+
+def check_work(header, difficulty_bits):
+    """header['hash'] is the work hash of its nonce and meets the difficulty target."""
+    nonce = header.get('nonce')
+    if not isinstance(nonce, int) or not 0 <= nonce <= MAX_NONCE:
+        return False
+    try:
+        claimed = bytes.fromhex(header['hash'])
+    except (TypeError, ValueError):
+        return False
+    digest = work_digest(header, nonce)
+    return digest == claimed and HASHES.meets_target(digest, target(difficulty_bits))
+
+_stop = None
+
+def _init_worker(stop):
+    global _stop
+    _stop = stop
+
+def _search(prefix, goal, first, stride, chunk, end):
+    """Try chunk-sized nonce runs first, first + stride, ... below end.
+
+    Returns (winning nonce or None, hashes tried). Between runs the worker
+    gives up if another one has already won.
+    """
+    copy = HASHES.prepare(prefix).copy
+    tried = 0
+    for start in range(first, end, stride):
+        if _stop is not None and _stop.is_set():
+            break
+        for nonce in range(start, min(start + chunk, end)):
+            hash_function = copy()
+            hash_function.update(b'%d' % nonce)
+            if hash_function.digest() <= goal:
+                return nonce, tried + nonce - start + 1
+        tried += min(start + chunk, end) - start
+    return None, tried
+
+class Miner:
+    """Nonce search spread over a process pool.
+
+    Worker i of n tries the chunk-sized runs i, i + n, i + 2n, ... so the
+    ranges are disjoint and all workers stay near the bottom of the nonce
+    space. The first worker to find a proof sets a shared event and the rest
+    stop within one chunk. The pool and its event are reused across searches.
+    """
+
+    def __init__(self, workers=None, chunk=1 << 14):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk = chunk
+        self.stats = {'hashes': 0, 'seconds': 0.0, 'hashes_per_second': 0.0}
+        self._executor = None
+        self._stop = None
+
+    def _pool(self):
+        if self._executor is None:
+            context = multiprocessing.get_context()
+            self._stop = context.Event()
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                                 initializer=_init_worker, initargs=(self._stop,))
+        return self._executor
+
+    def search(self, prefix, difficulty_bits, start=0, end=MAX_NONCE + 1):
+        """A nonce in [start, end) whose work hash meets the target; ProofError if there is none."""
+        goal = target(difficulty_bits)
+        started = time.perf_counter()
+        if self.workers < 2:
+            nonce, hashes = _search(prefix, goal, start, self.chunk, self.chunk, end)
+        else:
+            executor = self._pool()
+            self._stop.clear()
+            stride = self.chunk * self.workers
+            pending = {executor.submit(_search, prefix, goal, start + i * self.chunk, stride, self.chunk, end)
+                       for i in range(self.workers)}
+            nonce, hashes = None, 0
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    found, tried = future.result()
+                    hashes += tried
+                    if found is not None and (nonce is None or found < nonce):
+                        nonce = found
+                if nonce is not None:
+                    self._stop.set()
+        elapsed = time.perf_counter() - started
+        self.stats = {'hashes': hashes, 'seconds': elapsed, 'hashes_per_second': hashes / elapsed if elapsed else 0.0}
+        if nonce is None:
+            raise ProofError(f"No nonce in [{start}, {end}) meets {difficulty_bits} bits")
+        return nonce
+
+    def seal(self, block, difficulty_bits):
+        """Set block.nonce and block.hash to a proof of work over its header."""
+        header = {'previous_hash': block.previous_hash, 'merkle_root': block.merkle_root,
+                  'timestamp': block.timestamp.isoformat() if block.timestamp else None,
+                  'validator': block.validator}
+        block.nonce = self.search(work_prefix(header), difficulty_bits)
+        block.hash = work_digest(header, block.nonce).hex()
+        return block
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
@@ -1,19 +1,149 @@
-class Rules:
-    def is_block_valid(self, new_block, previous_block):
-    # Check hash linkage
-    if previous_block.hash != new_block.previous_hash:
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from Hashes import transaction_hash
+from Merkle import MerkleTree
+from Proof import Miner, check_work
+
+def block_header(block):
+    """Picklable view of what the proof checks need, so they can run in worker processes."""
+    return {
+        'hash': block.hash,
+        'previous_hash': block.previous_hash,
+        'nonce': block.nonce,
+        'merkle_root': block.merkle_root,
+        'timestamp': block.timestamp.isoformat() if block.timestamp else None,
+        'validator': block.validator,
+        'transactions': [(tx.tx_hash, tx.sender, tx.receiver, tx.amount, tx.fee, tx.nonce)
+                         for tx in block.coin_transactions],
+    }
+
+def check_block_proof(header, difficulty_bits=0):
+    """Checks that depend on one block only, and so can run in any order or process.
+
+    The proof of work is one hash, so it goes before the Merkle root rebuild.
+    The block hash must be the work hash of its header at every difficulty,
+    0 included; the difficulty only adds the target. The leaves are rebuilt
+    from each transaction's fields and must equal its tx_hash, so the root
+    commits to what a transaction does and not only to the id it claims.
+    Never called for genesis, whose hash is fixed.
+    """
+    if not check_work(header, difficulty_bits):
+        return False
+    try:
+        leaves = [transaction_hash(*fields) for _, *fields in header['transactions']]
+    except (TypeError, ValueError):
         return False
-    # Validate PoS/PoW
-    if not self.is_proof_valid(new_block):
+    if leaves != [tx_hash for tx_hash, *_ in header['transactions']]:
         return False
-    return True
+    return MerkleTree(leaves).root_hex() == header['merkle_root']
 
-    def is_chain_valid(self, chain):
-        for i in range(1, len(chain)):
-            if not self.is_block_valid(chain[i], chain[i-1]):
-                return False
+def check_block_proofs(headers, difficulty_bits=0):
+    return all(check_block_proof(header, difficulty_bits) for header in headers)
+
+class Rules:
+    # Suffixes shorter than this are cheaper to check in-process than to ship to workers
+    parallel_min_blocks = 2000
+    max_trusted_tips = 64
+
+    def __init__(self, chain=None, workers=None, difficulty_bits=0):
+        self.chain = chain if chain is not None else []
+        self.workers = workers or os.cpu_count() or 1
+        # Leading zero bits every block hash after genesis must have
+        self.difficulty_bits = difficulty_bits
+        self._miner = None
+        # Highest block of our own chain known to be valid
+        self.validated_height = -1
+        self.validated_hash = None
+        # Tips of other chains validated recently: hash -> height
+        self._trusted_tips = OrderedDict()
+
+    def is_proof_valid(self, block):
+        return check_block_proof(block_header(block), self.difficulty_bits)
+
+    def is_header_work_valid(self, header):
+        """Proof of work of a header alone, for headers whose bodies we do not have."""
+        return check_work(header, self.difficulty_bits)
+
+    def seal(self, block):
+        """Fill in block.nonce and block.hash with a proof at our difficulty."""
+        if self._miner is None:
+            self._miner = Miner(self.workers)
+        return self._miner.seal(block, self.difficulty_bits)
+
+    def is_link_valid(self, new_block, previous_block):
+        return previous_block.hash == new_block.previous_hash
+
+    def is_block_valid(self, new_block, previous_block):
+        # Check hash linkage
+        if not self.is_link_valid(new_block, previous_block):
+            return False
+        # Validate PoS/PoW
+        if not self.is_proof_valid(new_block):
+            return False
         return True
 
+    def find_fork_point(self, chain):
+        """Height of the last block chain shares with ours, or -1 if not even genesis matches.
+
+        Hash linkage means a shared block implies a shared history below it, so
+        a binary search over heights is enough.
+        """
+        low, high = -1, min(len(chain), len(self.chain)) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if chain[middle].hash == self.chain[middle].hash:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def trusted_height(self, chain):
+        """Height up to which chain is already known to be valid."""
+        if self.validated_hash is not None and not (
+                self.validated_height < len(self.chain)
+                and self.chain[self.validated_height].hash == self.validated_hash):
+            # Our own chain changed under the cache
+            self.validated_height, self.validated_hash = -1, None
+        trusted = min(self.find_fork_point(chain), self.validated_height)
+        for tip_hash, height in self._trusted_tips.items():
+            if height > trusted and height < len(chain) and chain[height].hash == tip_hash:
+                trusted = height
+        return trusted
+
+    def remember_valid(self, chain):
+        if not chain:
+            return
+        tip = chain[-1]
+        self._trusted_tips[tip.hash] = len(chain) - 1
+        self._trusted_tips.move_to_end(tip.hash)
+        while len(self._trusted_tips) > self.max_trusted_tips:
+            self._trusted_tips.popitem(last=False)
+        if chain is self.chain:
+            self.validated_height, self.validated_hash = len(chain) - 1, tip.hash
+
+    def validate_suffix(self, chain, start):
+        """Validate blocks from start onwards: linkage in order, proofs in parallel when worthwhile."""
+        for i in range(max(start, 1), len(chain)):
+            if not self.is_link_valid(chain[i], chain[i-1]):
+                return False
+        suffix = chain[max(start, 1):]
+        if len(suffix) < self.parallel_min_blocks or self.workers < 2:
+            return all(self.is_proof_valid(block) for block in suffix)
+        headers = [block_header(block) for block in suffix]
+        chunk_size = -(-len(headers) // (self.workers * 4))
+        chunks = [headers[i:i + chunk_size] for i in range(0, len(headers), chunk_size)]
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            return all(executor.map(check_block_proofs, chunks, repeat(self.difficulty_bits)))
+
+    def is_chain_valid(self, chain):
+        start = self.trusted_height(chain) + 1
+        if not self.validate_suffix(chain, start):
+            return False
+        self.remember_valid(chain)
+        return True
 
     def resolve_conflict(self, peers):
         max_length = len(self.chain)
@@ -22,5 +152,7 @@ class Rules:
             peer_chain = peer.get_chain()  # Fetch via HTTP/P2P
             if len(peer_chain) > max_length and self.is_chain_valid(peer_chain):
                 new_chain = peer_chain
+                max_length = len(peer_chain)
         if new_chain:
-            self.chain = new_chain  # Replace local chain
\ No newline at end of file
+            self.chain = new_chain  # Replace local chain
+            self.remember_valid(self.chain)
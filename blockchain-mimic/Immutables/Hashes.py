@@ -1,14 +1,133 @@
 import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+def as_bytes(data):
+    """str is UTF-8 encoded; bytes, bytearray and memoryview are hashed as they are."""
+    if isinstance(data, str):
+        return data.encode('utf-8')
+    return data
+
+# json.dumps builds a new encoder per call when given separators
+_encode_fields = json.JSONEncoder(separators=(',', ':')).encode
+
+def transaction_hash(sender, receiver, amount, fee=0.0, nonce=0):
+    """Canonical id of a coin transaction: 0x and the sha256 of its fields as a compact JSON array.
+
+    Amount and fee hash as floats and the nonce as an int, so 1, 1.0 and "1"
+    give the same id. The signature is left out, as it signs this hash.
+    """
+    fields = [sender, receiver, float(amount), float(fee or 0), int(nonce or 0)]
+    return '0x' + hashlib.sha256(_encode_fields(fields).encode()).hexdigest()
+
+class PreparedHash:
+    """A hash object already fed with a common prefix, copied for every digest."""
+
+    def __init__(self, base):
+        self._base = base
+        # Bound once: a fresh hash object holding the prefix, ready for a suffix
+        self.copy = base.copy
+
+    def digest(self, suffix=b''):
+        hash_function = self._base.copy()
+        hash_function.update(as_bytes(suffix))
+        return hash_function.digest()
+
+    def hexdigest(self, suffix=b''):
+        hash_function = self._base.copy()
+        hash_function.update(as_bytes(suffix))
+        return hash_function.hexdigest()
 
 class HashManager:
-    def __init__(self, algorithm='sha512'):
+    # hashlib only releases the GIL for buffers above ~2 KiB, so small items are
+    # hashed inline; big batches are split into chunks across a thread pool
+    parallel_min_items = 4096
+    parallel_min_bytes = 1 << 20
+
+    def __init__(self, algorithm='sha512', workers=None):
         self.algorithm = algorithm
+        self.workers = workers or os.cpu_count() or 1
+        self._prototype = hashlib.new(algorithm)
+        self._executor = None
+
+    def new(self):
+        """Fresh hash object, copied from a prepared one instead of looked up by name."""
+        return self._prototype.copy()
+
+    def prepare(self, prefix):
+        """PreparedHash for many digests that share the same leading bytes."""
+        base = self.new()
+        base.update(as_bytes(prefix))
+        return PreparedHash(base)
+
+    def digest(self, data):
+        hash_function = self._prototype.copy()
+        hash_function.update(as_bytes(data))
+        return hash_function.digest()
 
     def generate_hash(self, data):
-        hash_function = hashlib.new(self.algorithm)
-        hash_function.update(data.encode('utf-8'))
+        hash_function = self._prototype.copy()
+        hash_function.update(as_bytes(data))
         return hash_function.hexdigest()
 
+    def target(self, difficulty_bits):
+        """Largest raw digest with difficulty_bits leading zero bits, as bytes.
+
+        Digests compare as big-endian numbers when both are bytes of the same
+        length, so a proof check is `digest <= target` with no int conversion.
+        """
+        size = self._prototype.digest_size
+        if not 0 <= difficulty_bits <= 8 * size:
+            raise ValueError(f"Difficulty must be between 0 and {8 * size} bits")
+        return ((1 << (8 * size - difficulty_bits)) - 1).to_bytes(size, 'big')
+
+    def meets_target(self, digest, target):
+        return len(digest) == len(target) and bytes(digest) <= target
+
     def verify_hash(self, data, hash_value):
+        if isinstance(hash_value, (bytes, bytearray, memoryview)):
+            return self.digest(data) == hash_value
         return self.generate_hash(data) == hash_value
 
+    def _hash_chunk(self, items, raw):
+        prototype = self._prototype
+        results = []
+        append = results.append
+        for data in items:
+            hash_function = prototype.copy()
+            hash_function.update(as_bytes(data))
+            append(hash_function.digest() if raw else hash_function.hexdigest())
+        return results
+
+    def _should_parallelize(self, items):
+        if self.workers < 2 or len(items) < self.parallel_min_items:
+            return False
+        sample = items[:64]
+        average = sum(len(as_bytes(data)) for data in sample) / len(sample)
+        return average * len(items) >= self.parallel_min_bytes and average >= 2048
+
+    def hash_many(self, items, raw=False):
+        """Hashes of items in order, as hex strings or raw digests when raw=True."""
+        items = items if isinstance(items, list) else list(items)
+        if not self._should_parallelize(items):
+            return self._hash_chunk(items, raw)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='hash')
+        chunk_size = -(-len(items) // (self.workers * 4))
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        results = []
+        for chunk_result in self._executor.map(self._hash_chunk, chunks, [raw] * len(chunks)):
+            results.extend(chunk_result)
+        return results
+
+    def verify_many(self, items, hash_values):
+        """One bool per (item, expected hash) pair; hashes may be hex strings or raw digests."""
+        hash_values = list(hash_values)
+        raw = bool(hash_values) and isinstance(hash_values[0], (bytes, bytearray, memoryview))
+        return [actual == expected for actual, expected in zip(self.hash_many(items, raw=raw), hash_values)]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,88 @@
+from Hashes import HashManager, as_bytes
+
+# Leaves and inner nodes are hashed with different prefixes so an inner node
+# can never be passed off as a leaf (second-preimage attack)
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+class MerkleTree:
+    """Append-only binary Merkle tree over transaction hashes.
+
+    Every level is kept, so appending a leaf only rehashes the O(log n) nodes on
+    the right edge and an inclusion proof is O(log n) sibling digests. A node
+    without a right sibling is promoted to the next level unchanged.
+    """
+
+    def __init__(self, leaves=(), hash_manager=None):
+        self.hash_manager = hash_manager or HashManager('sha256')
+        self._leaf_hash = self.hash_manager.prepare(LEAF_PREFIX)
+        self._node_hash = self.hash_manager.prepare(NODE_PREFIX)
+        self.levels = [[]]
+        self._index = {}
+        for leaf in leaves:
+            self.append(leaf)
+
+    def __len__(self):
+        return len(self.levels[0])
+
+    def append(self, data):
+        """Add a leaf and return its index."""
+        digest = self._leaf_hash.digest(data)
+        index = len(self.levels[0])
+        self.levels[0].append(digest)
+        self._index.setdefault(as_bytes(data), index)
+
+        level, position = 0, index
+        while len(self.levels[level]) > 1:
+            nodes = self.levels[level]
+            left = position & ~1
+            if left + 1 < len(nodes):
+                parent = self._node_hash.digest(nodes[left] + nodes[left + 1])
+            else:
+                parent = nodes[left]
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+            parents = self.levels[level + 1]
+            if position // 2 < len(parents):
+                parents[position // 2] = parent
+            else:
+                parents.append(parent)
+            level, position = level + 1, position // 2
+        return index
+
+    def root(self):
+        """Raw root digest; None for an empty tree."""
+        return self.levels[-1][0] if self.levels[0] else None
+
+    def root_hex(self):
+        root = self.root()
+        return root.hex() if root is not None else None
+
+    def index_of(self, data):
+        return self._index.get(as_bytes(data))
+
+    def proof(self, index):
+        """Sibling path for the leaf at index as [(sibling digest, sibling is on the left), ...]."""
+        if not 0 <= index < len(self):
+            raise IndexError(f"No leaf at index {index}")
+        path = []
+        for nodes in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(nodes):
+                path.append((nodes[sibling], sibling < index))
+            index //= 2
+        return path
+
+    def verify(self, data, proof, root):
+        return verify_proof(data, proof, root, self.hash_manager)
+
+def verify_proof(data, proof, root, hash_manager=None):
+    """Check an inclusion proof against a raw or hex root without the rest of the tree."""
+    hash_manager = hash_manager or HashManager('sha256')
+    digest = hash_manager.prepare(LEAF_PREFIX).digest(data)
+    node_hash = hash_manager.prepare(NODE_PREFIX)
+    for sibling, sibling_on_left in proof:
+        digest = node_hash.digest(sibling + digest if sibling_on_left else digest + sibling)
+    if isinstance(root, str):
+        return digest.hex() == root
+    return digest == root
@@ -1,3 +1,3 @@
-from Hashes import HashManager
+from Hashes import HashManager, PreparedHash, transaction_hash
 
-__all__ = ['HashManager']
\ No newline at end of file
+__all__ = ['HashManager', 'PreparedHash', 'transaction_hash']
@@ -0,0 +1,235 @@
+import json
+import struct
+from datetime import datetime, timedelta
+
+MIMETYPE = 'application/x-mimic-binary'
+VERSION = 1
+FORMAT = f'binary/{VERSION}'
+
+# magic, version, record kind, record count
+ENVELOPE = struct.Struct('<2sBBI')
+MAGIC = b'MW'
+
+HEADER, BLOCK, COIN_TRANSACTION, NFT_TRANSFER, CONTRACT_EVENT = range(1, 6)
+
+# (field, type) in wire order; any field may be None
+FIELDS = {
+    HEADER: (
+        ('hash', 'hex'), ('previous_hash', 'hex'), ('merkle_root', 'hex'), ('nonce', 'int'),
+        ('timestamp', 'time'), ('validator', 'hex'), ('signature', 'hex'),
+    ),
+    COIN_TRANSACTION: (
+        ('tx_hash', 'hex'), ('sender', 'hex'), ('receiver', 'hex'), ('amount', 'float'),
+        ('fee', 'float'), ('nonce', 'int'), ('signature', 'hex'),
+    ),
+    NFT_TRANSFER: (
+        ('from_address', 'hex'), ('to_address', 'hex'), ('timestamp', 'time'), ('nft_id', 'int'), ('block_id', 'int'),
+    ),
+    CONTRACT_EVENT: (
+        ('trigger_tx_hash', 'hex'), ('action_type', 'str'), ('action_data', 'json'),
+        ('contract_id', 'int'), ('block_id', 'int'),
+    ),
+}
+
+# Hex strings travel as raw bytes, tagged so they decode to exactly the same text
+HEX, PREFIXED_HEX, TEXT = range(3)
+# A hex column is either one (tag, width) for every value, or a (tag, length) per value
+UNIFORM, MIXED = range(2)
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+u8, u32 = struct.Struct('<B'), struct.Struct('<I')
+TAGGED = struct.Struct('<BB')
+NUMBER_FORMATS = {'int': 'q', 'float': 'd', 'time': 'q'}
+
+class CodecError(ValueError):
+    pass
+
+# Records are laid out column by column: each field of every record together,
+# so fixed-width columns pack and unpack in one struct call and a column of
+# same-length hashes is one contiguous run of raw bytes.
+
+def _tag_hex(value):
+    if value.startswith('0x'):
+        body, tag = value[2:], PREFIXED_HEX
+    else:
+        body, tag = value, HEX
+    try:
+        raw = bytes.fromhex(body)
+        if raw.hex() == body:  # Upper case or odd spacing would not round-trip
+            return tag, raw
+    except ValueError:
+        pass
+    return TEXT, value.encode()
+
+def _encode_hex(out, values):
+    tagged = [_tag_hex(value) for value in values]
+    first_tag, first_raw = tagged[0]
+    width = len(first_raw)
+    if width < 256 and all(tag == first_tag and len(raw) == width for tag, raw in tagged):
+        out += u8.pack(UNIFORM)
+        out += TAGGED.pack(first_tag, width)
+        out += b''.join(raw for _, raw in tagged)
+        return
+    out += u8.pack(MIXED)
+    for tag, raw in tagged:
+        if len(raw) > 255:
+            raise CodecError(f"{raw[:20]!r}... is too long for a hash field")
+        out += TAGGED.pack(tag, len(raw))
+        out += raw
+
+def _decode_hex(view, offset, count):
+    layout = view[offset]
+    offset += 1
+    if layout == UNIFORM:
+        tag, width = TAGGED.unpack_from(view, offset)
+        offset += 2
+        end = offset + width * count
+        if end > len(view):
+            raise CodecError("Truncated hash column")
+        if tag == TEXT:
+            return [str(view[i:i + width], 'utf-8') for i in range(offset, end, width)], end
+        text = view[offset:end].hex()
+        step = 2 * width
+        if tag == PREFIXED_HEX:
+            return ['0x' + text[i:i + step] for i in range(0, len(text), step)], end
+        return [text[i:i + step] for i in range(0, len(text), step)], end
+    values = []
+    for _ in range(count):
+        tag, length = TAGGED.unpack_from(view, offset)
+        offset += 2
+        raw = view[offset:offset + length]
+        offset += length
+        if tag == TEXT:
+            values.append(str(raw, 'utf-8'))
+        else:
+            values.append(('0x' if tag == PREFIXED_HEX else '') + raw.hex())
+    return values, offset
+
+def _micros(value):
+    if isinstance(value, str):
+        moment = datetime.fromisoformat(value)
+        if moment.isoformat() != value:
+            raise CodecError(f"Timestamp {value} does not round-trip")
+    else:
+        moment = value
+    if moment.tzinfo is not None:
+        raise CodecError(f"Timestamp {value} is not naive UTC")
+    return (moment - EPOCH) // MICROSECOND
+
+def _encode_column(out, type_, values):
+    if type_ == 'hex':
+        _encode_hex(out, values)
+    elif type_ in NUMBER_FORMATS:
+        if type_ == 'time':
+            values = [_micros(value) for value in values]
+        out += struct.pack(f'<{len(values)}{NUMBER_FORMATS[type_]}', *values)
+    else:
+        # Short strings and JSON documents: one JSON array per column
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        out += u32.pack(len(raw))
+        out += raw
+
+def _decode_column(view, offset, type_, count):
+    if type_ == 'hex':
+        return _decode_hex(view, offset, count)
+    if type_ in NUMBER_FORMATS:
+        numbers = struct.Struct(f'<{count}{NUMBER_FORMATS[type_]}')
+        values = numbers.unpack_from(view, offset)
+        if type_ == 'time':
+            values = [(EPOCH + timedelta(microseconds=micros)).isoformat() for micros in values]
+        return values, offset + numbers.size
+    length = u32.unpack_from(view, offset)[0]
+    offset += 4
+    values = json.loads(str(view[offset:offset + length], 'utf-8'))
+    if not isinstance(values, list) or len(values) != count:
+        raise CodecError("Malformed text column")
+    return values, offset + length
+
+def _encode_records(out, fields, records):
+    for name, type_ in fields:
+        values = [record.get(name) for record in records]
+        present = [value for value in values if value is not None]
+        if len(present) == len(values):
+            out += u8.pack(0)
+        else:
+            # One byte per record marks the missing values, which are then left out
+            out += u8.pack(1)
+            out += bytes(value is None for value in values)
+        if present:
+            _encode_column(out, type_, present)
+
+def _decode_records(view, offset, fields, count):
+    columns = []
+    for _, type_ in fields:
+        has_nulls = view[offset]
+        offset += 1
+        if has_nulls:
+            nulls = view[offset:offset + count]
+            offset += count
+            present = count - sum(nulls)
+        else:
+            nulls, present = None, count
+        values = ()
+        if present:
+            values, offset = _decode_column(view, offset, type_, present)
+        if nulls is not None:
+            values = iter(values)
+            values = [None if null else next(values) for null in nulls]
+        columns.append(values)
+    names = [name for name, _ in fields]
+    return [dict(zip(names, row)) for row in zip(*columns)], offset
+
+def encode(kind, records):
+    """Binary payload for a list of records in their to_dict()/header() form."""
+    if kind != BLOCK and kind not in FIELDS:
+        raise CodecError(f"Unknown record kind {kind}")
+    out = bytearray(ENVELOPE.pack(MAGIC, VERSION, kind, len(records)))
+    try:
+        if kind == BLOCK:
+            # Headers, then each block's transaction count, then every transaction in chain order
+            _encode_records(out, FIELDS[HEADER], records)
+            transactions = [record.get('coin_transactions') or () for record in records]
+            out += struct.pack(f'<{len(records)}I', *(len(block) for block in transactions))
+            _encode_records(out, FIELDS[COIN_TRANSACTION], [tx for block in transactions for tx in block])
+        else:
+            _encode_records(out, FIELDS[kind], records)
+    except (AttributeError, TypeError, ValueError, struct.error) as e:
+        raise e if isinstance(e, CodecError) else CodecError(f"Cannot encode record: {e}")
+    return bytes(out)
+
+def decode(buffer):
+    """(kind, records) from a payload. Columns are read in place from a memoryview over buffer."""
+    view = memoryview(buffer)
+    try:
+        magic, version, kind, count = ENVELOPE.unpack_from(view, 0)
+        if magic != MAGIC or version != VERSION:
+            raise CodecError(f"Unsupported payload version {version}")
+        offset = ENVELOPE.size
+        if kind == BLOCK:
+            records, offset = _decode_records(view, offset, FIELDS[HEADER], count)
+            sizes = struct.Struct(f'<{count}I')
+            tx_counts = sizes.unpack_from(view, offset)
+            offset += sizes.size
+            transactions, offset = _decode_records(view, offset, FIELDS[COIN_TRANSACTION], sum(tx_counts))
+            start = 0
+            for record, tx_count in zip(records, tx_counts):
+                record['coin_transactions'] = transactions[start:start + tx_count]
+                start += tx_count
+        elif kind in FIELDS:
+            records, offset = _decode_records(view, offset, FIELDS[kind], count)
+        else:
+            raise CodecError(f"Unknown record kind {kind}")
+    except (IndexError, StopIteration, struct.error, ValueError) as e:
+        # UnicodeDecodeError and JSONDecodeError are ValueErrors too
+        raise e if isinstance(e, CodecError) else CodecError(f"Truncated or corrupt payload: {e}")
+    if offset != len(view):
+        raise CodecError("Trailing bytes after the last record")
+    return kind, records
+
+def decode_response(content_type, body):
+    """Records from a peer response in either format."""
+    if content_type and content_type.split(';')[0].strip() == MIMETYPE:
+        return decode(body)[1]
+    return json.loads(body)
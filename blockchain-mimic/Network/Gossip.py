@@ -0,0 +1,144 @@
+import json
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('p2p-flask')
+
+class GossipError(ValueError):
+    pass
+
+class SeenCache:
+    """Bounded set of recently seen message ids; entries expire after ttl seconds."""
+
+    def __init__(self, maxlen=10000, ttl=600, clock=time.time):
+        self.maxlen = maxlen
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._seen = OrderedDict()
+
+    def __len__(self):
+        return len(self._seen)
+
+    def add(self, message_id):
+        """Record message_id; False if it was already seen."""
+        now = self.clock()
+        with self._lock:
+            # Insertion order is arrival order, so expired ids are always at the front
+            while self._seen and (len(self._seen) >= self.maxlen or now - next(iter(self._seen.values())) > self.ttl):
+                self._seen.popitem(last=False)
+            if message_id in self._seen:
+                return False
+            self._seen[message_id] = now
+            return True
+
+class Gossip:
+    """Fanout-limited epidemic broadcast.
+
+    A message carries an id, a hop budget (ttl) and its origin time. Each node
+    delivers a message once, drops repeats using a SeenCache, and relays it to
+    `fanout` random peers other than the one it came from while ttl lasts.
+    Traffic per message is about N * fanout instead of N^2, and nodes that the
+    origin does not know directly still hear about it.
+
+    Relays are sent by relay_workers background threads, so a message held up
+    by a slow peer occupies one of them and the others keep the rest moving.
+    """
+
+    def __init__(self, node_id, get_peers, send, fanout=4, ttl=6, deliver=None,
+                 seen_size=10000, seen_ttl=600, clock=time.time, rng=None, background=True, relay_workers=8):
+        self.node_id = node_id
+        self.get_peers = get_peers  # () -> {peer_id: url}
+        self.send = send  # (urls, message) -> None
+        self.fanout = fanout
+        self.ttl = ttl
+        self.deliver = deliver
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.seen = SeenCache(seen_size, seen_ttl, clock)
+        self._executor = ThreadPoolExecutor(max_workers=relay_workers, thread_name_prefix='gossip') if background else None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self.counters = {'originated': 0, 'received': 0, 'duplicates': 0, 'relayed': 0,
+                         'messages_sent': 0, 'bytes_sent': 0}
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def originate(self, content, **fields):
+        message = dict(fields, id=uuid.uuid4().hex, origin=self.node_id, relayed_by=self.node_id,
+                       ttl=self.ttl, timestamp=self.clock(), content=content)
+        self.seen.add(message['id'])
+        self._count('originated')
+        self._relay(message, exclude={self.node_id})
+        return message
+
+    def receive(self, message):
+        """Handle a message from a peer. Returns False for duplicates; raises GossipError if malformed."""
+        if not isinstance(message, dict):
+            raise GossipError("A message must be a JSON object")
+        self._count('received')
+        message_id = message.get('id')
+        if message_id is None:
+            # Sent by a node without gossip support; deliver but do not relay
+            if self.deliver:
+                self.deliver(message)
+            return True
+        # Checked before the id is marked seen, so a malformed copy cannot shadow a good one
+        ttl, timestamp = message.get('ttl', 0), message.get('timestamp')
+        if not isinstance(message_id, str) or type(ttl) is not int:
+            raise GossipError("Message id must be a string and ttl an integer")
+        if not self.seen.add(message_id):
+            self._count('duplicates')
+            return False
+        if type(timestamp) in (int, float) and math.isfinite(timestamp):
+            with self._lock:
+                self._latencies.append(self.clock() - timestamp)
+        if self.deliver:
+            self.deliver(message)
+        ttl -= 1
+        if ttl > 0:
+            relayed = dict(message, ttl=ttl, relayed_by=self.node_id)
+            self._count('relayed')
+            self._relay(relayed, exclude={message.get('relayed_by'), message.get('origin'), self.node_id})
+        return True
+
+    def _relay(self, message, exclude):
+        candidates = [url for peer_id, url in self.get_peers().items() if peer_id not in exclude]
+        targets = self.rng.sample(candidates, min(self.fanout, len(candidates)))
+        if not targets:
+            return
+        self._count('messages_sent', len(targets))
+        self._count('bytes_sent', len(json.dumps(message)) * len(targets))
+        if self._executor is None:
+            self.send(targets, message)
+        else:
+            self._executor.submit(self._send_safely, targets, message)
+
+    def _send_safely(self, targets, message):
+        try:
+            self.send(targets, message)
+        except Exception as e:
+            logger.warning(f"Gossip relay of {message['id']} failed: {e}")
+
+    def metrics(self):
+        with self._lock:
+            counters = dict(self.counters)
+            latencies = sorted(self._latencies)
+        unique = counters['received'] - counters['duplicates']
+        messages = unique + counters['originated']
+        metrics = dict(counters)
+        metrics['duplicate_ratio'] = round(counters['duplicates'] / counters['received'], 4) if counters['received'] else 0.0
+        metrics['bytes_per_message'] = round(counters['bytes_sent'] / messages, 1) if messages else 0.0
+        metrics['seen_cache'] = len(self.seen)
+        if latencies:
+            metrics['latency_p50_ms'] = round(1000 * latencies[len(latencies) // 2], 2)
+            metrics['latency_p99_ms'] = round(1000 * latencies[int(0.99 * (len(latencies) - 1))], 2)
+        return metrics
@@ -0,0 +1,125 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import Codec
+
+logger = logging.getLogger('p2p-flask')
+
+class PeerClient:
+    """Shared HTTP client for talking to peers.
+
+    Keeps one keep-alive requests.Session per peer URL, fans a request out to
+    many peers at once on a bounded thread pool, and backs off exponentially
+    from peers that keep failing, so one round costs about one timeout no
+    matter how many peers there are. Only connection errors, timeouts and 5xx
+    answers count as failures: a 4xx is a peer refusing one request.
+    """
+
+    def __init__(self, timeout=2, max_workers=64, pool_size=4, base_backoff=5, max_backoff=300):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._failures = {}  # url -> (consecutive failures, retry not before)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='peer')
+
+    def session_for(self, url):
+        with self._lock:
+            session = self._sessions.get(url)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[url] = session
+            return session
+
+    def is_backing_off(self, url):
+        with self._lock:
+            failure = self._failures.get(url)
+        return failure is not None and time.monotonic() < failure[1]
+
+    def record_success(self, url):
+        with self._lock:
+            self._failures.pop(url, None)
+
+    def record_failure(self, url):
+        with self._lock:
+            count = self._failures.get(url, (0, 0))[0] + 1
+            delay = min(self.base_backoff * 2 ** (count - 1), self.max_backoff)
+            self._failures[url] = (count, time.monotonic() + delay)
+
+    def forget(self, url):
+        """Drop the pooled connection and failure record of a peer that left."""
+        with self._lock:
+            session = self._sessions.pop(url, None)
+            self._failures.pop(url, None)
+        if session is not None:
+            session.close()
+
+    def request(self, method, url, path, timeout=None, **kwargs):
+        try:
+            response = self.session_for(url).request(method, f"{url}{path}", timeout=timeout or self.timeout, **kwargs)
+        except requests.RequestException:
+            self.record_failure(url)
+            raise
+        if response.status_code >= 500:
+            self.record_failure(url)
+        else:
+            self.record_success(url)
+        response.raise_for_status()
+        return response
+
+    def post(self, url, path, json=None, timeout=None):
+        return self.request('POST', url, path, timeout=timeout, json=json)
+
+    def get(self, url, path, params=None, timeout=None, accept=None):
+        """Decoded body of a GET; also serves as the ChainSync transport.
+
+        accept asks the peer for another payload format, such as the binary
+        codec; whatever the response's Content-Type says is what gets decoded.
+        """
+        headers = {'Accept': accept} if accept else None
+        response = self.request('GET', url, path, timeout=timeout, params=params, headers=headers)
+        if accept is None:
+            return response.json()
+        return Codec.decode_response(response.headers.get('Content-Type'), response.content)
+
+    def fan_out(self, method, urls, path, json=None, timeout=None, skip_backoff=True):
+        """Send the same request to every url concurrently.
+
+        Returns {url: response or exception}. Peers still backing off are left out
+        unless skip_backoff is False. Returns after at most about one timeout.
+        """
+        timeout = timeout or self.timeout
+        urls = [url for url in dict.fromkeys(urls) if not (skip_backoff and self.is_backing_off(url))]
+        futures = {
+            self._executor.submit(self.request, method, url, path, timeout, json=json): url
+            for url in urls
+        }
+        done, not_done = wait(futures, timeout=timeout + 1)
+        results = {}
+        for future in done:
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                results[futures[future]] = e
+        for future in not_done:
+            # Still queued behind other peers; it keeps running but the round does not wait
+            results[futures[future]] = TimeoutError(f"No response within {timeout}s")
+        return results
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
@@ -0,0 +1,205 @@
+import heapq
+import json
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger('p2p-flask')
+
+class PeerRegistry:
+    """Known peers by uuid, safe to share between Flask handlers and background threads.
+
+    Every change happens under one lock. A min-heap of (last_seen, uuid)
+    finds the stalest peers, so expiry costs O(log n) per evicted peer
+    instead of a scan of every peer. A heartbeat pushes a new heap entry
+    rather than moving the old one; entries that no longer match a peer's
+    last_seen are skipped when popped, and the heap is rebuilt once they
+    dominate.
+
+    snapshot() and urls() are rebuilt only when the set of peers changes, or
+    when heartbeats have moved last_seen and the cached copy is older than
+    snapshot_max_age, so serving them to every request costs nothing.
+    """
+
+    def __init__(self, ttl=300, snapshot_max_age=1.0, clock=time.time):
+        self.ttl = ttl
+        self.snapshot_max_age = snapshot_max_age
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._peers = {}  # uuid -> {'url', 'name', 'last_seen'}
+        self._heap = []  # (last_seen, uuid), stale entries deleted lazily
+        self._members = 0  # Bumped when a peer joins, leaves or moves
+        self._touched = False  # last_seen changed since the snapshot was built
+        self._snapshot = None  # (members, built at, peers dict, JSON bytes)
+        self._urls = None  # (members, {uuid: url})
+
+    def __len__(self):
+        return len(self._peers)
+
+    def __contains__(self, uuid):
+        return uuid in self._peers
+
+    def get(self, uuid):
+        with self._lock:
+            info = self._peers.get(uuid)
+            return dict(info) if info is not None else None
+
+    def _push(self, uuid, last_seen):
+        heapq.heappush(self._heap, (last_seen, uuid))
+        if len(self._heap) > 2 * len(self._peers) + 1024:
+            self._heap = [(info['last_seen'], peer) for peer, info in self._peers.items()]
+            heapq.heapify(self._heap)
+
+    def upsert(self, uuid, url, name=None, last_seen=None):
+        """Add a peer or refresh one; returns True if it was not known before."""
+        last_seen = self.clock() if last_seen is None else last_seen
+        with self._lock:
+            info = self._peers.get(uuid)
+            new = info is None
+            if new:
+                info = self._peers[uuid] = {'url': url, 'name': name or 'Unknown', 'last_seen': last_seen}
+                self._members += 1
+            else:
+                if info['url'] != url or (name and info['name'] != name):
+                    info['url'], info['name'] = url, name or info['name']
+                    self._members += 1
+                if last_seen <= info['last_seen']:
+                    return False
+                info['last_seen'] = last_seen
+                self._touched = True
+            self._push(uuid, last_seen)
+            return new
+
+    def touch(self, uuid, last_seen=None):
+        """Mark a known peer as seen now; returns False if it is unknown."""
+        last_seen = self.clock() if last_seen is None else last_seen
+        with self._lock:
+            info = self._peers.get(uuid)
+            if info is None:
+                return False
+            if last_seen > info['last_seen']:
+                info['last_seen'] = last_seen
+                self._touched = True
+                self._push(uuid, last_seen)
+            return True
+
+    def remove(self, uuid):
+        """Forget a peer; returns its info, or None if it was unknown. Its heap entries go stale."""
+        with self._lock:
+            info = self._peers.pop(uuid, None)
+            if info is not None:
+                self._members += 1
+            return info
+
+    def expire(self, now=None):
+        """Remove peers not seen for ttl seconds; returns [(uuid, info)] of the removed ones."""
+        deadline = (self.clock() if now is None else now) - self.ttl
+        expired = []
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] < deadline:
+                last_seen, uuid = heapq.heappop(heap)
+                info = self._peers.get(uuid)
+                # Only the entry matching the peer's current last_seen counts
+                if info is not None and info['last_seen'] == last_seen:
+                    del self._peers[uuid]
+                    expired.append((uuid, info))
+            if expired:
+                self._members += 1
+        return expired
+
+    def urls(self):
+        """{uuid: url} of every peer. Shared between callers, so treat it as read-only."""
+        with self._lock:
+            if self._urls is None or self._urls[0] != self._members:
+                self._urls = (self._members, {uuid: info['url'] for uuid, info in self._peers.items()})
+            return self._urls[1]
+
+    def _fresh_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None or snapshot[0] != self._members:
+            return None
+        if self._touched and self.clock() - snapshot[1] > self.snapshot_max_age:
+            return None
+        return snapshot
+
+    def _build_snapshot(self):
+        with self._lock:
+            snapshot = self._fresh_snapshot()
+            if snapshot is None:
+                peers = {uuid: dict(info) for uuid, info in self._peers.items()}
+                self._touched = False
+                snapshot = self._snapshot = (self._members, self.clock(), peers, None)
+        return snapshot
+
+    def snapshot(self):
+        """{uuid: info} copy of every peer, at most snapshot_max_age behind on last_seen. Read-only."""
+        return self._build_snapshot()[2]
+
+    def snapshot_json(self):
+        """snapshot() encoded as JSON bytes; encoded once per snapshot, outside the lock."""
+        members, built, peers, encoded = self._build_snapshot()
+        if encoded is None:
+            encoded = json.dumps(peers, separators=(',', ':')).encode()
+            with self._lock:
+                if self._snapshot is not None and self._snapshot[2] is peers:
+                    self._snapshot = (members, built, peers, encoded)
+        return encoded
+
+class ContactQueue:
+    """Hands work about peers to one background thread, in batches.
+
+    put() only enqueues, so it is safe to call from a zeroconf callback or a
+    request handler. The worker takes everything queued, up to batch_size,
+    and passes it to contact() in one call, so a burst of thousands of
+    discoveries becomes a few concurrent fan-outs instead of thousands of
+    sequential requests. A key already waiting is not queued again.
+    """
+
+    def __init__(self, contact, batch_size=256, max_pending=10000):
+        self.contact = contact  # [(key, item)] -> None
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.stats = {'queued': 0, 'dropped': 0, 'batches': 0, 'contacted': 0}
+
+    def put(self, key, item):
+        """Queue item under key; False if key is already queued or the queue is full."""
+        with self._lock:
+            if key in self._pending or len(self._pending) >= self.max_pending:
+                self.stats['dropped'] += 1
+                return False
+            self._pending.add(key)
+            self.stats['queued'] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='peer-contact', daemon=True)
+                self._thread.start()
+        self._queue.put((key, item))
+        return True
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            with self._lock:
+                self._pending.difference_update(key for key, _ in batch)
+            try:
+                self.contact(batch)
+            except Exception as e:
+                logger.warning(f"Contacting {len(batch)} peers failed: {e}")
+            self.stats['batches'] += 1
+            self.stats['contacted'] += len(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def join(self):
+        """Block until everything queued so far has been contacted."""
+        self._queue.join()
@@ -0,0 +1,275 @@
+import itertools
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, Response, jsonify, request
+
+import Codec
+
+logger = logging.getLogger('p2p-flask')
+
+MAX_HEADERS = 2000
+MAX_BODIES = 256
+
+class SyncError(Exception):
+    pass
+
+def chain_blueprint(rules):
+    """Routes peers use to sync from the chain held by rules.
+
+    /chain/tip advertises height, hash and payload formats, /chain/headers serves
+    compact headers and /chain/blocks full bodies, both for a [start, start + count)
+    height range. Those two answer in the binary codec when the request's Accept
+    header prefers it, and in JSON otherwise.
+    """
+    blueprint = Blueprint('chain', __name__, url_prefix='/chain')
+
+    def height_range(limit):
+        start = max(0, request.args.get('start', default=0, type=int))
+        count = min(max(0, request.args.get('count', default=limit, type=int)), limit)
+        return start, count
+
+    def respond(kind, records):
+        # JSON is listed first so a bare Accept: */* keeps getting JSON
+        if request.accept_mimetypes.best_match(['application/json', Codec.MIMETYPE]) == Codec.MIMETYPE:
+            try:
+                return Response(Codec.encode(kind, records), mimetype=Codec.MIMETYPE)
+            except Codec.CodecError as e:
+                logger.warning(f"Falling back to JSON: {e}")
+        return jsonify(records)
+
+    @blueprint.route('/tip')
+    def tip():
+        chain = rules.chain
+        return jsonify({
+            'height': len(chain) - 1,
+            'hash': chain[-1].hash if chain else None,
+            'formats': [Codec.FORMAT, 'json'],
+        })
+
+    @blueprint.route('/headers')
+    def headers():
+        start, count = height_range(MAX_HEADERS)
+        return respond(Codec.HEADER, [block.header() for block in rules.chain[start:start + count]])
+
+    @blueprint.route('/blocks')
+    def blocks():
+        start, count = height_range(MAX_BODIES)
+        return respond(Codec.BLOCK, [block.to_dict() for block in rules.chain[start:start + count]])
+
+    return blueprint
+
+class ChainSync:
+    """Headers-first sync of rules.chain from a set of peers.
+
+    Every peer advertises its tip first, so only the best one is followed. The
+    fork point is found by binary search over single headers, then headers after
+    it are fetched in batches and bodies are downloaded in bounded windows, in
+    parallel, from every peer tall enough to have them. Each window is
+    validated as it arrives, with at most max_in_flight windows fetched ahead,
+    so a bad block stops the download early and unvalidated bodies in memory
+    never exceed window * max_in_flight. Work and memory scale with the
+    divergent suffix, not with the length of the chain.
+
+    Peers whose tip advertises the binary codec are asked for it on headers and
+    bodies; the transport's get() then takes an accept argument. The others,
+    and every peer when binary is False, are spoken to in JSON.
+
+    check, if given, is called as check(chain, fork, suffix) once a suffix is
+    fully fetched and valid, before it replaces our blocks after fork; it
+    raises SyncError to refuse the suffix on grounds Rules cannot see, such
+    as balances.
+    """
+
+    def __init__(self, rules, transport, block_factory=None, header_batch=MAX_HEADERS,
+                 window=64, max_in_flight=4, binary=True, check=None):
+        if block_factory is None:
+            from Block import Block
+            block_factory = Block.from_dict
+        self.rules = rules
+        self.transport = transport
+        self.block_factory = block_factory
+        self.header_batch = min(header_batch, MAX_HEADERS)
+        self.window = min(window, MAX_BODIES)
+        self.max_in_flight = max_in_flight
+        self.binary = binary
+        self.check = check
+        self.binary_peers = set()
+        self.requests = 0
+        # Height of the last block shared with the chain adopted by the latest sync
+        self.last_fork = None
+
+    def _get(self, peer, path, params=None):
+        self.requests += 1
+        try:
+            if peer in self.binary_peers:
+                return self.transport.get(peer, path, params, accept=Codec.MIMETYPE)
+            return self.transport.get(peer, path, params)
+        except Exception as e:  # Unreachable, an HTTP error or an undecodable body
+            raise SyncError(f"Failed to fetch {path} from {peer}: {e}") from e
+
+    def _headers(self, peer, start, count):
+        """Up to count headers from height start, each checked to be an object with string hashes."""
+        headers = self._get(peer, '/chain/headers', {'start': start, 'count': count})
+        if not isinstance(headers, list) or len(headers) > count or not all(
+                isinstance(header, dict) and isinstance(header.get('hash'), str)
+                and isinstance(header.get('previous_hash'), str) for header in headers):
+            raise SyncError(f"Malformed headers from {peer} at height {start}")
+        return headers
+
+    def fetch_tips(self, peers):
+        """[(peer, height, hash)] for every reachable peer, tallest first."""
+        def tip(peer):
+            try:
+                data = self._get(peer, '/chain/tip')
+                if not (isinstance(data, dict) and type(data.get('height')) is int and data['height'] >= 0
+                        and isinstance(data.get('hash'), str)):
+                    raise SyncError(f"Malformed tip {data!r:.200}")
+                if self.binary and Codec.FORMAT in data.get('formats', ()):
+                    self.binary_peers.add(peer)
+                else:
+                    self.binary_peers.discard(peer)
+                return peer, data['height'], data['hash']
+            except Exception as e:
+                logger.warning(f"Failed to fetch tip from {peer}: {e}")
+                return None
+        with ThreadPoolExecutor(max_workers=max(1, min(len(peers), 16))) as executor:
+            tips = [result for result in executor.map(tip, peers) if result is not None]
+        return sorted(tips, key=lambda result: result[1], reverse=True)
+
+    def header_at(self, peer, height):
+        headers = self._headers(peer, height, 1)
+        if not headers:
+            raise SyncError(f"{peer} has no header at height {height}")
+        return headers[0]
+
+    def check_header_chain(self, peer, height, block_hash):
+        """Raise SyncError unless peer's headers lead from our genesis to block_hash at height.
+
+        Every header must link to the one before it and carry valid work, so a
+        snapshot fetched from peer is known to sit on a real chain from our
+        genesis before its blocks are here. Headers do not commit to balances,
+        so this checks where a snapshot claims to be, not its contents.
+        """
+        previous_hash, start = None, 0
+        while start <= height:
+            count = min(self.header_batch, height + 1 - start)
+            headers = self._headers(peer, start, count)
+            if not headers:
+                raise SyncError(f"{peer} stopped serving headers at height {start}")
+            for at, header in enumerate(headers, start):
+                try:
+                    if at == 0:
+                        valid = header['hash'] == self.rules.chain[0].hash
+                    else:
+                        valid = header['previous_hash'] == previous_hash and self.rules.is_header_work_valid(header)
+                except (AttributeError, KeyError, TypeError) as e:
+                    raise SyncError(f"Malformed header {at} from {peer}: {e!r}") from e
+                if not valid:
+                    raise SyncError(f"Header {at} from {peer} does not extend our genesis with valid work")
+                previous_hash = header['hash']
+            start += len(headers)
+        if previous_hash != block_hash:
+            raise SyncError(f"{peer} has {previous_hash} at height {height}, not {block_hash}")
+
+    def find_fork(self, peer, peer_height):
+        """Height of the last block our chain shares with peer's, -1 if none."""
+        ours = self.rules.chain
+        high = min(len(ours) - 1, peer_height)
+        if high < 0:
+            return -1
+        # Common case: the peer simply extends our chain
+        if self.header_at(peer, high)['hash'] == ours[high].hash:
+            return high
+        low, high = -1, high - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.header_at(peer, middle)['hash'] == ours[middle].hash:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def fetch_bodies(self, headers, start_height, sources, fallback):
+        """Yield the blocks for consecutive headers a window at a time, in order.
+
+        Windows are spread over sources and fetched in parallel, but only
+        max_in_flight of them ahead of the one the caller is consuming.
+        """
+        ranges = [(i, min(i + self.window, len(headers))) for i in range(0, len(headers), self.window)]
+
+        def download(job):
+            index, (first, last) = job
+            for peer in (sources[index % len(sources)], fallback):
+                try:
+                    bodies = self._get(peer, '/chain/blocks',
+                                       {'start': start_height + first, 'count': last - first})
+                except Exception as e:
+                    logger.warning(f"Failed to fetch blocks from {peer}: {e}")
+                    continue
+                try:
+                    # A peer on another branch serves different blocks at these heights
+                    if [body['hash'] for body in bodies] == [header['hash'] for header in headers[first:last]]:
+                        return [self.block_factory(body) for body in bodies]
+                except (AttributeError, KeyError, TypeError, ValueError) as e:
+                    logger.warning(f"Malformed blocks from {peer}: {e!r}")
+            raise SyncError(f"No peer served blocks {start_height + first}-{start_height + last - 1}")
+
+        jobs = enumerate(ranges)
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            in_flight = deque(executor.submit(download, job) for job in itertools.islice(jobs, self.max_in_flight))
+            while in_flight:
+                window_blocks = in_flight.popleft().result()
+                in_flight.extend(executor.submit(download, job) for job in itertools.islice(jobs, 1))
+                yield window_blocks
+
+    def sync(self, peers):
+        """Adopt the tallest valid peer chain if it beats ours. Returns True if our chain changed."""
+        tips = self.fetch_tips(list(peers))
+        if not tips or tips[0][1] + 1 <= len(self.rules.chain):
+            return False
+        best, best_height, best_hash = tips[0]
+
+        fork = self.find_fork(best, best_height)
+        if fork < 0:
+            # Every chain we accept starts at our genesis, which a sync never replaces
+            raise SyncError(f"{best} is on a chain with another genesis")
+        extending = fork == len(self.rules.chain) - 1
+        # Built apart from our chain and swapped in only once fully valid, so
+        # a failure part way through leaves our chain exactly as it was
+        base = self.rules.chain[fork]
+        suffix = []
+        sources = [peer for peer, height, _ in tips if height >= fork + 1] or [best]
+
+        height = fork + 1
+        while height <= best_height:
+            count = min(self.header_batch, best_height + 1 - height)
+            headers = self._headers(best, height, count)
+            if not headers:
+                raise SyncError(f"{best} stopped serving headers at height {height}")
+            previous_hash = (suffix[-1] if suffix else base).hash
+            for header in headers:
+                if header['previous_hash'] != previous_hash:
+                    raise SyncError(f"Header chain from {best} breaks at {header['hash']}")
+                previous_hash = header['hash']
+
+            for window_blocks in self.fetch_bodies(headers, height, sources, best):
+                for block in window_blocks:
+                    if not self.rules.is_block_valid(block, suffix[-1] if suffix else base):
+                        raise SyncError(f"Invalid block {block.hash} from {best}")
+                    suffix.append(block)
+            height += len(headers)
+
+        if suffix[-1].hash != best_hash:
+            raise SyncError(f"{best} tip changed during sync")
+        if self.check is not None:
+            self.check(self.rules.chain, fork, suffix)
+        if extending:
+            self.rules.chain.extend(suffix)
+        else:
+            self.rules.chain = self.rules.chain[:fork + 1] + suffix
+        self.rules.remember_valid(self.rules.chain)
+        self.last_fork = fork
+        logger.info(f"Synced to height {len(self.rules.chain) - 1} from {best} (fork at {fork})")
+        return True
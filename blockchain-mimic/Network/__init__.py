@@ -0,0 +1,8 @@
+import Codec
+from Codec import CodecError
+from Gossip import Gossip, SeenCache
+from PeerClient import PeerClient
+from Peers import ContactQueue, PeerRegistry
+from Sync import ChainSync, SyncError, chain_blueprint
+
+__all__ = ['Codec', 'CodecError', 'Gossip', 'SeenCache', 'PeerClient', 'PeerRegistry', 'ContactQueue', 'ChainSync', 'SyncError', 'chain_blueprint']
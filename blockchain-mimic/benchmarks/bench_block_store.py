@@ -0,0 +1,113 @@
+"""Block ingestion into SQLite: per-row commits vs BlockStore.
+
+Every block carries --txs coin transactions, --nft NFT transfers and --events
+contract events. The baseline goes through Database/Source.Create with the
+SQLite defaults and commits after each statement, like the old code; it is
+run on --baseline-blocks only and extrapolated. BlockStore writes --blocks
+blocks (100k by default) under WAL with one transaction per block, and again
+with several blocks per transaction, as a catching-up sync would.
+
+    python benchmarks/bench_block_store.py [--blocks 100000] [--txs 10] [--baseline-blocks 300]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ('Immutables', 'Entity', 'Database'):
+    sys.path.insert(0, os.path.join(root, folder))
+
+from sqlalchemy import create_engine
+
+from Block import Base
+from BlockStore import BlockStore, tune_engine
+from Source import Create
+
+def make_block(height, txs, nft, events):
+    return SimpleNamespace(
+        hash=f"{height:064x}", previous_hash=f"{height - 1:064x}", timestamp=datetime(2025, 1, 1),
+        nonce=height, validator=None, signature=None, merkle_root='0' * 64,
+        coin_transactions=[SimpleNamespace(
+            tx_hash=f"{height:040x}{i:026x}", sender=f"0x{i:040x}", receiver=f"0x{i + 1:040x}",
+            amount=1.0, fee=0.001, nonce=height, signature='ab' * 66) for i in range(txs)],
+        nft_transfers=[{'from_address': f"0x{i:040x}", 'to_address': f"0x{i + 1:040x}", 'nft_id': i}
+                       for i in range(nft)],
+        contract_events=[{'trigger_tx_hash': f"{height:064x}", 'action_type': 'award',
+                          'action_data': {'points': 10, 'house': 'gryffindor'}, 'contract_id': 1}
+                         for _ in range(events)],
+    )
+
+def engine_for(path, tuned):
+    engine = create_engine(f"sqlite:///{path}")
+    if tuned:
+        tune_engine(engine)
+    Base.metadata.create_all(engine)
+    return engine
+
+def per_row_commits(path, blocks):
+    engine_for(path, tuned=False).dispose()
+    store = Create(path, pragmas={})
+    for block in blocks:
+        store.execute("INSERT INTO blocks (hash, previous_hash, timestamp, nonce, merkle_root) VALUES (?, ?, ?, ?, ?)",
+                      (block.hash, block.previous_hash, block.timestamp.isoformat(), block.nonce, block.merkle_root))
+        block_id = store.cursor.lastrowid
+        for tx in block.coin_transactions:
+            store.execute("INSERT INTO coin_transactions (tx_hash, sender, receiver, amount, fee, nonce, signature, block_id) "
+                          "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                          (tx.tx_hash, tx.sender, tx.receiver, tx.amount, tx.fee, tx.nonce, tx.signature, block_id))
+        for transfer in block.nft_transfers:
+            store.execute("INSERT INTO nft_transfers (from_address, to_address, timestamp, nft_id, block_id) VALUES (?, ?, ?, ?, ?)",
+                          (transfer['from_address'], transfer['to_address'], block.timestamp.isoformat(), transfer['nft_id'], block_id))
+        for event in block.contract_events:
+            store.execute("INSERT INTO contract_events (trigger_tx_hash, action_type, action_data, contract_id, block_id) "
+                          "VALUES (?, ?, ?, ?, ?)",
+                          (event['trigger_tx_hash'], event['action_type'], '{"points": 10}', event['contract_id'], block_id))
+
+def block_store(path, blocks, per_transaction):
+    store = BlockStore(engine_for(path, tuned=True))
+    if per_transaction == 1:
+        for block in blocks:
+            store.append_block(block, block.nft_transfers, block.contract_events)
+    else:
+        store.append_blocks(blocks, per_transaction=per_transaction)
+    return store
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blocks', type=int, default=100000)
+    parser.add_argument('--baseline-blocks', type=int, default=300)
+    parser.add_argument('--txs', type=int, default=10)
+    parser.add_argument('--nft', type=int, default=2)
+    parser.add_argument('--events', type=int, default=2)
+    parser.add_argument('--batch', type=int, default=100, help='Blocks per transaction in the catch-up run')
+    args = parser.parse_args()
+
+    rows_per_block = 1 + args.txs + args.nft + args.events
+    print(f"{rows_per_block} rows per block")
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = [make_block(h, args.txs, args.nft, args.events) for h in range(args.baseline_blocks)]
+        path = os.path.join(directory, 'baseline.db')
+        started = time.perf_counter()
+        per_row_commits(path, baseline)
+        elapsed = time.perf_counter() - started
+        rate = len(baseline) / elapsed
+        print(f"per-row commits, defaults: {rate:10,.0f} blocks/s  "
+              f"({args.blocks / rate:,.0f}s projected for {args.blocks} blocks)")
+
+        blocks = [make_block(h, args.txs, args.nft, args.events) for h in range(args.blocks)]
+        for label, per_transaction in (('BlockStore, 1 block/txn', 1), (f"BlockStore, {args.batch} blocks/txn", args.batch)):
+            path = os.path.join(directory, f"store{per_transaction}.db")
+            started = time.perf_counter()
+            store = block_store(path, blocks, per_transaction)
+            elapsed = time.perf_counter() - started
+            size = sum(os.path.getsize(path + suffix) for suffix in ('', '-wal') if os.path.exists(path + suffix))
+            print(f"{label:>26}: {len(blocks) / elapsed:10,.0f} blocks/s  {len(blocks) * rows_per_block / elapsed:10,.0f} rows/s  "
+                  f"{elapsed:.1f}s, {size / 2 ** 20:.0f} MiB, {store.counts()}")
+            store.engine.dispose()
+
+if __name__ == '__main__':
+    main()
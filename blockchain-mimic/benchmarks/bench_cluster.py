@@ -0,0 +1,390 @@
+"""End-to-end load test: quiz-session coin payments on a cluster of local nodes.
+
+Starts --nodes mimicNodes.py processes on localhost, each given the others as
+static peers (no mDNS), with node 0 producing a block every --mine-interval
+seconds. Every node relays the transactions it accepts, so any node can take
+submissions. --sessions quiz sessions run at once, each bound to one node:
+a session's host (an issuer address) pays every player who answers a
+question right, then the top --badges players pay the badge price to the
+badge contract address and --trades players pay another player the trade
+price. Every transaction is a coin payment, the only kind nodes accept, so
+the run measures payments and not NFT mints or transfers; the three are
+reported as the kinds reward, badge_payment and trade_payment. Offered load
+is --rate transactions/s across all sessions for --duration seconds.
+
+A follower per node reads new blocks as they land, so each transaction gets
+a submit-to-confirmation time on the node it was sent to and on every node.
+Reports throughput, latency percentiles by kind, database growth and
+per-node CPU and RSS (from each node's /metrics) as one JSON document.
+
+    python benchmarks/bench_cluster.py [--nodes 3] [--sessions 8] [--rate 200] [--duration 30] [--output run.json]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, 'Immutables'))
+from Hashes import transaction_hash
+
+BADGES = '0x' + hashlib.sha256(b'badge-contract').hexdigest()[:40]
+BADGE_PRICE = 1.0
+TRADE_PRICE = 2.0
+SPEND_FEE = 0.01
+KINDS = ('reward', 'badge_payment', 'trade_payment')
+
+def address(*parts):
+    return '0x' + hashlib.sha256(':'.join(map(str, parts)).encode()).hexdigest()[:40]
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {'count': 0}
+    def at(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))], 4)
+    return {'count': len(values), 'p50': at(0.5), 'p90': at(0.9), 'p99': at(0.99), 'max': round(values[-1], 4),
+            'mean': round(sum(values) / len(values), 4)}
+
+def scrape(url, names):
+    """Values of the unlabelled metrics in names from a node's /metrics."""
+    values = {}
+    for line in requests.get(f"{url}/metrics", timeout=5).text.splitlines():
+        name, _, value = line.partition(' ')
+        if name in names:
+            values[name] = float(value)
+    return values
+
+class Cluster:
+    """mimicNodes.py processes on consecutive ports, full mesh of static peers."""
+
+    def __init__(self, count, base_port, directory, issuers, mine_interval, sync_interval, difficulty):
+        self.directory = directory
+        self.urls = [f"http://127.0.0.1:{base_port + i}" for i in range(count)]
+        self.processes = []
+        for i in range(count):
+            command = [sys.executable, os.path.join(root, 'mimicNodes.py'), '--port', str(base_port + i),
+                       '--data-dir', directory, '--no-discovery', '--sync-interval', str(sync_interval),
+                       '--difficulty', str(difficulty)]
+            for j, url in enumerate(self.urls):
+                if j != i:
+                    command += ['--peer', url]
+            for issuer in issuers:
+                command += ['--issuer', issuer]
+            if i == 0:
+                command += ['--mine-interval', str(mine_interval)]
+            log = open(os.path.join(directory, f'node{i}.log'), 'w')
+            self.processes.append(subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, cwd=root))
+            log.close()
+
+    def wait_ready(self, timeout=60):
+        """Until every node answers and knows every other node."""
+        deadline = time.monotonic() + timeout
+        for i, url in enumerate(self.urls):
+            while True:
+                if self.processes[i].poll() is not None:
+                    raise RuntimeError(f"Node {i} exited; see {self.directory}/node{i}.log")
+                try:
+                    if requests.get(f"{url}/", timeout=1).json()['peers'] >= len(self.urls) - 1:
+                        break
+                except requests.RequestException:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Node {i} not ready within {timeout}s")
+                time.sleep(0.2)
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+class Tracker:
+    """Submit and confirmation times of every transaction, shared by sessions and followers."""
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.lock = threading.Lock()
+        self.pending = {}  # tx_hash -> [kind, node, submitted, confirmed on that node, nodes seen, seen by all]
+        self.done = []
+        self.submit_latency = []
+        self.rejected = 0
+        self.failed_requests = 0
+
+    def submitted(self, node, transactions, started, finished, response):
+        with self.lock:
+            self.submit_latency.append(finished - started)
+            if response is None:
+                self.failed_requests += 1
+                return set()
+            accepted = set(response['accepted']) | set(response['duplicate'])
+            self.rejected += len(response['rejected'])
+            for kind, tx in transactions:
+                if tx['tx_hash'] in accepted:
+                    self.pending[tx['tx_hash']] = [kind, node, started, None, 0, None]
+            return accepted
+
+    def confirmed(self, node, tx_hashes, now):
+        with self.lock:
+            for tx_hash in tx_hashes:
+                entry = self.pending.get(tx_hash)
+                if entry is None:
+                    continue
+                if entry[1] == node:
+                    entry[3] = now
+                entry[4] += 1
+                if entry[4] == self.nodes:
+                    entry[5] = now
+                    self.done.append(self.pending.pop(tx_hash))
+
+    def outstanding(self):
+        with self.lock:
+            return len(self.pending)
+
+class Session:
+    """One quiz host at a time on one node: rounds of rewards, then badge and trade payments."""
+
+    def __init__(self, slot, node, url, tracker, args, rate):
+        self.slot, self.node, self.url = slot, node, url
+        self.tracker, self.args = tracker, args
+        self.rng = random.Random(args.seed * 1000 + slot)
+        self.interval = 1 / rate if rate > 0 else 0
+        self.host = address('host', slot)
+        self.nonces = {}
+        self.funds = {}  # Accepted rewards minus submitted spends
+        self.http = requests.Session()
+
+    def transaction(self, sender, receiver, amount, fee):
+        nonce = self.nonces.get(sender, 0)
+        self.nonces[sender] = nonce + 1
+        # Nodes check that a signature is present, not what it signs
+        return {'tx_hash': transaction_hash(sender, receiver, amount, fee, nonce), 'sender': sender, 'receiver': receiver, 'amount': amount, 'fee': fee,
+                'nonce': nonce, 'signature': 'ab' * 66}
+
+    def spend(self, sender, receiver, amount):
+        if self.funds.get(sender, 0) < amount + SPEND_FEE:
+            return None
+        self.funds[sender] -= amount + SPEND_FEE
+        return self.transaction(sender, receiver, amount, SPEND_FEE)
+
+    def submit(self, batch, next_at):
+        if not batch:
+            return next_at
+        transactions = [tx for _, tx in batch]
+        started = time.perf_counter()
+        try:
+            response = self.http.post(f"{self.url}/transactions", json=transactions, timeout=10).json()
+        except (requests.RequestException, ValueError):
+            response = None
+        accepted = self.tracker.submitted(self.node, batch, started, time.perf_counter(), response)
+        for kind, tx in batch:
+            if kind == 'reward' and tx['tx_hash'] in accepted:
+                self.funds[tx['receiver']] = self.funds.get(tx['receiver'], 0) + tx['amount']
+        # Paced open-loop: a slow node does not lower the offered rate, it builds a backlog
+        next_at += len(batch) * self.interval
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        return next_at
+
+    def run(self, deadline):
+        args, rng = self.args, self.rng
+        next_at, game = time.perf_counter(), 0
+        while time.perf_counter() < deadline:
+            players = [address('player', self.slot, game, i) for i in range(args.players)]
+            scores = dict.fromkeys(players, 0)
+            for _ in range(args.questions):
+                if time.perf_counter() >= deadline:
+                    return
+                batch = []
+                for player in players:
+                    if rng.random() < args.correct:
+                        points = rng.randint(1, 10)
+                        scores[player] += points
+                        batch.append(('reward', self.transaction(self.host, player, float(points), 0.0)))
+                next_at = self.submit(batch, next_at)
+            batch = []
+            for player in sorted(players, key=scores.get, reverse=True)[:args.badges]:
+                tx = self.spend(player, BADGES, BADGE_PRICE)
+                if tx is not None:
+                    batch.append(('badge_payment', tx))
+            for _ in range(args.trades):
+                seller, buyer = rng.sample(players, 2)
+                tx = self.spend(buyer, seller, TRADE_PRICE)
+                if tx is not None:
+                    batch.append(('trade_payment', tx))
+            next_at = self.submit(batch, next_at)
+            game += 1
+
+def follow(node, url, tracker, stop, poll, samples):
+    """Read each new block of one node as it lands and mark its transactions confirmed there."""
+    http = requests.Session()
+    height, last_sample = 0, 0.0
+    while not stop.is_set():
+        try:
+            tip = http.get(f"{url}/chain/tip", timeout=5).json()['height']
+            while height < tip:
+                blocks = http.get(f"{url}/chain/blocks", params={'start': height + 1, 'count': 256}, timeout=10).json()
+                if not blocks:
+                    break
+                tracker.confirmed(node, [tx['tx_hash'] for block in blocks for tx in block['coin_transactions']],
+                                  time.perf_counter())
+                height += len(blocks)
+            if time.monotonic() - last_sample >= 1.0:
+                samples.append(scrape(url, ('process_resident_memory_bytes',)).get('process_resident_memory_bytes'))
+                last_sample = time.monotonic()
+        except requests.RequestException:
+            pass
+        stop.wait(poll)
+    return height
+
+def node_state(url):
+    storage = requests.get(f"{url}/storage", timeout=10).json()
+    state = scrape(url, ('process_cpu_seconds', 'process_resident_memory_bytes', 'chain_height'))
+    return {'db_bytes': storage['bytes'], 'rows': storage['rows'], 'cpu_seconds': state['process_cpu_seconds'],
+            'rss_bytes': state['process_resident_memory_bytes'], 'height': int(state['chain_height'])}
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=root, capture_output=True, text=True,
+                              timeout=10).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--base-port', type=int, default=6200)
+    parser.add_argument('--sessions', type=int, default=8, help='Quiz sessions running at once')
+    parser.add_argument('--players', type=int, default=12, help='Players per quiz session')
+    parser.add_argument('--questions', type=int, default=10, help='Questions per quiz session')
+    parser.add_argument('--correct', type=float, default=0.6, help='Chance a player answers a question right')
+    parser.add_argument('--badges', type=int, default=3, help='Top players who pay for a badge after a session')
+    parser.add_argument('--trades', type=int, default=2, help='Payments between players for a badge after a session')
+    parser.add_argument('--rate', type=float, default=200, help='Offered transactions per second, all sessions together')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of offered load')
+    parser.add_argument('--drain', type=float, default=30, help='Seconds to wait for the backlog to confirm afterwards')
+    parser.add_argument('--mine-interval', type=float, default=0.5)
+    parser.add_argument('--sync-interval', type=float, default=5)
+    parser.add_argument('--difficulty', type=int, default=0)
+    parser.add_argument('--poll', type=float, default=0.05, help='Seconds between tip polls per node')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    parser.add_argument('--keep-data', action='store_true', help='Keep node databases and logs')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='mimic-cluster-')
+    hosts = [address('host', slot) for slot in range(args.sessions)]
+    cluster = Cluster(args.nodes, args.base_port, directory, hosts, args.mine_interval, args.sync_interval,
+                      args.difficulty)
+    try:
+        cluster.wait_ready()
+        before = [node_state(url) for url in cluster.urls]
+        tracker = Tracker(args.nodes)
+        stop = threading.Event()
+        rss_samples = [[] for _ in cluster.urls]
+        followers = [threading.Thread(target=follow, args=(i, url, tracker, stop, args.poll, rss_samples[i]))
+                     for i, url in enumerate(cluster.urls)]
+        for follower in followers:
+            follower.start()
+
+        sessions = [Session(slot, slot % args.nodes, cluster.urls[slot % args.nodes], tracker, args,
+                            args.rate / args.sessions) for slot in range(args.sessions)]
+        started = time.perf_counter()
+        deadline = started + args.duration
+        threads = [threading.Thread(target=session.run, args=(deadline,)) for session in sessions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        load_ended = time.perf_counter()
+        while tracker.outstanding() and time.perf_counter() < load_ended + args.drain:
+            time.sleep(0.1)
+        stop.set()
+        for follower in followers:
+            follower.join()
+        finished = time.perf_counter()
+        after = [node_state(url) for url in cluster.urls]
+    finally:
+        cluster.stop()
+        if not args.keep_data:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    done = tracker.done
+    submitted = len(done) + len(tracker.pending)
+    # Confirmed on the node they were sent to, whether or not every other node has them yet
+    confirmed_local = done + [entry for entry in tracker.pending.values() if entry[3] is not None]
+    last_confirm = max((entry[3] for entry in confirmed_local), default=started)
+    window = max(last_confirm - started, 1e-9)
+    report = {
+        'benchmark': 'cluster',
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_revision': git_revision(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'keep_data')},
+        'transactions': {
+            'accepted': submitted,
+            'rejected': tracker.rejected,
+            'failed_requests': tracker.failed_requests,
+            'confirmed': len(confirmed_local),
+            'confirmed_all_nodes': len(done),
+            'unconfirmed': submitted - len(confirmed_local),
+        },
+        'throughput': {
+            'offered_per_second': round(submitted / (load_ended - started), 2),
+            'confirmed_per_second': round(len(confirmed_local) / window, 2),
+            'load_seconds': round(load_ended - started, 3),
+            'confirm_window_seconds': round(window, 3),
+        },
+        'submit_request_seconds': percentiles(tracker.submit_latency),
+        'confirm_seconds': percentiles([entry[3] - entry[2] for entry in confirmed_local]),
+        'confirm_all_nodes_seconds': percentiles([entry[5] - entry[2] for entry in done]),
+        'confirm_seconds_by_kind': {
+            kind: percentiles([entry[3] - entry[2] for entry in confirmed_local if entry[0] == kind])
+            for kind in KINDS},
+        'nodes': [],
+    }
+    elapsed = finished - started
+    for i, (start, end) in enumerate(zip(before, after)):
+        samples = [sample for sample in rss_samples[i] if sample is not None]
+        report['nodes'].append({
+            'url': cluster.urls[i],
+            'producer': i == 0,
+            'height': end['height'],
+            'db_bytes_start': start['db_bytes'],
+            'db_bytes_end': end['db_bytes'],
+            'db_growth_bytes': end['db_bytes'] - start['db_bytes'],
+            'db_bytes_per_confirmed_tx': round((end['db_bytes'] - start['db_bytes']) / max(len(confirmed_local), 1), 1),
+            'rows_end': end['rows'],
+            'cpu_seconds': round(end['cpu_seconds'] - start['cpu_seconds'], 3),
+            'cpu_utilization': round((end['cpu_seconds'] - start['cpu_seconds']) / elapsed, 4),
+            'rss_bytes_start': int(start['rss_bytes']),
+            'rss_bytes_end': int(end['rss_bytes']),
+            'rss_bytes_peak': int(max(samples + [end['rss_bytes']])),
+        })
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+    confirm = report['confirm_seconds']
+    print(f"{report['transactions']['confirmed']:,}/{submitted:,} confirmed, "
+          f"{report['throughput']['confirmed_per_second']:,.0f} tx/s; confirm p50 {confirm.get('p50')}s "
+          f"p99 {confirm.get('p99')}s on {args.nodes} nodes", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Binary codec vs JSON: payload size and encode/decode throughput.
+
+Builds --blocks blocks of --txs coin transactions with realistic 0x-prefixed
+addresses and hashes, plus as many NFT transfers and contract events, in the
+to_dict() form peers exchange. Each payload is encoded and decoded --runs
+times with Codec and with json.dumps/json.loads as the nodes use them.
+
+    python benchmarks/bench_codec.py [--blocks 256] [--txs 50] [--runs 20]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, 'Network'))
+
+import Codec
+
+def hex_string(rng, size, prefix='0x'):
+    return prefix + rng.randbytes(size).hex()
+
+def make_payloads(blocks, txs, seed):
+    rng = random.Random(seed)
+    started = datetime(2025, 1, 1)
+    chain = []
+    previous = '0' * 64
+    for height in range(blocks):
+        block_hash = hex_string(rng, 32, '')
+        chain.append({
+            'hash': block_hash, 'previous_hash': previous, 'merkle_root': hex_string(rng, 32, ''),
+            'nonce': rng.randrange(2 ** 32), 'timestamp': (started + timedelta(seconds=15 * height)).isoformat(),
+            'validator': hex_string(rng, 20), 'signature': hex_string(rng, 65),
+            'coin_transactions': [{
+                'tx_hash': hex_string(rng, 32), 'sender': hex_string(rng, 20), 'receiver': hex_string(rng, 20),
+                'amount': round(rng.uniform(0.01, 100), 8), 'fee': 0.001, 'nonce': rng.randrange(10000),
+                'signature': hex_string(rng, 65),
+            } for _ in range(txs)],
+        })
+        previous = block_hash
+    count = blocks * txs
+    transfers = [{
+        'from_address': hex_string(rng, 20), 'to_address': hex_string(rng, 20),
+        'timestamp': (started + timedelta(seconds=i)).isoformat(), 'nft_id': i + 1, 'block_id': i // txs + 1,
+    } for i in range(count)]
+    events = [{
+        'trigger_tx_hash': hex_string(rng, 32), 'action_type': 'award',
+        'action_data': {'player': hex_string(rng, 20), 'points': rng.randrange(100), 'question': i % 20},
+        'contract_id': rng.randrange(100) + 1, 'block_id': i // txs + 1,
+    } for i in range(count)]
+    return {
+        'headers': (Codec.HEADER, [{key: value for key, value in block.items() if key != 'coin_transactions'}
+                                   for block in chain]),
+        'blocks': (Codec.BLOCK, chain),
+        'NFT transfers': (Codec.NFT_TRANSFER, transfers),
+        'contract events': (Codec.CONTRACT_EVENT, events),
+    }
+
+def best_of(runs, function):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blocks', type=int, default=256, help='One /chain/blocks response at MAX_BODIES')
+    parser.add_argument('--txs', type=int, default=50)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'payload':<16} {'records':>8} {'JSON KiB':>9} {'binary KiB':>11} {'ratio':>6}"
+          f" {'JSON enc/dec MB/s':>18} {'binary enc/dec MB/s':>20}")
+    for name, (kind, records) in make_payloads(args.blocks, args.txs, args.seed).items():
+        json_time, text = best_of(args.runs, lambda: json.dumps(records).encode())
+        json_decode, _ = best_of(args.runs, lambda: json.loads(text))
+        binary_time, payload = best_of(args.runs, lambda: Codec.encode(kind, records))
+        binary_decode, (_, decoded) = best_of(args.runs, lambda: Codec.decode(payload))
+        assert decoded == records
+        # Throughput in terms of the JSON payload, so both columns measure the same records
+        size = len(text) / 2 ** 20
+        print(f"{name:<16} {len(records):>8} {len(text) / 1024:>9.0f} {len(payload) / 1024:>11.0f}"
+              f" {len(text) / len(payload):>5.2f}x"
+              f" {size / json_time:>9.0f}/{size / json_decode:<8.0f} {size / binary_time:>10.0f}/{size / binary_decode:<9.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""Contract triggers per second: cold cache, warm cache, and a tree-walking interpreter.
+
+Deploys --contracts quiz contracts (answer check, scoring with a bonus, a
+closing rule) and runs --blocks blocks of --txs coin transactions,
+--trigger-share of them sent to a contract. "cold" empties the engine's cache
+before every block, so each block loads and compiles the contracts it
+touches; "warm" runs the same blocks with every contract cached.
+"interpreted" parses and walks each contract's stored JSON for every
+trigger, as a naive engine would. Storing the events through BlockStore is
+timed separately.
+
+    python benchmarks/bench_contracts.py [--contracts 200] [--blocks 200] [--txs 500] [--trigger-share 0.5]
+"""
+import argparse
+import json
+import operator
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ('Immutables', 'Entity', 'Database'):
+    sys.path.insert(0, os.path.join(root, folder))
+
+from sqlalchemy import create_engine, func, insert, select
+
+from Block import Contract, ContractEvent
+from BlockStore import BlockStore, create_schema, tune_engine
+from Contracts import ContractEngine
+
+def quiz_code(answer, closes_at):
+    return {
+        'params': {'answer': answer, 'points': 10, 'bonus': 5},
+        'rules': [
+            {'when': {'!=': [{'var': 'tx.nonce'}, {'var': 'params.answer'}]},
+             'emit': 'wrong', 'data': {'player': {'var': 'tx.sender'}}, 'stop': True},
+            {'emit': 'award', 'data': {
+                'player': {'var': 'tx.sender'},
+                'points': {'+': [{'var': 'params.points'},
+                                 {'if': [{'>=': [{'var': 'tx.amount'}, 1]}, {'var': 'params.bonus'}, 0]}]},
+                'height': {'var': 'block.height'}}},
+            {'when': {'>=': [{'var': 'block.height'}, closes_at]}, 'status': 'closed'},
+        ],
+    }
+
+OPERATORS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt,
+             '>=': operator.ge, '+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv}
+
+def interpret(node, env, params):
+    """The per-trigger JSON walk the compiled engine replaces."""
+    if not isinstance(node, dict):
+        return node
+    (op, args), = node.items()
+    if op == 'var':
+        root_name, name = args.split('.')
+        if root_name == 'params':
+            return params[name]
+        if root_name == 'block' and name == 'height':
+            return env['height']
+        return getattr(env[root_name], name)
+    if op == 'if':
+        return interpret(args[1] if interpret(args[0], env, params) else args[2], env, params)
+    values = [interpret(arg, env, params) for arg in args]
+    function = OPERATORS[op]
+    result = values[0]
+    for value in values[1:]:
+        result = function(result, value)
+    return result
+
+def run_interpreted(blocks, stored_codes):
+    events = 0
+    for height, block in enumerate(blocks):
+        for tx in block.coin_transactions:
+            text = stored_codes.get(tx.receiver)
+            if text is None:
+                continue
+            code = json.loads(text)
+            env = {'tx': tx, 'block': block, 'height': height}
+            for rule in code['rules']:
+                if interpret(rule.get('when', True), env, code['params']):
+                    if 'emit' in rule:
+                        data = {key: interpret(value, env, code['params']) for key, value in rule['data'].items()}
+                        events += 1
+                    if rule.get('stop'):
+                        break
+    return events
+
+def make_blocks(count, txs, contracts, share, players, seed):
+    rng = random.Random(seed)
+    blocks = []
+    for height in range(count):
+        transactions = []
+        for i in range(txs):
+            receiver = f"quiz-{rng.randrange(contracts)}" if rng.random() < share else f"0x{rng.randrange(players):040x}"
+            transactions.append(SimpleNamespace(
+                tx_hash=f"{height:032x}{i:032x}", sender=f"0x{rng.randrange(players):040x}", receiver=receiver,
+                amount=rng.choice([0.5, 1.0, 2.0]), fee=0.0, nonce=rng.randrange(4), signature='ab' * 66))
+        blocks.append(SimpleNamespace(hash=f"{height + 1:064x}", previous_hash=f"{height:064x}", timestamp=None,
+                                      nonce=0, validator=None, signature=None, merkle_root=None,
+                                      coin_transactions=transactions))
+    return blocks
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--contracts', type=int, default=200)
+    parser.add_argument('--blocks', type=int, default=200)
+    parser.add_argument('--txs', type=int, default=500)
+    parser.add_argument('--trigger-share', type=float, default=0.5)
+    parser.add_argument('--players', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    blocks = make_blocks(args.blocks, args.txs, args.contracts, args.trigger_share, args.players, args.seed)
+    triggers = sum(tx.receiver.startswith('quiz-') for block in blocks for tx in block.coin_transactions)
+    codes = {f"quiz-{i}": quiz_code(i % 4, 10 ** 9) for i in range(args.contracts)}
+    with tempfile.TemporaryDirectory() as directory:
+        engine = tune_engine(create_engine(f"sqlite:///{os.path.join(directory, 'contracts.db')}"))
+        create_schema(engine)
+        with engine.begin() as connection:
+            connection.execute(insert(Contract.__table__), [
+                {'contract_id': contract_id, 'creator': '0x' + 'f' * 40, 'code': code, 'status': 'active'}
+                for contract_id, code in codes.items()])
+
+        contracts = ContractEngine(engine, cache_size=2 * args.contracts)
+        started = time.perf_counter()
+        for height, block in enumerate(blocks):
+            for contract_id in codes:
+                contracts.invalidate(contract_id)
+            contracts.run_block(block, height)
+        cold = time.perf_counter() - started
+        compiled = contracts.stats['compiled']
+
+        started = time.perf_counter()
+        contracts.run_blocks(blocks, 0)
+        warm = time.perf_counter() - started
+
+        started = time.perf_counter()
+        interpreted_events = run_interpreted(blocks, {key: json.dumps(code) for key, code in codes.items()})
+        interpreted = time.perf_counter() - started
+
+        started = time.perf_counter()
+        BlockStore(engine).append_blocks(blocks, per_transaction=50)
+        stored = time.perf_counter() - started
+        with engine.connect() as connection:
+            rows = connection.execute(select(func.count()).select_from(ContractEvent.__table__)).scalar()
+        emitted = sum(len(block.contract_events) for block in blocks)
+        assert rows == emitted == interpreted_events, (rows, emitted, interpreted_events)
+
+    print(f"{triggers:,} triggers over {args.blocks} blocks, {args.contracts} contracts ({compiled:,} compiles when cold)")
+    print(f"{'mode':<12} {'seconds':>8} {'triggers/s':>11}")
+    for name, seconds in (('cold', cold), ('warm', warm), ('interpreted', interpreted)):
+        print(f"{name:<12} {seconds:>8.3f} {triggers / seconds:>11,.0f}")
+    print(f"stored {rows:,} events with their blocks in {stored:.2f}s ({rows / stored:,.0f} rows/s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Gossip tuning on a simulated network: coverage, duplicates, latency and bytes.
+
+Runs N in-process Gossip nodes over a discrete-event network. Each node only
+knows --view random peers, like a node whose mDNS view is partial, and every
+hop takes a random 1-20 ms. For each (fanout, ttl) pair prints the share of
+nodes reached, duplicate ratio, p50/p99 propagation latency and bytes sent per
+message, next to the old direct broadcast to the sender's own peers.
+
+    python benchmarks/bench_gossip.py [--nodes 200] [--view 12] [--fanout 2 3 4 6] [--ttl 4 6 8]
+"""
+import argparse
+import heapq
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Network'))
+from Gossip import Gossip
+
+class SimulatedNetwork:
+    def __init__(self, nodes, view, fanout, ttl, seed):
+        self.rng = random.Random(seed)
+        self.now = 0.0
+        self.events = []
+        self.sequence = 0
+        self.reached = {}
+        ids = [f"node-{i}" for i in range(nodes)]
+        self.nodes = {}
+        for node_id in ids:
+            view_ids = self.rng.sample([other for other in ids if other != node_id], view)
+            self.nodes[node_id] = Gossip(
+                node_id,
+                get_peers=lambda view_ids=view_ids: {peer: peer for peer in view_ids},
+                send=self.send,
+                fanout=fanout,
+                ttl=ttl,
+                deliver=lambda message, node_id=node_id: self.reached.setdefault(node_id, self.now),
+                clock=lambda: self.now,
+                rng=random.Random(self.rng.random()),
+                background=False,
+            )
+
+    def send(self, urls, message):
+        for url in urls:
+            self.sequence += 1
+            heapq.heappush(self.events, (self.now + self.rng.uniform(0.001, 0.020), self.sequence, url, message))
+
+    def run(self):
+        while self.events:
+            self.now, _, node_id, message = heapq.heappop(self.events)
+            self.nodes[node_id].receive(message)
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[int(fraction * (len(values) - 1))] if values else float('nan')
+
+def simulate(nodes, view, fanout, ttl, messages, seed):
+    network = SimulatedNetwork(nodes, view, fanout, ttl, seed)
+    coverage, latencies = [], []
+    for i in range(messages):
+        network.reached = {}
+        origin = network.nodes[f"node-{network.rng.randrange(nodes)}"]
+        start = network.now
+        origin.originate('x' * 64, sender=origin.node_id)
+        network.run()
+        coverage.append((len(network.reached) + 1) / nodes)
+        latencies.extend(at - start for at in network.reached.values())
+    received = sum(node.counters['received'] for node in network.nodes.values())
+    duplicates = sum(node.counters['duplicates'] for node in network.nodes.values())
+    bytes_sent = sum(node.counters['bytes_sent'] for node in network.nodes.values())
+    return {
+        'coverage': sum(coverage) / len(coverage),
+        'full_coverage': sum(c == 1.0 for c in coverage) / len(coverage),
+        'duplicate_ratio': duplicates / received if received else 0.0,
+        'p50_ms': 1000 * percentile(latencies, 0.5),
+        'p99_ms': 1000 * percentile(latencies, 0.99),
+        'bytes_per_message': bytes_sent / messages,
+        'sends_per_message': received / messages,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--nodes', type=int, default=200)
+    parser.add_argument('--view', type=int, default=12, help='Peers each node knows about')
+    parser.add_argument('--fanout', type=int, nargs='+', default=[2, 3, 4, 6])
+    parser.add_argument('--ttl', type=int, nargs='+', default=[4, 6, 8])
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    message_bytes = len(json.dumps({'sender': 'node-0', 'content': 'x' * 64, 'timestamp': 0.0}))
+    print(f"{args.nodes} nodes, {args.view} known peers each, {args.messages} messages per run")
+    print(f"direct broadcast: coverage {(args.view + 1) / args.nodes:.1%}, "
+          f"{args.view} sends, {args.view * message_bytes} bytes per message\n")
+    print(f"{'fanout':>6} {'ttl':>4} {'coverage':>9} {'all':>6} {'dup':>6} {'p50 ms':>7} {'p99 ms':>7} {'sends':>6} {'bytes':>7}")
+    for fanout in args.fanout:
+        for ttl in args.ttl:
+            result = simulate(args.nodes, args.view, fanout, ttl, args.messages, args.seed)
+            print(f"{fanout:>6} {ttl:>4} {result['coverage']:>9.1%} {result['full_coverage']:>6.0%} "
+                  f"{result['duplicate_ratio']:>6.2f} {result['p50_ms']:>7.1f} {result['p99_ms']:>7.1f} "
+                  f"{result['sends_per_message']:>6.0f} {result['bytes_per_message']:>7.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Per-call hashing vs HashManager.hash_many for batches of 10k to 1M items.
+
+    python benchmarks/bench_hashes.py [--sizes 10000 100000 1000000] [--item-bytes 64 4096]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Immutables'))
+from Hashes import HashManager
+
+def per_call(items, algorithm):
+    # The original path: look the algorithm up and encode on every call
+    results = []
+    for data in items:
+        hash_function = hashlib.new(algorithm)
+        hash_function.update(data.encode('utf-8'))
+        results.append(hash_function.hexdigest())
+    return results
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--item-bytes', type=int, nargs='+', default=[64, 4096])
+    parser.add_argument('--algorithm', default='sha512')
+    parser.add_argument('--max-bytes', type=int, default=1 << 30,
+                        help='Skip combinations whose batch would exceed this many bytes')
+    args = parser.parse_args()
+
+    manager = HashManager(args.algorithm)
+    print(f"{'items':>8} {'bytes':>6} {'per-call/s':>12} {'str batch/s':>12} {'bytes batch/s':>14} {'speedup':>8}")
+    for item_bytes in args.item_bytes:
+        for size in args.sizes:
+            if size * item_bytes > args.max_bytes:
+                continue
+            texts = [f"{i:0{item_bytes}d}"[-item_bytes:] for i in range(size)]
+            blobs = [text.encode('utf-8') for text in texts]
+
+            old_time, old = timed(per_call, texts, args.algorithm)
+            str_time, from_str = timed(manager.hash_many, texts)
+            bytes_time, from_bytes = timed(manager.hash_many, blobs)
+            assert old == from_str == from_bytes, 'batch hashes differ from per-call hashes'
+            assert all(manager.verify_many(blobs, old))
+
+            print(f"{size:>8} {item_bytes:>6} {size / old_time:>12,.0f} {size / str_time:>12,.0f} "
+                  f"{size / bytes_time:>14,.0f} {old_time / bytes_time:>7.2f}x")
+    manager.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Blocks applied per second: per-transfer ORM updates vs Ledger with write-behind upserts.
+
+Both paths apply the same --blocks blocks of --txs payouts and transfers among
+--addresses players to a fresh SQLite file and commit once per block. The ORM
+path reads and updates two CoinBalance rows per transfer like a plain
+SQLAlchemy implementation would; the Ledger path applies each block in memory
+and flushes the changed balances with one batched upsert.
+
+    python benchmarks/bench_ledger.py [--blocks 500] [--txs 200] [--addresses 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ('Immutables', 'Entity'):
+    sys.path.insert(0, os.path.join(root, folder))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from Block import Base, CoinBalance
+from Ledger import Ledger, to_coins
+
+TREASURY = '0x' + 'f' * 40
+
+def make_blocks(count, txs_per_block, addresses, seed):
+    rng = random.Random(seed)
+    players = [f"0x{i:040x}" for i in range(addresses)]
+    funds = {}  # Generator-side balances, so player transfers never overdraw
+    blocks, previous = [], None
+    for height in range(count):
+        txs = []
+        for i in range(txs_per_block):
+            # Mostly house-point payouts from the treasury, some transfers between players
+            sender = rng.choice(players)
+            amount = round(rng.uniform(0.01, 0.1), 2)
+            if rng.random() < 0.7 or funds.get(sender, 0) < amount + 0.01:
+                sender, amount = TREASURY, round(rng.uniform(1, 10), 2)
+            receiver = rng.choice(players)
+            funds[sender] = funds.get(sender, 0) - amount - 0.001
+            txs.append(SimpleNamespace(
+                tx_hash=f"{height:032x}{i:032x}", sender=sender, receiver=receiver, amount=amount, fee=0.001))
+        # Credit only after the block, since a block is checked against the balances before it
+        for tx in txs:
+            funds[tx.receiver] = funds.get(tx.receiver, 0) + tx.amount
+        block_hash = f"{height:064x}"
+        blocks.append(SimpleNamespace(hash=block_hash, previous_hash=previous, validator=TREASURY, coin_transactions=txs))
+        previous = block_hash
+    return blocks
+
+def orm_apply(engine, blocks):
+    with Session(engine) as session:
+        for block in blocks:
+            for tx in block.coin_transactions:
+                rows = []
+                for address in (tx.sender, tx.receiver):
+                    row = session.get(CoinBalance, address)
+                    if row is None:
+                        row = CoinBalance(address=address, balance=0.0)
+                        session.add(row)
+                        session.flush()
+                    rows.append(row)
+                rows[0].balance -= tx.amount + tx.fee
+                rows[1].balance += tx.amount
+            validator = session.get(CoinBalance, block.validator)
+            validator.balance += sum(tx.fee for tx in block.coin_transactions)
+            session.commit()
+
+def ledger_apply(engine, blocks):
+    ledger = Ledger(issuers=[TREASURY])
+    for block in blocks:
+        ledger.apply_block(block)
+        ledger.flush(engine)
+    return ledger
+
+def fresh_engine(directory, name):
+    engine = create_engine(f"sqlite:///{os.path.join(directory, name)}")
+    Base.metadata.create_all(engine)
+    return engine
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blocks', type=int, default=500)
+    parser.add_argument('--txs', type=int, default=200)
+    parser.add_argument('--addresses', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    blocks = make_blocks(args.blocks, args.txs, args.addresses, args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        results = {}
+        for name, apply in (('orm', orm_apply), ('ledger', ledger_apply)):
+            engine = fresh_engine(directory, f"{name}.db")
+            started = time.perf_counter()
+            outcome = apply(engine, blocks)
+            elapsed = time.perf_counter() - started
+            results[name] = elapsed
+            print(f"{name:>6}: {args.blocks / elapsed:8,.0f} blocks/s  {args.blocks * args.txs / elapsed:10,.0f} tx/s")
+            if name == 'ledger':
+                ledger = outcome
+            else:
+                orm_engine = engine
+        print(f"speedup {results['orm'] / results['ledger']:.1f}x")
+
+        with Session(orm_engine) as session:
+            drift = max(abs(row.balance - to_coins(ledger.balance(row.address)))
+                        for row in session.query(CoinBalance))
+        print(f"largest ORM Float drift vs exact ledger: {drift:.3g} coins")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Mempool ingestion rate and block template cost.
+
+Feeds --txs synthetic payouts from --senders senders (random fees, each
+sender's nonces shuffled a little) into a Mempool capped at --cap, so the
+later part of the run also exercises lowest-fee eviction. Then times
+Mempool.template() against sorting the whole pool by fee.
+
+    python benchmarks/bench_mempool.py [--txs 200000] [--senders 5000] [--cap 50000] [--block 1000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ('Immutables', 'Entity'):
+    sys.path.insert(0, os.path.join(root, folder))
+from Hashes import transaction_hash
+from Mempool import Mempool, MempoolError
+
+def payouts(count, senders, seed):
+    rng = random.Random(seed)
+    nonces = [0] * senders
+    txs = []
+    for i in range(count):
+        sender = rng.randrange(senders)
+        tx = {
+            'sender': f"0x{sender:040x}",
+            'receiver': f"0x{rng.randrange(senders):040x}",
+            'amount': rng.randint(1, 100),
+            'fee': round(rng.expovariate(10), 6),
+            'nonce': nonces[sender],
+            'signature': 'ab' * 66,
+        }
+        tx['tx_hash'] = transaction_hash(tx['sender'], tx['receiver'], tx['amount'], tx['fee'], tx['nonce'])
+        txs.append(tx)
+        nonces[sender] += 1
+    # Gossip delivers a sender's transactions roughly, not exactly, in order
+    for i in range(0, len(txs) - 1, 7):
+        txs[i], txs[i + 1] = txs[i + 1], txs[i]
+    return txs
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--txs', type=int, default=200000)
+    parser.add_argument('--senders', type=int, default=5000)
+    parser.add_argument('--cap', type=int, default=50000)
+    parser.add_argument('--block', type=int, default=1000, help='Transactions per block template')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    txs = payouts(args.txs, args.senders, args.seed)
+    mempool = Mempool(max_size=args.cap)
+    refused = 0
+    started = time.perf_counter()
+    for tx in txs:
+        try:
+            mempool.add(tx)
+        except MempoolError:
+            refused += 1
+    elapsed = time.perf_counter() - started
+    print(f"ingest: {args.txs} txs in {elapsed:.2f}s = {args.txs / elapsed:,.0f} tx/s "
+          f"(pool {len(mempool)}, refused {refused}, stats {mempool.stats})")
+
+    runs = 20
+    started = time.perf_counter()
+    for _ in range(runs):
+        template = mempool.template(max_txs=args.block)
+    template_ms = 1000 * (time.perf_counter() - started) / runs
+    started = time.perf_counter()
+    for _ in range(runs):
+        naive = sorted(mempool._by_hash.values(), key=lambda tx: -tx['fee'])[:args.block]
+    sort_ms = 1000 * (time.perf_counter() - started) / runs
+    print(f"template of {len(template)}: {template_ms:.2f} ms   full sort (ignores nonces): {sort_ms:.2f} ms")
+
+    started = time.perf_counter()
+    blocks = 0
+    while len(mempool):
+        included = mempool.template(max_txs=args.block)
+        if not included:
+            break
+        mempool.remove_included(tx['tx_hash'] for tx in included)
+        blocks += 1
+    elapsed = time.perf_counter() - started
+    print(f"drained {blocks} blocks in {elapsed:.2f}s ({1000 * elapsed / max(blocks, 1):.2f} ms per template + removal), "
+          f"{len(mempool)} left waiting on nonce gaps")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Heartbeat/broadcast round time: sequential requests.post vs PeerClient.fan_out.
+
+Starts N stub peers on localhost. Most answer after --delay seconds; every
+--slow-every-th peer hangs longer than the timeout, like an overloaded or
+half-dead node.
+
+    python benchmarks/bench_peer_client.py [--peers 10 50 200] [--timeout 2]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Network'))
+from PeerClient import PeerClient
+
+class StubPeer(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like Werkzeug's threaded server
+    delay = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.delay)
+        body = json.dumps({'uuid': 'stub'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_peers(count, delay, slow_every, slow_delay):
+    servers = []
+    for i in range(count):
+        handler = type('Peer', (StubPeer,), {'delay': slow_delay if slow_every and i % slow_every == 0 else delay})
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers, [f'http://127.0.0.1:{server.server_address[1]}' for server in servers]
+
+def sequential_round(urls, payload, timeout):
+    # The original maintenance_task/broadcast_message loop
+    for url in urls:
+        try:
+            requests.post(f'{url}/peer', json=payload, timeout=timeout)
+        except requests.RequestException:
+            pass
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--peers', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--timeout', type=float, default=2.0)
+    parser.add_argument('--delay', type=float, default=0.01)
+    parser.add_argument('--slow-every', type=int, default=10)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--skip-sequential-above', type=int, default=50,
+                        help='Sequential rounds get slow fast; skip them above this many peers')
+    args = parser.parse_args()
+    payload = {'uuid': 'bench', 'name': 'bench', 'timestamp': time.time()}
+
+    print(f"{'peers':>6} {'sequential s':>13} {'pooled s':>9} {'ok':>5}")
+    for count in args.peers:
+        servers, urls = start_peers(count, args.delay, args.slow_every, args.timeout * 1.5)
+        sequential = '-'
+        if count <= args.skip_sequential_above:
+            started = time.perf_counter()
+            sequential_round(urls, payload, args.timeout)
+            sequential = f'{time.perf_counter() - started:.2f}'
+
+        client = PeerClient(timeout=args.timeout, max_workers=max(64, count))
+        best, ok = float('inf'), 0
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            # Keep probing slow peers each round so the measurement includes them
+            results = client.fan_out('POST', urls, '/peer', json=payload, skip_backoff=False)
+            best = min(best, time.perf_counter() - started)
+            ok = sum(not isinstance(result, Exception) for result in results.values())
+        print(f"{count:>6} {sequential:>13} {best:>9.2f} {ok:>5}")
+        client.close()
+        for server in servers:
+            server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Peer bookkeeping with thousands of simulated peers: plain dict vs PeerRegistry.
+
+Fills both with --peers peers, then measures:
+- a stale-peer sweep when 1% of the peers have gone quiet (the old full scan
+  vs popping the expiry heap);
+- serving /peers (encoding the whole dict per request vs the cached
+  snapshot), while --threads threads send --heartbeats heartbeats a second;
+- how long a discovery callback holds zeroconf's thread when contacting a
+  peer takes --contact-ms (a blocking post vs queueing it to ContactQueue).
+
+    python benchmarks/bench_peers.py [--peers 5000] [--threads 8] [--heartbeats 2000] [--contact-ms 20]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, 'Network'))
+
+from Peers import ContactQueue, PeerRegistry
+
+TTL = 300
+
+def fill(count, now, rng):
+    plain, registry = {}, PeerRegistry(ttl=TTL)
+    for i in range(count):
+        # 1% of the peers were last heard from before the ttl
+        last_seen = now - (TTL + 10 if i % 100 == 0 else rng.uniform(0, TTL / 2))
+        info = {'url': f"http://10.0.{i // 250}.{i % 250}:5000", 'name': f"node-{i}", 'last_seen': last_seen}
+        plain[f"peer-{i}"] = dict(info)
+        registry.upsert(f"peer-{i}", info['url'], info['name'], last_seen)
+    return plain, registry
+
+def sweep_plain(peers, now):
+    stale = [uuid for uuid, info in peers.items() if now - info['last_seen'] > TTL]
+    for uuid in stale:
+        del peers[uuid]
+    return stale
+
+def serve_under_heartbeats(serve, touch, uuids, threads, rate, duration):
+    stop = threading.Event()
+    beats = [0] * threads
+
+    def heartbeat(index):
+        rng = random.Random(index)
+        while not stop.wait(threads / rate):
+            touch(rng.choice(uuids))
+            beats[index] += 1
+
+    workers = [threading.Thread(target=heartbeat, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    served, latencies = 0, []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        serve()
+        latencies.append(time.perf_counter() - started)
+        served += 1
+    stop.set()
+    for worker in workers:
+        worker.join()
+    latencies.sort()
+    return served / duration, sum(beats) / duration, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--peers', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=8, help='Heartbeat threads while /peers is served')
+    parser.add_argument('--heartbeats', type=float, default=2000, help='Heartbeats per second across the threads')
+    parser.add_argument('--duration', type=float, default=2.0)
+    parser.add_argument('--contact-ms', type=float, default=20.0)
+    parser.add_argument('--discoveries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = time.time()
+    plain, registry = fill(args.peers, now, rng)
+
+    started = time.perf_counter()
+    plain_stale = sweep_plain(plain, now)
+    plain_sweep = time.perf_counter() - started
+    started = time.perf_counter()
+    registry_stale = registry.expire(now)
+    registry_sweep = time.perf_counter() - started
+    assert sorted(plain_stale) == sorted(uuid for uuid, _ in registry_stale)
+    started = time.perf_counter()
+    registry.expire(now)
+    idle_sweep = time.perf_counter() - started
+    print(f"{args.peers:,} peers, {len(plain_stale)} stale")
+    print(f"stale sweep: dict scan {1000 * plain_sweep:.2f} ms, heap {1000 * registry_sweep:.3f} ms, "
+          f"heap with nothing to expire {1e6 * idle_sweep:.1f} us")
+
+    uuids = list(plain)
+    lock = threading.Lock()
+
+    def plain_touch(uuid):
+        with lock:
+            plain[uuid]['last_seen'] = time.time()
+
+    def plain_serve():
+        with lock:
+            # Copied under the lock, as a handler must to avoid "dict changed size during iteration"
+            body = {uuid: dict(info) for uuid, info in plain.items()}
+        return json.dumps({'peers': body}).encode()
+
+    print(f"\n{'/peers':<10} {'requests/s':>11} {'heartbeats/s':>13} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, serve, touch in (('dict', plain_serve, plain_touch),
+                               ('registry', registry.snapshot_json, registry.touch)):
+        rate, beats, p50, p99 = serve_under_heartbeats(serve, touch, uuids, args.threads, args.heartbeats, args.duration)
+        print(f"{name:<10} {rate:>11,.0f} {beats:>13,.0f} {1000 * p50:>8.3f} {1000 * p99:>8.3f}")
+
+    def contact_one(url):
+        time.sleep(args.contact_ms / 1000)
+
+    def contact_batch(batch):
+        # A fan-out: one round trip for the whole batch
+        time.sleep(args.contact_ms / 1000)
+
+    started = time.perf_counter()
+    for i in range(args.discoveries):
+        contact_one(f"http://new-{i}")
+    blocking = (time.perf_counter() - started) / args.discoveries
+    introductions = ContactQueue(contact_batch)
+    started = time.perf_counter()
+    for i in range(args.discoveries):
+        introductions.put(f"new-{i}", f"http://new-{i}")
+    queued = (time.perf_counter() - started) / args.discoveries
+    introductions.join()
+    drained = time.perf_counter() - started
+    print(f"\ndiscovery callback: blocking post {1000 * blocking:.1f} ms, queued {1e6 * queued:.1f} us; "
+          f"{args.discoveries} introductions done in {1000 * drained:.0f} ms over {introductions.stats['batches']} batches")
+
+if __name__ == '__main__':
+    main()
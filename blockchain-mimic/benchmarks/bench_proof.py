@@ -0,0 +1,63 @@
+"""Proof-of-work search rate from 1 to N worker processes, and proof check cost.
+
+Each worker count first sweeps --hashes nonces against an unreachable target,
+which measures raw hashes/sec including pool dispatch and cancellation, then
+seals --blocks blocks at --difficulty bits to show time to a real proof.
+
+    python benchmarks/bench_proof.py [--hashes 4000000] [--difficulty 20] [--blocks 5] [--max-workers 8]
+"""
+import argparse
+import os
+import time
+
+from chain_fixtures import build_chain
+from Proof import Miner, ProofError, check_work, work_prefix
+
+def sweep(workers, hashes):
+    miner = Miner(workers)
+    try:
+        miner.search(b'warm-up', 256, end=miner.chunk * workers)  # Start the pool outside the timing
+    except ProofError:
+        pass
+    try:
+        miner.search(work_prefix({'previous_hash': 'ab' * 32, 'merkle_root': 'cd' * 32}), 256, end=hashes)
+    except ProofError:
+        pass
+    return miner
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hashes', type=int, default=4_000_000)
+    parser.add_argument('--difficulty', type=int, default=20)
+    parser.add_argument('--blocks', type=int, default=5)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    chain = build_chain(args.blocks + 1)
+    counts = sorted({1, *(2 ** i for i in range(1, 8) if 2 ** i < args.max_workers), args.max_workers})
+    print(f"{'workers':>7} {'MH/s':>7} {'kH/s/core':>10} {'scaling':>8} {'efficiency':>10} {'s/block @ %d bits' % args.difficulty:>17}")
+    single = None
+    for workers in counts:
+        miner = sweep(workers, args.hashes)
+        rate = miner.stats['hashes_per_second']
+        single = single or rate
+        started = time.perf_counter()
+        for block in chain[1:]:
+            miner.seal(block, args.difficulty)
+        per_block = (time.perf_counter() - started) / args.blocks
+        miner.close()
+        assert all(check_work({'hash': block.hash, 'previous_hash': block.previous_hash,
+                               'merkle_root': block.merkle_root, 'nonce': block.nonce}, args.difficulty)
+                   for block in chain[1:])
+        print(f"{workers:>7} {rate / 1e6:>7.2f} {rate / workers / 1e3:>10.0f} {rate / single:>7.2f}x"
+              f" {rate / single / workers:>9.0%} {per_block:>17.3f}")
+
+    block = chain[1]
+    header = {'hash': block.hash, 'previous_hash': block.previous_hash, 'merkle_root': block.merkle_root, 'nonce': block.nonce}
+    started = time.perf_counter()
+    for _ in range(100_000):
+        check_work(header, args.difficulty)
+    print(f"\nproof check: {1e6 * (time.perf_counter() - started) / 100_000:.2f} us per block")
+
+if __name__ == '__main__':
+    main()
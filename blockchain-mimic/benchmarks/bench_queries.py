@@ -0,0 +1,159 @@
+"""Address, NFT and contract-event queries at 10M rows, before and after the composite indexes.
+
+Fills a SQLite file with --rows coin transactions (100 per block, a treasury
+address sending 30% of them so it has a very deep history) and --rows / 10
+NFTs, NFT transfers and contract events. The Queries page functions are
+timed with only the primary keys and unique columns indexed, then again once
+the composite indexes exist. A deep page of the treasury's history is also
+fetched by keyset cursor and by OFFSET.
+
+    python benchmarks/bench_queries.py [--rows 10000000] [--db /path/to/keep.db]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ('Immutables', 'Entity', 'Database'):
+    sys.path.insert(0, os.path.join(root, folder))
+
+from sqlalchemy import create_engine, select
+
+from Block import Base, CoinTransaction
+import Queries
+from BlockStore import create_schema, read_engine
+
+TREASURY = '0x' + 'f' * 40
+COMPOSITE_INDEXES = ('ix_coin_transactions_sender_block', 'ix_coin_transactions_receiver_block', 'ix_nfts_owner',
+                     'ix_nft_transfers_nft_block', 'ix_contract_events_contract_block')
+
+def address(i):
+    return f"0x{i:040x}"
+
+def populate(path, rows, addresses, seed):
+    rng = random.Random(seed)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    connection = sqlite3.connect(path)
+    # A throwaway file: no journal, no fsync
+    connection.executescript("PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF; PRAGMA cache_size=-262144;")
+    for name in COMPOSITE_INDEXES:
+        connection.execute(f"DROP INDEX IF EXISTS {name}")
+    blocks = rows // 100
+    connection.executemany("INSERT INTO blocks (id, hash, previous_hash, nonce) VALUES (?, ?, ?, 0)",
+                           ((b + 1, f"{b:064x}", f"{b - 1:064x}") for b in range(blocks)))
+
+    def transactions():
+        for i in range(rows):
+            sender = TREASURY if rng.random() < 0.3 else address(rng.randrange(addresses))
+            yield (f"{i:064x}", sender, address(rng.randrange(addresses)), 1.0, 0.001, 0, 'sig', i // 100 + 1)
+    connection.executemany("INSERT INTO coin_transactions (tx_hash, sender, receiver, amount, fee, nonce, signature, block_id) "
+                           "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", transactions())
+
+    extra = rows // 10
+    connection.executemany("INSERT INTO nfts (id, token_id, creator, owner, asset_uri, block_id) VALUES (?, ?, ?, ?, 'ipfs://x', ?)",
+                           ((i + 1, f"{i:064x}", TREASURY, address(rng.randrange(addresses)), i * blocks // extra + 1)
+                            for i in range(extra)))
+    connection.executemany("INSERT INTO nft_transfers (from_address, to_address, nft_id, block_id) VALUES (?, ?, ?, ?)",
+                           ((address(rng.randrange(addresses)), address(rng.randrange(addresses)),
+                             rng.randrange(extra // 10) + 1, i * blocks // extra + 1) for i in range(extra)))
+    connection.executemany("INSERT INTO contracts (id, contract_id, creator, code) VALUES (?, ?, ?, '{}')",
+                           ((i + 1, f"contract-{i}", TREASURY) for i in range(100)))
+    connection.executemany("INSERT INTO contract_events (trigger_tx_hash, action_type, action_data, contract_id, block_id) "
+                           "VALUES ('', 'award', '{\"points\": 10}', ?, ?)",
+                           ((rng.randrange(100) + 1, i * blocks // extra + 1) for i in range(extra)))
+    connection.commit()
+    connection.close()
+
+def timed(engine, query, args_list, runs):
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        for i in range(runs):
+            query(connection, *args_list[i % len(args_list)])
+    return 1000 * (time.perf_counter() - started) / runs
+
+def measure(engine, addresses, nfts, runs, rng):
+    people = [(address(rng.randrange(addresses)),) for _ in range(runs)]
+    return {
+        'address history, page 1': timed(engine, Queries.address_history, people, runs),
+        'NFTs owned, page 1': timed(engine, Queries.nfts_owned, people, runs),
+        'NFT transfers, page 1': timed(engine, Queries.nft_history, [(f"{rng.randrange(nfts // 10):064x}",) for _ in range(runs)], runs),
+        'contract events, page 1': timed(engine, Queries.contract_events, [(f"contract-{rng.randrange(100)}",) for _ in range(runs)], runs),
+    }
+
+def deep_page(engine, depth, limit=50):
+    table = CoinTransaction.__table__
+    with engine.connect() as connection:
+        # The cursor a client would hold after paging `depth` rows into the treasury's history
+        boundary = connection.execute(
+            select(table.c.block_id, table.c.id).where(table.c.sender == TREASURY)
+            .order_by(table.c.block_id.desc(), table.c.id.desc()).offset(depth - 1).limit(1)).one()
+        cursor = Queries.encode_cursor(*boundary)
+        keyset, offset = [], []
+        for _ in range(5):  # Best of five, so statement compilation and a cold cache do not count
+            started = time.perf_counter()
+            Queries.address_history(connection, TREASURY, limit=limit, cursor=cursor)
+            keyset.append(1000 * (time.perf_counter() - started))
+            started = time.perf_counter()
+            connection.execute(select(table).where(table.c.sender == TREASURY)
+                               .order_by(table.c.block_id.desc(), table.c.id.desc()).offset(depth).limit(limit)).all()
+            offset.append(1000 * (time.perf_counter() - started))
+    return min(keyset), min(offset)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--addresses', type=int, default=200_000)
+    parser.add_argument('--db', help='Keep the generated database here and reuse it on later runs')
+    parser.add_argument('--runs', type=int, default=200, help='Queries per measurement with indexes')
+    parser.add_argument('--unindexed-runs', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    directory = None
+    path = args.db
+    if path is None:
+        directory = tempfile.TemporaryDirectory()
+        path = os.path.join(directory.name, 'queries.db')
+    rng = random.Random(args.seed)
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        populate(path, args.rows, args.addresses, args.seed)
+        print(f"populated {args.rows:,} coin transactions in {time.perf_counter() - started:.0f}s, "
+              f"{os.path.getsize(path) / 2 ** 30:.1f} GiB")
+
+    connection = sqlite3.connect(path)
+    for name in COMPOSITE_INDEXES:
+        connection.execute(f"DROP INDEX IF EXISTS {name}")
+    connection.commit()
+    engine = read_engine(path)
+    before = measure(engine, args.addresses, args.rows // 10, args.unindexed_runs, rng)
+    engine.dispose()
+
+    started = time.perf_counter()
+    writer = create_engine(f"sqlite:///{path}")
+    create_schema(writer)  # Creates the dropped indexes again
+    writer.dispose()
+    print(f"built composite indexes in {time.perf_counter() - started:.0f}s")
+    engine = read_engine(path)
+    after = measure(engine, args.addresses, args.rows // 10, args.runs, rng)
+
+    print(f"\n{'query':<26} {'no index ms':>12} {'indexed ms':>11} {'speedup':>9}")
+    for name in before:
+        print(f"{name:<26} {before[name]:>12.1f} {after[name]:>11.3f} {before[name] / after[name]:>8.0f}x")
+    for depth in (1000, 100_000, 1_000_000):
+        if depth < args.rows * 0.3:
+            keyset, offset = deep_page(engine, depth)
+            print(f"treasury page at row {depth:>9,}: keyset {keyset:.2f} ms, OFFSET {offset:.1f} ms")
+    engine.dispose()
+    connection.close()
+    if directory is not None:
+        directory.cleanup()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Cold-start time: replaying every stored block vs restoring a snapshot and replaying the tail.
+
+Stores --blocks blocks of --txs payouts to --addresses players. A snapshot
+is taken --tail blocks before the tip, like a node that checkpoints every N
+blocks and then went offline. Both cold starts begin from a fresh Ledger on
+the same database file.
+
+    python benchmarks/bench_snapshot.py [--blocks 10000] [--txs 50] [--addresses 20000] [--tail 100]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ('Immutables', 'Entity', 'Database'):
+    sys.path.insert(0, os.path.join(root, folder))
+
+from sqlalchemy import create_engine, insert
+
+from Block import NFT, Contract
+from BlockStore import BlockStore, create_schema, tune_engine
+from Ledger import Ledger
+from Snapshot import Checkpoints, Snapshot
+
+TREASURY = '0x' + 'f' * 40
+
+def make_chain(count, txs, addresses, seed):
+    rng = random.Random(seed)
+    chain, previous = [], '0' * 64
+    for height in range(count):
+        block_hash = f"{height + 1:064x}"
+        chain.append(SimpleNamespace(
+            hash=block_hash, previous_hash=previous, timestamp=datetime(2025, 1, 1), nonce=0,
+            validator=None, signature=None, merkle_root=None,
+            coin_transactions=[SimpleNamespace(
+                tx_hash=f"{height:032x}{i:032x}", sender=TREASURY,
+                receiver=f"0x{rng.randrange(addresses):040x}", amount=round(rng.uniform(1, 10), 2),
+                fee=0.0, nonce=height * txs + i, signature='ab' * 66) for i in range(txs)]))
+        previous = block_hash
+    return chain
+
+def cold_start(engine, directory):
+    ledger = Ledger(issuers=[TREASURY])
+    started = time.perf_counter()
+    restored, replayed = Checkpoints(directory, ledger, BlockStore(engine)).start()
+    return time.perf_counter() - started, ledger, restored, replayed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blocks', type=int, default=10000)
+    parser.add_argument('--txs', type=int, default=50)
+    parser.add_argument('--addresses', type=int, default=20000)
+    parser.add_argument('--tail', type=int, default=100, help='Blocks stored after the snapshot')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    chain = make_chain(args.blocks, args.txs, args.addresses, args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        engine = tune_engine(create_engine(f"sqlite:///{os.path.join(directory, 'node.db')}"))
+        create_schema(engine)
+        with engine.begin() as connection:
+            connection.execute(insert(NFT.__table__), [
+                {'token_id': f"{i:064x}", 'creator': TREASURY, 'owner': f"0x{i % args.addresses:040x}", 'asset_uri': 'ipfs://x'}
+                for i in range(args.addresses)])
+            connection.execute(insert(Contract.__table__), [
+                {'contract_id': f"contract-{i}", 'creator': TREASURY, 'code': {}, 'status': 'active'} for i in range(100)])
+        store = BlockStore(engine)
+        split = args.blocks - args.tail
+        store.append_blocks(chain[:split], per_transaction=500)
+
+        snapshots = os.path.join(directory, 'snapshots')
+        _, ledger, _, _ = cold_start(engine, snapshots)
+        started = time.perf_counter()
+        path = Checkpoints(snapshots, ledger, store).take()
+        print(f"snapshot at height {ledger.height}: {os.path.getsize(path) / 2 ** 20:.1f} MiB, "
+              f"written in {1000 * (time.perf_counter() - started):.0f} ms")
+        store.append_blocks(chain[split:], per_transaction=500)
+
+        started = time.perf_counter()
+        with Snapshot(path) as snapshot:
+            opened = time.perf_counter() - started
+            started = time.perf_counter()
+            for _ in range(1000):
+                snapshot.balance(f"0x{random.randrange(args.addresses):040x}")
+            lookup = (time.perf_counter() - started) / 1000
+        print(f"open + verify checksum {1000 * opened:.1f} ms, mmap balance lookup {1e6 * lookup:.1f} us")
+
+        full, full_ledger, _, replayed = cold_start(engine, os.path.join(directory, 'none'))
+        print(f"without snapshot: {full:.2f}s, replayed {replayed} blocks")
+        fast, fast_ledger, restored, replayed = cold_start(engine, snapshots)
+        print(f"   with snapshot: {fast:.2f}s, restored height {restored}, replayed {replayed} blocks "
+              f"({full / fast:.0f}x faster)")
+        assert fast_ledger.balances == full_ledger.balances and fast_ledger.tip_hash == full_ledger.tip_hash
+
+if __name__ == '__main__':
+    main()
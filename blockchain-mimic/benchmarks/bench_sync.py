@@ -0,0 +1,77 @@
+"""Local multi-node rig for headers-first chain sync.
+
+Every peer is an in-process Flask app serving its chain through
+chain_blueprint, reached through its test client instead of the network.
+The syncing node shares all but the last `--divergence` blocks with the
+peers, which are one window ahead of each other, so sync time should follow
+the divergence and not the chain length.
+
+    python benchmarks/bench_sync.py [--lengths 10000 100000] [--divergence 500] [--peers 4]
+"""
+import argparse
+import time
+
+from flask import Flask
+
+from chain_fixtures import BenchBlock, build_chain
+import Codec
+from Rules import Rules
+from Sync import ChainSync, chain_blueprint
+
+class TestClientTransport:
+    """Routes peer URLs to Flask test clients and counts payload bytes."""
+
+    def __init__(self, clients):
+        self.clients = clients
+        self.bytes_received = 0
+
+    def get(self, peer_url, path, params=None, accept=None):
+        headers = {'Accept': accept} if accept else None
+        response = self.clients[peer_url].get(path, query_string=params, headers=headers)
+        if response.status_code != 200:
+            raise RuntimeError(f"{peer_url}{path} returned {response.status_code}")
+        self.bytes_received += len(response.data)
+        return Codec.decode_response(response.content_type, response.data)
+
+def make_peer(chain):
+    rules = Rules(chain=chain)
+    app = Flask(__name__)
+    app.register_blueprint(chain_blueprint(rules))
+    return app.test_client()
+
+def run(length, divergence, peer_count, window, txs_per_block, binary=True):
+    shared = build_chain(length - divergence, txs_per_block)
+    ours = build_chain(length, txs_per_block, branch='ours', base=shared)
+    peer_chains = [build_chain(length + (i + 1) * window, txs_per_block, branch='peers', base=shared)
+                   for i in range(peer_count)]
+    transport = TestClientTransport({f'peer{i}': make_peer(chain) for i, chain in enumerate(peer_chains)})
+
+    rules = Rules(chain=ours)
+    rules.remember_valid(ours)
+    sync = ChainSync(rules, transport, block_factory=BenchBlock.from_dict, window=window, binary=binary)
+    started = time.perf_counter()
+    changed = sync.sync(transport.clients)
+    elapsed = time.perf_counter() - started
+
+    expected = peer_chains[-1]
+    assert changed and len(rules.chain) == len(expected) and rules.chain[-1].hash == expected[-1].hash
+    return elapsed, sync.requests, transport.bytes_received, len(expected) - (length - divergence)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lengths', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--divergence', type=int, default=500)
+    parser.add_argument('--peers', type=int, default=4)
+    parser.add_argument('--window', type=int, default=64)
+    parser.add_argument('--txs-per-block', type=int, default=2)
+    parser.add_argument('--json', action='store_true', help='Sync in JSON instead of the binary codec')
+    args = parser.parse_args()
+
+    print(f"{'length':>8} {'fetched':>8} {'requests':>9} {'KiB':>9} {'seconds':>8}")
+    for length in args.lengths:
+        elapsed, requests, received, fetched = run(length, args.divergence, args.peers,
+                                                  args.window, args.txs_per_block, not args.json)
+        print(f"{length:>8} {fetched:>8} {requests:>9} {received / 1024:>9.1f} {elapsed:>8.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Full vs incremental chain validation at 10k, 100k and 1M blocks.
+
+A peer chain shares all but the last 0.1% of our history. Full validation
+checks every block as the original Rules did; incremental validation only
+re-checks the suffix after the fork point, and a repeated sync round with the
+same peer chain reuses the remembered tip.
+
+    python benchmarks/bench_validation.py [--sizes 10000 100000 1000000] [--workers N]
+"""
+import argparse
+import time
+
+from chain_fixtures import build_chain
+from Rules import Rules
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--txs-per-block', type=int, default=2)
+    parser.add_argument('--divergence', type=float, default=0.001)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"{'blocks':>8} {'suffix':>7} {'full s':>8} {'incremental s':>14} {'repeat s':>9} {'speedup':>8}")
+    for size in args.sizes:
+        ours = build_chain(size, args.txs_per_block)
+        fork = size - max(1, int(size * args.divergence))
+        peer = build_chain(size + 1, args.txs_per_block, branch='peer', base=ours[:fork])
+
+        full_rules = Rules(workers=args.workers)
+        full_time, full_ok = timed(full_rules.is_chain_valid, peer)
+
+        rules = Rules(chain=ours, workers=args.workers)
+        rules.remember_valid(ours)  # Our own chain was validated as it was built
+        incremental_time, incremental_ok = timed(rules.is_chain_valid, peer)
+        repeat_time, repeat_ok = timed(rules.is_chain_valid, peer)
+        assert full_ok and incremental_ok and repeat_ok
+
+        print(f"{size:>8} {len(peer) - fork:>7} {full_time:>8.3f} {incremental_time:>14.4f} "
+              f"{repeat_time:>9.5f} {full_time / incremental_time:>7.0f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Lightweight stand-ins for Entity.Block used by the benchmarks.
+
+They carry the same fields and (de)serialization methods that validation and
+sync use, without needing a database session.
+"""
+import hashlib
+import os
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ('Immutables', 'Entity', 'Database', 'Network'):
+    sys.path.insert(0, os.path.join(root, folder))
+
+from Hashes import transaction_hash
+from Merkle import MerkleTree
+from Proof import work_digest
+
+class BenchTransaction:
+    fields = ('tx_hash', 'sender', 'receiver', 'amount', 'fee', 'nonce', 'signature')
+
+    def __init__(self, sender, receiver, amount, fee=0.0, nonce=0, signature='ab' * 66, tx_hash=None):
+        self.sender, self.receiver, self.amount, self.fee, self.nonce = sender, receiver, amount, fee, nonce
+        self.signature = signature
+        self.tx_hash = tx_hash or transaction_hash(sender, receiver, amount, fee, nonce)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.fields}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['sender'], data['receiver'], data['amount'], data['fee'], data['nonce'],
+                   data['signature'], data['tx_hash'])
+
+class BenchBlock:
+    # Absent fields, which the proof of work hashes as empty strings
+    timestamp = validator = None
+
+    def __init__(self, previous_hash, transactions, nonce=0, merkle_root=None, block_hash=None):
+        self.previous_hash = previous_hash
+        self.nonce = nonce
+        self.coin_transactions = transactions
+        self.merkle_root = merkle_root or MerkleTree(tx.tx_hash for tx in transactions).root_hex()
+        self.hash = block_hash or work_digest(
+            {'previous_hash': previous_hash, 'merkle_root': self.merkle_root}, nonce).hex()
+
+    def header(self):
+        return {'hash': self.hash, 'previous_hash': self.previous_hash,
+                'merkle_root': self.merkle_root, 'nonce': self.nonce}
+
+    def to_dict(self):
+        data = self.header()
+        data['coin_transactions'] = [tx.to_dict() for tx in self.coin_transactions]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['previous_hash'], [BenchTransaction.from_dict(tx) for tx in data['coin_transactions']],
+                   data['nonce'], data['merkle_root'], data['hash'])
+
+def build_chain(length, txs_per_block=2, branch='main', base=None):
+    """Chain of length blocks, extending base (shared history) if given."""
+    chain = list(base or [])
+    previous_hash = chain[-1].hash if chain else '0' * 64
+    for height in range(len(chain), length):
+        sender = '0x' + hashlib.sha256(f'{branch}:{height}'.encode()).hexdigest()[:40]
+        transactions = [BenchTransaction(sender, f'0x{i:040x}', 1.0, 0.001, i) for i in range(txs_per_block)]
+        block = BenchBlock(previous_hash, transactions)
+        chain.append(block)
+        previous_hash = block.hash
+    return chain
@@ -1,32 +1,222 @@
 import flask
 from flask import Flask, request, jsonify
+import os
+import sys
 import socket
 from zeroconf import ServiceInfo, Zeroconf
 import threading
 import time
 import requests
 import uuid
+import json
 import logging
 from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+for folder in ('Immutables', 'Entity', 'Database', 'Network'):
+    sys.path.insert(0, os.path.join(BASE_DIR, folder))
+# Metrics shared with the gesture server
+sys.path.insert(0, os.path.join(os.path.dirname(BASE_DIR), 'Instrumentation'))
+
+from Hashes import HashManager
+from Block import Block, CoinTransaction
+from Rules import Rules
+from Mempool import Mempool, MempoolError
+from Ledger import Ledger, LedgerError, to_coins, to_units
+from Contracts import ContractEngine, ContractError
+from BlockStore import BlockStore, create_schema, read_engine, tune_engine
+import Queries
+from Snapshot import Checkpoints, Snapshot, SnapshotError, latest_snapshot, snapshot_path
+from PeerClient import PeerClient
+from Sync import ChainSync, SyncError, chain_blueprint
+from Gossip import Gossip, GossipError
+from Peers import ContactQueue, PeerRegistry
+from metrics import REGISTRY, instrument
+from endpoints import instrument_app
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('p2p-flask')
 
 app = Flask(__name__)
-db_port = app.run_port
-app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///Databse/db{db_port}.db"
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+profiler = instrument_app(app)
+
+db = SQLAlchemy()
+# Set up by init_database() once the port, and so the database file, is known
+engine = None
+reader = None
+block_store = None
+checkpoints = None
+contracts = None
 
-db = SQLAlchemy(app)
+def init_database(port, snapshot_every=1000, data_dir=None):
+    global engine, reader, block_store, checkpoints, contracts
+    data_dir = data_dir or os.path.join(BASE_DIR, 'Database')
+    path = os.path.join(data_dir, f'db{port}.db')
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    db.init_app(app)
+    with app.app_context():
+        engine = tune_engine(db.engine)
+        create_schema(engine)
+    reader = read_engine(path)
+    block_store = BlockStore(engine)
+    block_store.append_blocks(rules.chain)
+    contracts = ContractEngine(engine)
+    checkpoints = Checkpoints(os.path.join(data_dir, f'snapshots{port}'), ledger, block_store,
+                              every=snapshot_every, rules=rules)
+    for store, target, method in (('blocks', block_store, 'append_blocks'), ('ledger', ledger, 'flush'),
+                                  ('contracts', contracts, 'flush')):
+        instrument(target, method, REGISTRY.histogram('db_commit_duration_seconds', 'Time to write and commit',
+                                                      store=store))
+    REGISTRY.collect('contract_engine_stats', 'Contract engine counters', lambda: contracts.stats)
+
+def bootstrap_snapshot(url):
+    """Fetch a peer's newest snapshot into our snapshot directory; checkpoints.start() then uses it."""
+    temporary = os.path.join(checkpoints.directory, 'download.tmp')
+    response = peer_client.session_for(url).get(f"{url}/snapshot", stream=True, timeout=30)
+    response.raise_for_status()
+    with open(temporary, 'wb') as file:
+        for chunk in response.iter_content(1 << 16):
+            file.write(chunk)
+    try:
+        with Snapshot(temporary) as snapshot:
+            path = snapshot_path(checkpoints.directory, snapshot.height, snapshot.block_hash)
+        # Its checksum only shows the file is intact; its block must be on a chain from our genesis
+        chain_sync.check_header_chain(url, snapshot.height, snapshot.block_hash)
+    except SyncError as e:
+        os.remove(temporary)
+        raise SnapshotError(f"Snapshot from {url} is not on a valid chain: {e}") from e
+    except BaseException:
+        os.remove(temporary)
+        raise
+    os.replace(temporary, path)
+    logger.info(f"Downloaded snapshot at height {snapshot.height} from {url}")
 
-peers = {}
+def genesis_block():
+    """Identical on every node, so all chains share height 0."""
+    return Block(
+        hash=HashManager('sha256').generate_hash('genesis'),
+        previous_hash='0' * 64,
+        timestamp=datetime(2025, 1, 1),
+        nonce=0,
+    )
+
+rules = Rules(chain=[genesis_block()])
+rules.remember_valid(rules.chain)
+app.register_blueprint(chain_blueprint(rules))
+peer_client = PeerClient(timeout=2)
+mempool = Mempool()
+ledger = Ledger()
+ledger.follow(rules.chain)
+
+def check_ledger(chain, fork, suffix):
+    """Refuse a synced suffix that overdraws an account, before it replaces any block."""
+    try:
+        ledger.check_follow(chain, fork, suffix)
+    except LedgerError as e:
+        raise SyncError(str(e)) from e
+
+chain_sync = ChainSync(rules, peer_client, check=check_ledger)
+
+# Peer RPCs, hashing and sync are timed where they are called through these objects
+instrument(peer_client, 'request', REGISTRY.histogram('peer_rpc_duration_seconds', 'Time of one request to a peer'))
+instrument(rules, 'is_proof_valid', REGISTRY.histogram('proof_check_duration_seconds', 'Time to check one block proof'))
+instrument(rules, 'seal', REGISTRY.histogram('seal_duration_seconds', 'Time to find a proof of work for a block'))
+# Wrapped here, on the class, so every HashManager is covered while Hashes.py stays free
+# of metrics. Merkle and proof hashes go through PreparedHash and stay untimed: a timer
+# there would cost about as much as the hash
+for method in ('generate_hash', 'digest', 'hash_many', 'verify_many'):
+    instrument(HashManager, method, REGISTRY.histogram('hash_duration_seconds', 'Time of one HashManager call',
+                                                       method=method))
+instrument(chain_sync, 'sync', REGISTRY.histogram('chain_sync_duration_seconds', 'Time of one sync round with peers'))
+REGISTRY.collect('mempool_stats', 'Mempool counters', lambda: mempool.stats)
+REGISTRY.gauge('mempool_transactions', 'Pending transactions', lambda: len(mempool))
+REGISTRY.gauge('chain_height', 'Height of our chain tip', lambda: len(rules.chain) - 1)
+REGISTRY.gauge('ledger_height', 'Height the ledger has applied', lambda: ledger.height)
+
+peers = PeerRegistry(ttl=300)
+REGISTRY.gauge('peers', 'Known peers', lambda: len(peers))
+peer_heartbeats = REGISTRY.counter('peer_heartbeats_total', 'Contacts from peers we already know')
 my_uuid = str(uuid.uuid4())
 my_info = {
     "uuid": my_uuid,
     "name": socket.gethostname(),
-    "timestamp": time.time()
+    "timestamp": time.time(),
+    # Set by start_server; lets peers we contact reach us back on our listening port
+    "port": None,
 }
 
+def deliver_message(message):
+    if message.get('kind') == 'transactions':
+        pool_gossiped(message.get('content'))
+        return
+    logger.info(f"Message from {message.get('sender', 'Unknown')}: {message.get('content', '')}")
+
+def send_gossip(urls, message):
+    for url, response in peer_client.fan_out('POST', urls, '/message', json=message).items():
+        if isinstance(response, Exception):
+            logger.warning(f"Failed to send message to {url}: {response}")
+
+def introduce(batch):
+    """Announce ourselves to newly found peers, all at once; run by the contact worker."""
+    urls = {url: peer_uuid for peer_uuid, url in batch}
+    for url, response in peer_client.fan_out('POST', urls, '/peer', json=my_info).items():
+        if isinstance(response, Exception):
+            logger.warning(f"Failed to contact newly discovered peer {url}: {response}")
+        else:
+            peers.touch(urls[url])
+
+introductions = ContactQueue(introduce)
+
+def relay_transactions(batch):
+    """Gossip newly pooled transactions, so each node hears a batch once, from at most fanout peers."""
+    gossip.originate([tx for _, tx in batch], kind='transactions', sender=my_uuid)
+
+def pool_gossiped(transactions):
+    """Pool transactions a peer gossiped; gossip passes the message on itself, so they are not relayed again."""
+    if not isinstance(transactions, list):
+        return
+    for tx in transactions:
+        try:
+            mempool.add(tx)
+        except MempoolError:
+            pass
+
+def announce_blocks(batch):
+    """Ask every peer to sync now rather than at its next maintenance round."""
+    for url, response in peer_client.fan_out('POST', peers.urls().values(), '/chain/sync').items():
+        if isinstance(response, Exception):
+            logger.warning(f"Failed to announce block to {url}: {response}")
+
+relays = ContactQueue(relay_transactions)
+announcements = ContactQueue(announce_blocks)
+
+def join_static_peers(urls, retry=1.0):
+    """Introduce ourselves to fixed peer URLs until each has answered with its uuid.
+
+    Used instead of mDNS discovery, for example for a cluster on one host;
+    the peers may still be starting, so unanswered ones are retried.
+    """
+    pending = list(urls)
+    while pending:
+        for url, response in peer_client.fan_out('POST', pending, '/peer', json=my_info, skip_backoff=False).items():
+            if not isinstance(response, Exception):
+                info = response.json()
+                peers.upsert(info['uuid'], url, info.get('name'))
+                pending.remove(url)
+                logger.info(f"Joined static peer {url}")
+        if pending:
+            time.sleep(retry)
+
+gossip = Gossip(
+    my_uuid,
+    get_peers=peers.urls,
+    send=send_gossip,
+    deliver=deliver_message,
+)
+REGISTRY.collect('gossip_stats', 'Gossip counters', lambda: gossip.counters)
+
 def get_local_ip():
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
@@ -66,24 +256,19 @@ class ServiceListener:
             if uuid_value == my_uuid:
                 return
             peer_url = f"http://{address}:{port}"
-            peers[uuid_value] = {
-                "url": peer_url,
-                "last_seen": time.time(),
-                "name": info.properties.get(b'name', b'').decode('utf-8')
-            }
+            peers.upsert(uuid_value, peer_url, info.properties.get(b'name', b'').decode('utf-8'))
             logger.info(f"Discovered peer: {peer_url}")
-            try:
-                requests.post(f"{peer_url}/peer", json=my_info, timeout=2)
-            except requests.RequestException as e:
-                logger.warning(f"Failed to contact newly discovered peer: {e}")
+            # Never block zeroconf's callback thread on the network
+            introductions.put(uuid_value, peer_url)
     
     def remove_service(self, zc, type_, name):
         info = zc.get_service_info(type_, name)
         if info:
             uuid_value = info.properties.get(b'uuid', b'').decode('utf-8')
-            if uuid_value in peers:
-                logger.info(f"Peer {peers[uuid_value]['url']} has left the network")
-                del peers[uuid_value]
+            removed = peers.remove(uuid_value)
+            if removed is not None:
+                logger.info(f"Peer {removed['url']} has left the network")
+                peer_client.forget(removed['url'])
     
     def update_service(self, zc, type_, name):
         pass
@@ -104,11 +289,10 @@ def home():
 
 @app.route('/peers')
 def get_peers():
-    return jsonify({
-        "uuid": my_uuid,
-        "name": socket.gethostname(),
-        "peers": peers
-    })
+    # The registry keeps the encoded peer list until it changes; only the small envelope is encoded here
+    envelope = json.dumps({"uuid": my_uuid, "name": socket.gethostname(), "peers": None}).encode()
+    body = envelope[:-len(b'null}')] + peers.snapshot_json() + b'}'
+    return flask.Response(body, mimetype='application/json')
 
 @app.route('/peer', methods=['POST'])
 def register_peer():
@@ -116,17 +300,15 @@ def register_peer():
     peer_uuid = peer_info.get('uuid')
     if peer_uuid == my_uuid:
         return jsonify({"status": "ignored", "reason": "self-reference"})
-    if peer_uuid in peers:
-        peers[peer_uuid]["last_seen"] = time.time()
-        logger.info(f"Updated existing peer: {peer_uuid}")
+    if peers.touch(peer_uuid):
+        # Every peer does this every minute; counted rather than logged
+        peer_heartbeats.inc()
     else:
         try:
-            peer_url = f"http://{request.remote_addr}:{request.environ.get('REMOTE_PORT', 5000)}"
-            peers[peer_uuid] = {
-                "url": peer_url,
-                "name": peer_info.get('name', 'Unknown'),
-                "last_seen": time.time()
-            }
+            # REMOTE_PORT is the peer's outgoing port; its advertised port is the one it listens on
+            port = peer_info.get('port') or request.environ.get('REMOTE_PORT', 5000)
+            peer_url = f"http://{request.remote_addr}:{port}"
+            peers.upsert(peer_uuid, peer_url, peer_info.get('name', 'Unknown'))
             logger.info(f"Registered new peer via direct contact: {peer_url}")
         except Exception as e:
             logger.error(f"Failed to process peer registration: {e}")
@@ -134,47 +316,279 @@ def register_peer():
 
 @app.route('/message', methods=['POST'])
 def receive_message():
-    message = request.json
-    sender = message.get('sender', 'Unknown')
-    content = message.get('content', '')
-    logger.info(f"Message from {sender}: {content}")
+    message = request.get_json(silent=True)
+    try:
+        if not gossip.receive(message):
+            return jsonify({"status": "duplicate"})
+    except GossipError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"status": "accepted"})
+
+@app.route('/gossip/metrics')
+def gossip_metrics():
+    return jsonify(gossip.metrics())
+
+@app.route('/transactions', methods=['POST'])
+def submit_transactions():
+    payload = request.json
+    # One transaction or a list of them, so bursts of payouts cost one request
+    transactions = payload if isinstance(payload, list) else [payload]
+    results = {"accepted": [], "duplicate": [], "rejected": {}}
+    for tx in transactions:
+        tx_hash = tx.get('tx_hash') if isinstance(tx, dict) else None
+        try:
+            if mempool.add(tx):
+                results["accepted"].append(tx_hash)
+                relays.put(tx_hash, tx)
+            else:
+                results["duplicate"].append(tx_hash)
+        except MempoolError as e:
+            results["rejected"][str(tx_hash)] = str(e)
+    status = 202 if results["accepted"] or results["duplicate"] else 400
+    return jsonify(results), status
+
+@app.route('/transactions/<tx_hash>')
+def get_transaction(tx_hash):
+    tx = mempool.get(tx_hash)
+    if tx is not None:
+        return jsonify({"status": "pending", "transaction": tx})
+    return jsonify({"status": "unknown", "tx_hash": tx_hash}), 404
+
+@app.route('/mempool')
+def get_mempool():
+    return jsonify(mempool.snapshot(limit=request.args.get('limit', default=100, type=int)))
 
-def maintenance_task():
+@app.route('/mempool/template')
+def get_block_template():
+    max_txs = request.args.get('max_txs', default=1000, type=int)
+    max_bytes = request.args.get('max_bytes', type=int)
+    return jsonify(mempool.template(max_txs=max_txs, max_bytes=max_bytes))
+
+# Sync and block production both extend rules.chain and the state derived from it
+chain_lock = threading.Lock()
+
+def take_snapshot(batch):
+    """Snapshot the state if one is due. Runs on its own worker, after the commit that made it due,
+    so a snapshot that fails is logged and never fails blocks that are already stored."""
+    with chain_lock:
+        try:
+            checkpoints.maybe_take()
+        except (SnapshotError, OSError) as e:
+            logger.error(f"Snapshot at height {ledger.height} failed: {e}")
+
+snapshots = ContactQueue(take_snapshot)
+
+def commit_blocks(start_height, orphaned=()):
+    """Store rules.chain from start_height on and bring the ledger, contracts and mempool up to date.
+
+    orphaned are the blocks a reorg took off our chain; their transactions
+    that the new blocks do not include go back to the mempool.
+    """
+    new_blocks = rules.chain[start_height:]
+    if orphaned:
+        try:
+            contracts.rollback(start_height - 1, start_height - 1 + len(orphaned))
+        except ContractError as e:
+            logger.warning(f"Contract statuses may not match the new branch: {e}")
+    # Contract events ride along with their blocks into the same insert batch
+    contracts.run_blocks(new_blocks, start_height)
+    block_store.append_blocks(new_blocks)
+    contracts.flush()
+    # Transactions the new blocks include are no longer pending
+    included = {tx.tx_hash for block in new_blocks for tx in block.coin_transactions}
+    mempool.remove_included(included)
+    returned = 0
+    for tx in (tx for block in orphaned for tx in block.coin_transactions if tx.tx_hash not in included):
+        try:
+            returned += mempool.add(tx.to_dict())
+        except MempoolError as e:
+            logger.info(f"Dropped orphaned transaction {tx.tx_hash}: {e}")
+    if orphaned:
+        logger.info(f"Returned {returned} transactions from {len(orphaned)} orphaned blocks to the mempool")
+    try:
+        ledger.follow(rules.chain)
+    except LedgerError as e:
+        logger.warning(f"Ledger stopped at height {ledger.height}: {e}")
+    ledger.flush(engine)
+    snapshots.put('snapshot', None)
+
+def sync_from_peers():
+    with chain_lock:
+        chain, height = rules.chain, len(rules.chain)
+        changed = chain_sync.sync(peers.urls().values())
+        if changed:
+            # Empty unless the sync replaced blocks after the fork rather than extending our tip
+            commit_blocks(chain_sync.last_fork + 1, orphaned=chain[chain_sync.last_fork + 1:height])
+    return changed
+
+def produce_block(max_txs=1000):
+    """Seal the best pending transactions the ledger can pay for into a block on our tip.
+
+    Returns the block, or None if nothing could go in. A sender short of
+    coins is left out together with its later nonces, which stay pooled
+    until it is funded; transactions already in a stored block (relayed
+    back after they were mined) are dropped from the pool.
+    """
+    with chain_lock:
+        template = mempool.template(max_txs=max_txs)
+        if not template:
+            return None
+        mined = block_store.stored_transactions((tx['tx_hash'] for tx in template), reader)
+        balances, unfunded, chosen = {}, set(), []
+        for tx in template:
+            sender, receiver = tx['sender'], tx['receiver']
+            if tx['tx_hash'] in mined or sender in unfunded:
+                continue
+            cost = to_units(tx['amount']) + to_units(tx['fee'])
+            balance = balances.get(sender, ledger.balance(sender))
+            if balance < cost and sender not in ledger.issuers:
+                unfunded.add(sender)
+                continue
+            balances[sender] = balance - cost
+            balances[receiver] = balances.get(receiver, ledger.balance(receiver)) + to_units(tx['amount'])
+            chosen.append(tx)
+        if mined:
+            mempool.remove_included(mined)
+        if not chosen:
+            return None
+        block = Block(previous_hash=rules.chain[-1].hash, timestamp=datetime.utcnow())
+        block.coin_transactions = [CoinTransaction.from_dict(tx) for tx in chosen]
+        block.merkle_root = block.compute_merkle_root()
+        rules.seal(block)
+        rules.chain.append(block)
+        rules.remember_valid(rules.chain)
+        commit_blocks(len(rules.chain) - 1)
+    announcements.put(block.hash, block.hash)
+    return block
+
+@app.route('/balance/<address>')
+def get_balance(address):
+    units = ledger.balance(address)
+    return jsonify({"address": address, "balance": to_coins(units), "units": units, "height": ledger.height})
+
+@app.route('/contracts/stats')
+def contract_stats():
+    return jsonify(contracts.stats)
+
+@app.route('/storage')
+def storage_stats():
+    # Answered from the read pool, so it never waits on block ingestion
+    with reader.connect() as connection:
+        pages = connection.exec_driver_sql("PRAGMA page_count").scalar()
+        page_size = connection.exec_driver_sql("PRAGMA page_size").scalar()
+    return jsonify({"rows": block_store.counts(reader), "bytes": pages * page_size})
+
+def paginated(query, *args):
+    """Run a keyset-paginated query from the read pool with ?limit= and ?cursor=."""
+    limit = request.args.get('limit', default=Queries.DEFAULT_PAGE, type=int)
+    try:
+        with reader.connect() as connection:
+            page = query(connection, *args, limit=limit, cursor=request.args.get('cursor'))
+    except Queries.CursorError as e:
+        return jsonify({"error": str(e)}), 400
+    if page is None:
+        return jsonify({"error": "not found"}), 404
+    return jsonify(page)
+
+@app.route('/address/<address>/transactions')
+def address_transactions(address):
+    return paginated(Queries.address_history, address)
+
+@app.route('/address/<address>/nfts')
+def address_nfts(address):
+    return paginated(Queries.nfts_owned, address)
+
+@app.route('/nfts/<token_id>/transfers')
+def nft_transfers(token_id):
+    return paginated(Queries.nft_history, token_id)
+
+@app.route('/contracts/<contract_id>/events')
+def contract_events(contract_id):
+    return paginated(Queries.contract_events, contract_id)
+
+@app.route('/snapshot')
+def get_snapshot():
+    snapshot = latest_snapshot(checkpoints.directory)
+    if snapshot is None:
+        return jsonify({"error": "no snapshot"}), 404
+    with snapshot:
+        response = flask.send_file(snapshot.path, mimetype='application/octet-stream')
+        response.headers['X-Snapshot-Height'] = str(snapshot.height)
+        response.headers['X-Snapshot-Hash'] = snapshot.block_hash
+    return response
+
+@app.route('/chain/mine', methods=['POST'])
+def mine_block():
+    block = produce_block(request.args.get('max_txs', default=1000, type=int))
+    if block is None:
+        return jsonify({"status": "empty", "height": len(rules.chain) - 1})
+    return jsonify({"status": "mined", "height": len(rules.chain) - 1, "hash": block.hash,
+                    "transactions": len(block.coin_transactions)})
+
+@app.route('/chain/sync', methods=['POST'])
+def sync_chain():
+    try:
+        changed = sync_from_peers()
+    except SyncError as e:
+        logger.warning(f"Chain sync failed: {e}")
+        return jsonify({"status": "failed", "reason": str(e)}), 502
+    return jsonify({"status": "synced" if changed else "up-to-date", "height": len(rules.chain) - 1})
+
+def maintenance_task(interval=60):
+    while True:
+        try:
+            # Pops only the peers past their ttl off the expiry heap
+            for uuid, info in peers.expire():
+                logger.info(f"Removing stale peer: {info['url']}")
+                peer_client.forget(info['url'])
+            urls = {url: uuid for uuid, url in peers.urls().items()}
+            results = peer_client.fan_out('POST', urls, '/peer', json=my_info)
+            for url, response in results.items():
+                if not isinstance(response, Exception):
+                    peers.touch(urls[url])
+            sync_from_peers()
+        except SyncError as e:
+            logger.warning(f"Chain sync failed: {e}")
+        except Exception as e:
+            logger.error(f"Maintenance failed: {e}")
+        time.sleep(interval)
+
+def mining_task(interval, max_txs=1000):
+    """Produce a block from the mempool every interval seconds, when there is anything to put in it."""
     while True:
-        current_time = time.time()
-        stale_peers = [uuid for uuid, info in peers.items() 
-                      if current_time - info['last_seen'] > 300]
-        for uuid in stale_peers:
-            logger.info(f"Removing stale peer: {peers[uuid]['url']}")
-            del peers[uuid]
-        for uuid, info in list(peers.items()):
-            try:
-                response = requests.post(f"{info['url']}/peer", json=my_info, timeout=2)
-                if response.status_code == 200:
-                    peers[uuid]["last_seen"] = time.time()
-            except requests.RequestException:
-                pass
-        time.sleep(60)
+        time.sleep(interval)
+        try:
+            produce_block(max_txs)
+        except Exception as e:
+            logger.error(f"Block production failed: {e}")
 
 def broadcast_message(message):
-    message_data = {
-        "sender": my_uuid,
-        "sender_name": socket.gethostname(),
-        "content": message,
-        "timestamp": time.time()
-    }
-    for uuid, info in list(peers.items()):
+    return gossip.originate(message, sender=my_uuid, sender_name=socket.gethostname())
+
+def start_server(port=5000, snapshot_every=1000, bootstrap_from=None, data_dir=None, static_peers=(),
+                 discovery=True, sync_interval=60, mine_interval=0):
+    my_info["port"] = port
+    init_database(port, snapshot_every, data_dir)
+    if bootstrap_from and latest_snapshot(checkpoints.directory) is None:
         try:
-            requests.post(f"{info['url']}/message", json=message_data, timeout=2)
-        except requests.RequestException as e:
-            logger.warning(f"Failed to send message to {info['url']}: {e}")
-
-def start_server(port=5000):
-    zeroconf, service_info = register_service(port)
-    listener = ServiceListener()
-    browser = listener.start_discovery()
-    maintenance_thread = threading.Thread(target=maintenance_task, daemon=True)
+            bootstrap_snapshot(bootstrap_from)
+        except (requests.RequestException, SnapshotError) as e:
+            logger.warning(f"Snapshot bootstrap from {bootstrap_from} failed: {e}")
+    started = time.perf_counter()
+    restored, replayed = checkpoints.start()
+    logger.info(f"State ready at height {ledger.height}, chain at {len(rules.chain) - 1}, "
+                f"in {time.perf_counter() - started:.2f}s "
+                f"(snapshot: {restored}, blocks replayed: {replayed})")
+    if discovery:
+        zeroconf, service_info = register_service(port)
+        listener = ServiceListener()
+        browser = listener.start_discovery()
+    if static_peers:
+        threading.Thread(target=join_static_peers, args=(static_peers,), daemon=True).start()
+    maintenance_thread = threading.Thread(target=maintenance_task, args=(sync_interval,), daemon=True)
     maintenance_thread.start()
+    if mine_interval > 0:
+        threading.Thread(target=mining_task, args=(mine_interval,), daemon=True).start()
     try:
         logger.info(f"Starting Flask server on port {port}")
         app.run(host='0.0.0.0', port=port)
@@ -182,15 +596,32 @@ def start_server(port=5000):
         pass
     finally:
         logger.info("Shutting down...")
-        zeroconf.unregister_service(service_info)
-        zeroconf.close()
+        if discovery:
+            zeroconf.unregister_service(service_info)
+            zeroconf.close()
 
 if __name__ == '__main__':
     import argparse
     
     parser = argparse.ArgumentParser(description='P2P Flask server with Zeroconf')
     parser.add_argument('--port', type=int, default=5000, help='Port to run the server on')
+    parser.add_argument('--issuer', action='append', default=[], help='Address allowed to issue coins (repeatable)')
+    parser.add_argument('--snapshot-every', type=int, default=1000, help='Blocks between state snapshots')
+    parser.add_argument('--difficulty', type=int, default=0, help='Proof-of-work bits required of every block')
+    parser.add_argument('--bootstrap-from', help='Peer URL to fetch a state snapshot from when we have none')
+    parser.add_argument('--profile', action='store_true', help='Start the sampling profiler (toggle with POST /profile)')
+    parser.add_argument('--data-dir', help='Directory for the database and snapshots (default: Database/)')
+    parser.add_argument('--peer', action='append', default=[], help='Peer URL to join at startup (repeatable)')
+    parser.add_argument('--no-discovery', action='store_true', help='Do not announce or browse for peers over mDNS')
+    parser.add_argument('--sync-interval', type=float, default=60, help='Seconds between heartbeat and sync rounds')
+    parser.add_argument('--mine-interval', type=float, default=0,
+                        help='Produce a block from the mempool every N seconds (0 disables)')
     args = parser.parse_args()
+    ledger.issuers.update(args.issuer)
+    rules.difficulty_bits = args.difficulty
+    if args.profile:
+        profiler.start()
     
-    start_server(args.port)
+    start_server(args.port, args.snapshot_every, args.bootstrap_from, args.data_dir, args.peer,
+                 not args.no_discovery, args.sync_interval, args.mine_interval)
 